@@ -31,6 +31,7 @@ import io
 import fcntl
 import types
 import time
+import threading
 
 # Constant values
 I2C_SLAVE               = 0x0703
@@ -77,6 +78,44 @@ COMMAND_VALUE_REV       = 2     # I2C value representing reverse
 COMMAND_VALUE_ON        = 1     # I2C value representing on
 COMMAND_VALUE_OFF       = 0     # I2C value representing off
 
+RETRY_COUNT_DEFAULT     = 3     # Default number of attempts for each I2C transaction
+RETRY_DELAY_DEFAULT     = 0.0   # Default delay in seconds before retrying a failed I2C transaction
+RETRY_BACKOFF_DEFAULT   = 2.0   # Default multiplier applied to the retry delay after each failed attempt
+ERROR_LOG_INTERVAL      = 5.0   # Minimum time in seconds between logged errors for the same command
+RECONNECT_FAILURES      = 3     # Number of failed I2C transactions in a row before the board is treated as lost
+RECONNECT_DELAY         = 0.1   # Initial delay in seconds between reconnection attempts, doubled after each failed attempt
+RECONNECT_DELAY_MAX     = 5.0   # Longest delay in seconds between reconnection attempts
+RECONNECT_EVENTS        = 10    # Number of recent reconnections kept by each instance
+MOVE_POLL_INTERVAL      = 0.01  # Delay in seconds between checks of the encoder moving state while moves are queued
+RESTORE_COMMANDS        = [COMMAND_SET_FAILSAFE, COMMAND_SET_EPO_IGNORE, COMMAND_SET_LED, COMMAND_SET_ENC_MODE, COMMAND_SET_ENC_SPEED]  # Configuration commands sent again after reconnecting
+
+
+def CommandName(command):
+    """
+name = CommandName(command)
+
+Gets the name of a command code from the constants at the top of PicoBorgRev.py, e.g. 'GET_ID' for COMMAND_GET_ID
+    """
+    for name, value in globals().iteritems():
+        if name.startswith('COMMAND_') and not name.startswith('COMMAND_VALUE_') and not name.startswith('COMMAND_ANALOG_'):
+            if value == command:
+                return name[8:]
+    return 'UNKNOWN'
+
+
+def OpenI2cBus(busNumber, address):
+    """
+i2cRead, i2cWrite = OpenI2cBus(busNumber, address)
+
+Opens the IC bus for reading and writing to the chip at address
+Replaced by boardSim.Install to talk to emulated boards instead
+    """
+    i2cRead = io.open("/dev/i2c-" + str(busNumber), "rb", buffering = 0)
+    fcntl.ioctl(i2cRead, I2C_SLAVE, address)
+    i2cWrite = io.open("/dev/i2c-" + str(busNumber), "wb", buffering = 0)
+    fcntl.ioctl(i2cWrite, I2C_SLAVE, address)
+    return i2cRead, i2cWrite
+
 
 def ScanForPicoBorgReverse(busNumber = 1):
     """
@@ -183,6 +222,152 @@ Warning, this new I
         print 'Failed to set new IC address...'
 
 
+# Class used to track an encoder move queued with EncoderMoveAsync
+class EncoderMove:
+    """
+EncoderMove(board, counts1, counts2, [timeout], [callback])
+
+Handle returned by EncoderMoveAsync, the move is carried out in the background by the EncoderMovePoller thread
+
+counts1                 Encoder counts for motor 1, negative to move in reverse
+counts2                 Encoder counts for motor 2, negative to move in reverse
+timeout                 Seconds the move may take before the motors are stopped, None to wait for ever
+callback                Function reference called with this move once it has finished, None for no call
+state                   'queued', 'moving', 'done', 'cancelled', 'failed' or 'timeout'
+queueTime               time.time() when the move was queued
+startTime               time.time() when the move was sent to the board, None until then
+finishTime              time.time() when the move finished, None until then
+    """
+
+    def __init__(self, board, counts1, counts2, timeout = None, callback = None):
+        self.board = board
+        self.counts1 = int(counts1)
+        self.counts2 = int(counts2)
+        self.timeout = timeout
+        self.callback = callback
+        self.state = 'queued'
+        self.queueTime = time.time()
+        self.startTime = None
+        self.finishTime = None
+        self.event = threading.Event()
+
+
+    def IsDone(self):
+        """
+finished = IsDone()
+
+Returns True once the move has finished, been cancelled, failed or timed out
+        """
+        return self.event.isSet()
+
+
+    def Wait(self, timeout = None):
+        """
+success = Wait([timeout])
+
+Waits for the move to finish, returns True if it completed and False otherwise
+If a timeout is provided the function will return False after timeout seconds if the move has not finished
+        """
+        self.event.wait(timeout)
+        return self.state == 'done'
+
+
+    def Cancel(self):
+        """
+Cancel()
+
+Cancels the move, the motors are stopped if it has already been sent to the board
+Moves queued after this one carry on as normal
+        """
+        self.board.CancelEncoderMove(self)
+
+
+    def Finish(self, state):
+        """
+Finish(state)
+
+Marks the move as finished with the given state and calls the callback, called by the board
+        """
+        self.state = state
+        self.finishTime = time.time()
+        self.event.set()
+        if self.callback != None:
+            self.callback(self)
+
+
+# Thread used to poll the boards which have encoder moves queued
+class EncoderMovePoller(threading.Thread):
+    """
+EncoderMovePoller()
+
+Background thread shared by every PicoBorg Reverse with encoder moves queued, see GetEncoderMovePoller
+Each board is checked every MOVE_POLL_INTERVAL seconds while it has moves, the thread sleeps when there are none
+
+polls                   Number of times the boards have been checked
+    """
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.boards = []
+        self.polls = 0
+        self.start()
+
+
+    def Add(self, board):
+        """
+Add(board)
+
+Starts checking a board, called by the board after it has queued a move
+        """
+        self.lock.acquire()
+        if board not in self.boards:
+            self.boards.append(board)
+        self.lock.release()
+        self.event.set()
+
+
+    def run(self):
+        # This method runs in a separate thread
+        while True:
+            self.lock.acquire()
+            boards = list(self.boards)
+            self.lock.release()
+            if len(boards) == 0:
+                # Nothing to do, sleep until a move is queued
+                self.event.wait()
+                self.event.clear()
+                continue
+            for board in boards:
+                if board.ServiceEncoderMoves() == 0:
+                    # Stop checking the board unless another move was queued in the meantime
+                    self.lock.acquire()
+                    if board.GetEncoderMovesPending() == 0:
+                        self.boards.remove(board)
+                    self.lock.release()
+            self.polls += 1
+            self.event.wait(MOVE_POLL_INTERVAL)
+            self.event.clear()
+
+
+movePoller = None
+movePollerLock = threading.Lock()
+def GetEncoderMovePoller():
+    """
+poller = GetEncoderMovePoller()
+
+Gets the EncoderMovePoller thread shared by all boards, it is started the first time this is called
+    """
+    global movePoller
+    movePollerLock.acquire()
+    if movePoller == None:
+        movePoller = EncoderMovePoller()
+    movePollerLock.release()
+    return movePoller
+
+
 # Class used to control PicoBorg Reverse
 class PicoBorgRev:
     """
@@ -193,6 +378,19 @@ bus                     the smbus object used to talk to the I
 i2cAddress              The IC address of the PicoBorg Reverse chip to control
 foundChip               True if the PicoBorg Reverse chip can be seen, False otherwise
 printFunction           Function reference to call when printing text, if None "print" is used
+retryCount              Number of attempts for each I2C transaction, see SetRetryPolicy for per command settings
+retryDelay              Delay in seconds before retrying a failed I2C transaction
+retryBackoff            Multiplier applied to the retry delay after each failed attempt
+errorLogFunction        Function reference called with a dictionary describing each logged I2C error, if None "Print" is used
+autoReconnect           True to reconnect in the background once RECONNECT_FAILURES I2C transactions in a row have failed
+reconnectDelay          Initial delay in seconds between reconnection attempts, doubled after each failed attempt
+reconnectDelayMax       Longest delay in seconds between reconnection attempts
+reconnectFunction       Function reference called after the board has been reconnected and its configuration restored
+reconnecting            True while the board is lost, other I2C transactions fail immediately until it is back
+i2cLock                 Held for each I2C transaction so threads sharing the board never interleave their writes and reads
+reconnects              Number of times the board has been reconnected
+moveCurrent             EncoderMove currently being carried out by the board, None if there is not one
+moveQueue               List of EncoderMove handles waiting to be sent to the board
     """
 
     # Shared values used by this class
@@ -202,6 +400,33 @@ printFunction           Function reference to call when printing text, if None "
     printFunction           = None
     i2cWrite                = None
     i2cRead                 = None
+    retryCount              = RETRY_COUNT_DEFAULT
+    retryDelay              = RETRY_DELAY_DEFAULT
+    retryBackoff            = RETRY_BACKOFF_DEFAULT
+    retryPolicy             = None
+    errorLogFunction        = None
+    i2cStats                = None
+    i2cErrorLog             = None
+    i2cStatsLock            = threading.Lock()
+    i2cLock                 = None
+    autoReconnect           = False
+    reconnectDelay          = RECONNECT_DELAY
+    reconnectDelayMax       = RECONNECT_DELAY_MAX
+    reconnectFunction       = None
+    reconnecting            = False
+    reconnectThread         = None
+    reconnects              = 0
+    reconnectLast           = 0.0
+    reconnectMax            = 0.0
+    reconnectEvents         = None
+    consecutiveFailures     = 0
+    restoreWrites           = None
+    restoreSequence         = 0
+    moveCurrent             = None
+    moveQueue               = None
+    moveLock                = None
+    movesCompleted          = 0
+    movesFailed             = 0
 
 
     def RawWrite(self, command, data):
@@ -210,16 +435,43 @@ RawWrite(command, data)
 
 Sends a raw command on the I2C bus to the PicoBorg Reverse
 Command codes can be found at the top of PicoBorgRev.py, data is a list of 0 or more byte values
+Failed writes are retried using the retry policy for the command, see SetRetryPolicy
 
 Under most circumstances you should use the appropriate function instead of RawWrite
         """
+        if self.reconnecting and (threading.currentThread() != self.reconnectThread):
+            raise IOError('PicoBorg Reverse at %02X is being reconnected' % (self.i2cAddress))
         rawOutput = chr(command)
         for singleByte in data:
             rawOutput += chr(singleByte)
-        self.i2cWrite.write(rawOutput)
-
-
-    def RawRead(self, command, length, retryCount = 3):
+        retryCount, retryDelay, retryBackoff = self.GetRetryPolicy(command)
+        startTime = time.time()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                self.i2cLock.acquire()
+                try:
+                    self.i2cWrite.write(rawOutput)
+                finally:
+                    self.i2cLock.release()
+                break
+            except IOError, e:
+                if attempts >= retryCount:
+                    self.RecordI2c(command, startTime, attempts, e)
+                    raise
+            if retryDelay > 0:
+                time.sleep(retryDelay)
+                retryDelay *= retryBackoff
+        self.RecordI2c(command, startTime, attempts, None)
+        if command in RESTORE_COMMANDS:
+            if self.restoreWrites == None:
+                self.restoreWrites = {}
+            self.restoreSequence += 1
+            self.restoreWrites[command] = (self.restoreSequence, command, list(data))
+
+
+    def RawRead(self, command, length, retryCount = None):
         """
 RawRead(command, length, [retryCount])
 
@@ -227,26 +479,276 @@ Reads data back from the PicoBorg Reverse after sending a GET command
 Command codes can be found at the top of PicoBorgRev.py, length is the number of bytes to read back
 
 The function checks that the first byte read back matches the requested command
-If it does not it will retry the request until retryCount is exhausted (default is 3 times)
+If it does not, or the bus reports an error, it will retry the request until retryCount is exhausted
+If retryCount is not supplied the retry policy for the command is used (default is 3 times), see SetRetryPolicy
 
 Under most circumstances you should use the appropriate function instead of RawRead
         """
-        while retryCount > 0:
-            self.RawWrite(command, [])
-            rawReply = self.i2cRead.read(length)
-            reply = []
-            for singleByte in rawReply:
-                reply.append(ord(singleByte))
-            if command == reply[0]:
-                break
-            else:
-                retryCount -= 1
-        if retryCount > 0:
+        if self.reconnecting and (threading.currentThread() != self.reconnectThread):
+            raise IOError('PicoBorg Reverse at %02X is being reconnected' % (self.i2cAddress))
+        policyCount, retryDelay, retryBackoff = self.GetRetryPolicy(command)
+        if retryCount == None:
+            retryCount = policyCount
+        startTime = time.time()
+        attempts = 0
+        error = 'no attempts made'
+        while attempts < retryCount:
+            attempts += 1
+            try:
+                # The command and the reply are one transaction, other threads wait until both are done
+                self.i2cLock.acquire()
+                try:
+                    self.i2cWrite.write(chr(command))
+                    rawReply = self.i2cRead.read(length)
+                finally:
+                    self.i2cLock.release()
+                reply = []
+                for singleByte in rawReply:
+                    reply.append(ord(singleByte))
+                if (len(reply) > 0) and (command == reply[0]):
+                    error = None
+                    break
+                else:
+                    error = 'reply did not match the command'
+            except IOError, e:
+                error = e
+            if (attempts < retryCount) and (retryDelay > 0):
+                time.sleep(retryDelay)
+                retryDelay *= retryBackoff
+        self.RecordI2c(command, startTime, attempts, error)
+        if error == None:
             return reply
         else:
             raise IOError('I2C read for command %d failed' % (command))
 
 
+    def SetRetryPolicy(self, command, retryCount, retryDelay = RETRY_DELAY_DEFAULT, retryBackoff = RETRY_BACKOFF_DEFAULT):
+        """
+SetRetryPolicy(command, retryCount, [retryDelay], [retryBackoff])
+
+Sets how failed I2C transactions are retried for a single command code
+retryCount is the number of attempts, retryDelay is the time in seconds before the first retry
+retryBackoff multiplies the delay after each further failure, e.g. 2.0 doubles the delay each time
+Use None for command to change the default used by all commands without their own policy
+e.g.
+SetRetryPolicy(None, 5, 0.001)      -> all commands try up to 5 times, waiting 1 ms, 2 ms, 4 ms, 8 ms between attempts
+SetRetryPolicy(COMMAND_GET_ID, 1)   -> the board identifier is only read once
+        """
+        if command == None:
+            self.retryCount = retryCount
+            self.retryDelay = retryDelay
+            self.retryBackoff = retryBackoff
+        else:
+            if self.retryPolicy == None:
+                self.retryPolicy = {}
+            self.retryPolicy[command] = (retryCount, retryDelay, retryBackoff)
+
+
+    def GetRetryPolicy(self, command):
+        """
+retryCount, retryDelay, retryBackoff = GetRetryPolicy(command)
+
+Gets the retry policy used for I2C transactions with the given command code
+        """
+        if self.retryPolicy != None:
+            policy = self.retryPolicy.get(command)
+            if policy != None:
+                return policy
+        return self.retryCount, self.retryDelay, self.retryBackoff
+
+
+    def RecordI2c(self, command, startTime, attempts, error):
+        """
+RecordI2c(command, startTime, attempts, error)
+
+Updates the I2C statistics for a completed transaction, called by RawWrite and RawRead
+error should be None if the transaction succeeded
+Starts reconnecting if autoReconnect is True and RECONNECT_FAILURES transactions in a row have failed
+        """
+        latency = time.time() - startTime
+        self.i2cStatsLock.acquire()
+        if self.i2cStats == None:
+            self.i2cStats = {}
+        stats = self.i2cStats.get(command)
+        if stats == None:
+            stats = {'transactions': 0, 'retries': 0, 'failures': 0, 'latencyTotal': 0.0, 'latencyMax': 0.0}
+            self.i2cStats[command] = stats
+        stats['transactions'] += 1
+        stats['retries'] += attempts - 1
+        stats['latencyTotal'] += latency
+        if latency > stats['latencyMax']:
+            stats['latencyMax'] = latency
+        if error != None:
+            stats['failures'] += 1
+            self.consecutiveFailures += 1
+        else:
+            self.consecutiveFailures = 0
+        lost = self.autoReconnect and (not self.reconnecting) and (self.consecutiveFailures >= RECONNECT_FAILURES)
+        if lost:
+            self.reconnecting = True
+        self.i2cStatsLock.release()
+        if error != None:
+            self.LogI2cError(command, attempts, error)
+        if lost:
+            self.StartReconnect()
+
+
+    def LogI2cError(self, command, attempts, error):
+        """
+LogI2cError(command, attempts, error)
+
+Logs a failed I2C transaction, at most once every ERROR_LOG_INTERVAL seconds for each command
+Errors which are not logged are counted and reported with the next logged error for that command
+The error is passed to errorLogFunction as a dictionary if set, otherwise it is printed using Print
+        """
+        now = time.time()
+        self.i2cStatsLock.acquire()
+        if self.i2cErrorLog == None:
+            self.i2cErrorLog = {}
+        lastLog, suppressed = self.i2cErrorLog.get(command, (0.0, 0))
+        if (now - lastLog) < ERROR_LOG_INTERVAL:
+            self.i2cErrorLog[command] = (lastLog, suppressed + 1)
+            self.i2cStatsLock.release()
+            return
+        self.i2cErrorLog[command] = (now, 0)
+        self.i2cStatsLock.release()
+        record = {
+            'time': now,
+            'board': 'PicoBorg Reverse',
+            'bus': self.busNumber,
+            'address': self.i2cAddress,
+            'command': command,
+            'name': CommandName(command),
+            'attempts': attempts,
+            'error': str(error),
+            'suppressed': suppressed,
+        }
+        if self.errorLogFunction == None:
+            self.Print('I2C error: board=%(board)s bus=%(bus)d address=%(address)02X command=%(name)s (%(command)d) attempts=%(attempts)d error="%(error)s" suppressed=%(suppressed)d' % record)
+        else:
+            self.errorLogFunction(record)
+
+
+    def GetI2cStats(self):
+        """
+stats = GetI2cStats()
+
+Gets the I2C statistics for each command code used so far as a dictionary of dictionaries, e.g.
+stats[COMMAND_GET_ID] = {'name': 'GET_ID', 'transactions': 1, 'retries': 0, 'failures': 0, 'latencyTotal': 0.0004, 'latencyMax': 0.0004}
+Latencies are in seconds and include any retries
+        """
+        result = {}
+        self.i2cStatsLock.acquire()
+        if self.i2cStats != None:
+            for command, stats in self.i2cStats.iteritems():
+                result[command] = dict(stats)
+                result[command]['name'] = CommandName(command)
+        self.i2cStatsLock.release()
+        return result
+
+
+    def ResetI2cStats(self):
+        """
+ResetI2cStats()
+
+Clears the I2C statistics collected so far
+        """
+        self.i2cStatsLock.acquire()
+        self.i2cStats = {}
+        self.i2cStatsLock.release()
+
+
+    def StartReconnect(self):
+        """
+StartReconnect()
+
+Starts reconnecting to the PicoBorg Reverse in the background, called by RecordI2c when autoReconnect is True
+I2C transactions from other threads fail immediately until the board has been reconnected
+        """
+        self.Print('PicoBorg Reverse at %02X lost after %d failed I2C transactions, reconnecting' % (self.i2cAddress, self.consecutiveFailures))
+        self.reconnecting = True
+        self.reconnectThread = threading.Thread(target = self.Reconnect)
+        self.reconnectThread.daemon = True
+        self.reconnectThread.start()
+
+
+    def Reconnect(self):
+        """
+Reconnect()
+
+Re-opens the I2C bus and waits for the PicoBorg Reverse to answer, then restores the last configuration written
+The delay between attempts starts at reconnectDelay and doubles after each failure up to reconnectDelayMax
+Under most circumstances this is called automatically, see autoReconnect
+        """
+        startTime = time.time()
+        delay = self.reconnectDelay
+        attempts = 0
+        while True:
+            time.sleep(delay)
+            attempts += 1
+            try:
+                self.i2cRead.close()
+                self.i2cWrite.close()
+            except:
+                pass
+            try:
+                self.InitBusOnly(self.busNumber, self.i2cAddress)
+                i2cRecv = self.RawRead(COMMAND_GET_ID, I2C_MAX_LEN, 1)
+                if i2cRecv[1] == I2C_ID_PICOBORG_REV:
+                    self.RestoreConfiguration()
+                    break
+            except KeyboardInterrupt:
+                raise
+            except:
+                pass
+            delay = min(delay * 2.0, self.reconnectDelayMax)
+        duration = time.time() - startTime
+        self.i2cStatsLock.acquire()
+        self.consecutiveFailures = 0
+        self.reconnects += 1
+        self.reconnectLast = duration
+        if duration > self.reconnectMax:
+            self.reconnectMax = duration
+        if self.reconnectEvents == None:
+            self.reconnectEvents = []
+        self.reconnectEvents.append((startTime, duration, attempts))
+        del self.reconnectEvents[:-RECONNECT_EVENTS]
+        self.reconnecting = False
+        self.i2cStatsLock.release()
+        self.Print('PicoBorg Reverse at %02X reconnected after %.2f seconds (%d attempts)' % (self.i2cAddress, duration, attempts))
+        if self.reconnectFunction != None:
+            self.reconnectFunction()
+
+
+    def RestoreConfiguration(self):
+        """
+RestoreConfiguration()
+
+Sends the last value written with each of the RESTORE_COMMANDS again, in the order they were originally sent
+Used after reconnecting to put the board back into the state it was in before it was lost
+        """
+        if self.restoreWrites == None:
+            return
+        for sequence, command, data in sorted(self.restoreWrites.values()):
+            self.RawWrite(command, data)
+
+
+    def GetReconnectEvents(self):
+        """
+events = GetReconnectEvents()
+
+Gets the most recent reconnections as a list of (lostTime, duration, attempts) tuples, oldest first
+lostTime is from time.time(), duration is in seconds
+        """
+        self.i2cStatsLock.acquire()
+        if self.reconnectEvents == None:
+            events = []
+        else:
+            events = list(self.reconnectEvents)
+        self.i2cStatsLock.release()
+        return events
+
+
     def InitBusOnly(self, busNumber, address):
         """
 InitBusOnly(busNumber, address)
@@ -256,10 +758,9 @@ This call does not check the board is present or working, under most circumstanc
         """
         self.busNumber = busNumber
         self.i2cAddress = address
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        if self.i2cLock == None:
+            self.i2cLock = threading.Lock()
+        self.i2cRead, self.i2cWrite = OpenI2cBus(self.busNumber, self.i2cAddress)
 
 
     def Print(self, message):
@@ -297,10 +798,9 @@ If tryOtherBus is True, this function will attempt to use the other bus if the P
         self.Print('Loading PicoBorg Reverse on bus %d, address %02X' % (self.busNumber, self.i2cAddress))
 
         # Open the bus
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        if self.i2cLock == None:
+            self.i2cLock = threading.Lock()
+        self.i2cRead, self.i2cWrite = OpenI2cBus(self.busNumber, self.i2cAddress)
 
         # Check for PicoBorg Reverse
         try:
@@ -882,6 +1382,185 @@ If a timeout is provided the function will return False after timeout seconds if
         return True
 
 
+    def EncoderMoveAsync(self, counts1, counts2 = None, timeout = None, callback = None):
+        """
+move = EncoderMoveAsync(counts1, [counts2], [timeout], [callback])
+
+Queues an encoder based move and returns straight away with an EncoderMove handle for it
+counts1 is the number of counts for motor 1, counts2 for motor 2, if counts2 is not given both motors move by counts1
+Use negative values to move in reverse, each motor can move up to 32767 counts
+Queued moves are sent one after the other, each as soon as the one before has finished
+If the move fails or takes longer than timeout seconds the motors are stopped and the rest of the queue is cancelled
+callback is called with the move from the poller thread once it has finished
+The board needs to be in encoder move mode, see SetEncoderMoveMode
+e.g.
+EncoderMoveAsync(100)          -> all motors moving forward for 100 counts
+EncoderMoveAsync(100, -100)    -> motor 1 forward and motor 2 reverse for 100 counts
+EncoderMoveAsync(50).Wait()    -> all motors moving forward for 50 counts, waiting until they have finished
+        """
+        if counts2 == None:
+            counts2 = counts1
+        move = EncoderMove(self, counts1, counts2, timeout, callback)
+        if self.moveLock == None:
+            self.moveQueue = []
+            self.moveLock = threading.Lock()
+        self.moveLock.acquire()
+        self.moveQueue.append(move)
+        self.moveLock.release()
+        GetEncoderMovePoller().Add(self)
+        return move
+
+
+    def SendEncoderMove(self, counts1, counts2):
+        """
+SendEncoderMove(counts1, counts2)
+
+Sends the commands to start an encoder based move of both motors, raises IOError if they cannot be sent
+Used by ServiceEncoderMoves, under most circumstances you should use EncoderMoveAsync instead
+        """
+        if counts1 == counts2:
+            moves = [(COMMAND_MOVE_ALL_FWD, COMMAND_MOVE_ALL_REV, counts1)]
+        else:
+            moves = [(COMMAND_MOVE_B_FWD, COMMAND_MOVE_B_REV, counts1), (COMMAND_MOVE_A_FWD, COMMAND_MOVE_A_REV, counts2)]
+        for forward, reverse, counts in moves:
+            if counts < 0:
+                command = reverse
+                counts = -counts
+            elif counts > 0:
+                command = forward
+            else:
+                continue
+            counts = min(counts, 32767)
+            self.RawWrite(command, [(counts >> 8) & 0xFF, counts & 0xFF])
+
+
+    def ServiceEncoderMoves(self):
+        """
+pending = ServiceEncoderMoves()
+
+Checks if the current encoder move has finished and sends the next queued move straight away if it has
+Returns the number of moves still queued or in progress
+Called by the EncoderMovePoller thread, under most circumstances you should not need to call this yourself
+        """
+        if self.moveLock == None:
+            return 0
+        finished = []
+        self.moveLock.acquire()
+        move = self.moveCurrent
+        if move != None:
+            state = None
+            if self.reconnecting:
+                # The board has restarted and forgotten the move
+                state = 'failed'
+            elif (move.timeout != None) and ((time.time() - move.startTime) >= move.timeout):
+                state = 'timeout'
+            else:
+                try:
+                    i2cRecv = self.RawRead(COMMAND_GET_ENC_MOVING, I2C_MAX_LEN)
+                    if i2cRecv[1] == COMMAND_VALUE_OFF:
+                        state = 'done'
+                except KeyboardInterrupt:
+                    raise
+                except:
+                    # Try again next time, the timeout covers a board which never answers
+                    pass
+            if state != None:
+                self.moveCurrent = None
+                finished.append((move, state))
+                if state != 'done':
+                    self.MotorsOff()
+                    finished.extend([(queued, 'cancelled') for queued in self.moveQueue])
+                    self.moveQueue = []
+        if (self.moveCurrent == None) and (len(self.moveQueue) > 0):
+            move = self.moveQueue.pop(0)
+            try:
+                self.SendEncoderMove(move.counts1, move.counts2)
+                move.startTime = time.time()
+                move.state = 'moving'
+                self.moveCurrent = move
+            except KeyboardInterrupt:
+                raise
+            except:
+                self.Print('Failed sending encoder move request!')
+                self.MotorsOff()
+                finished.append((move, 'failed'))
+                finished.extend([(queued, 'cancelled') for queued in self.moveQueue])
+                self.moveQueue = []
+        pending = len(self.moveQueue)
+        if self.moveCurrent != None:
+            pending += 1
+        for move, state in finished:
+            if state == 'done':
+                self.movesCompleted += 1
+            else:
+                self.movesFailed += 1
+        self.moveLock.release()
+        for move, state in finished:
+            move.Finish(state)
+        return pending
+
+
+    def GetEncoderMovesPending(self):
+        """
+pending = GetEncoderMovesPending()
+
+Returns the number of encoder moves queued with EncoderMoveAsync which have not finished yet
+        """
+        if self.moveLock == None:
+            return 0
+        self.moveLock.acquire()
+        pending = len(self.moveQueue)
+        if self.moveCurrent != None:
+            pending += 1
+        self.moveLock.release()
+        return pending
+
+
+    def CancelEncoderMove(self, move):
+        """
+CancelEncoderMove(move)
+
+Cancels a move queued with EncoderMoveAsync, the motors are stopped if the move is in progress
+Under most circumstances you should use the Cancel function of the move instead
+        """
+        if self.moveLock == None:
+            return
+        self.moveLock.acquire()
+        if move == self.moveCurrent:
+            self.MotorsOff()
+            self.moveCurrent = None
+        elif move in self.moveQueue:
+            self.moveQueue.remove(move)
+        else:
+            move = None
+        if move != None:
+            self.movesFailed += 1
+        self.moveLock.release()
+        if move != None:
+            move.Finish('cancelled')
+
+
+    def CancelEncoderMoves(self):
+        """
+CancelEncoderMoves()
+
+Cancels all moves queued with EncoderMoveAsync and stops the motors if one is in progress
+        """
+        if self.moveLock == None:
+            return
+        self.moveLock.acquire()
+        cancelled = list(self.moveQueue)
+        self.moveQueue = []
+        if self.moveCurrent != None:
+            self.MotorsOff()
+            cancelled.insert(0, self.moveCurrent)
+            self.moveCurrent = None
+        self.movesFailed += len(cancelled)
+        self.moveLock.release()
+        for move in cancelled:
+            move.Finish('cancelled')
+
+
     def SetEncoderSpeed(self, power):
         """
 SetEncoderSpeed(power)
@@ -31,6 +31,8 @@ import io
 import fcntl
 import types
 import time
+import threading
+import array
 
 # Constant values
 I2C_SLAVE                   = 0x0703
@@ -78,6 +80,44 @@ COMMAND_VALUE_OFF           = 0     # I2C value representing off
 
 COMMAND_ANALOG_MAX          = 0x3FF # Maximum value for analog readings
 
+RETRY_COUNT_DEFAULT     = 3     # Default number of attempts for each I2C transaction
+RETRY_DELAY_DEFAULT     = 0.0   # Default delay in seconds before retrying a failed I2C transaction
+RETRY_BACKOFF_DEFAULT   = 2.0   # Default multiplier applied to the retry delay after each failed attempt
+ERROR_LOG_INTERVAL      = 5.0   # Minimum time in seconds between logged errors for the same command
+RECONNECT_FAILURES      = 3     # Number of failed I2C transactions in a row before the board is treated as lost
+RECONNECT_DELAY         = 0.1   # Initial delay in seconds between reconnection attempts, doubled after each failed attempt
+RECONNECT_DELAY_MAX     = 5.0   # Longest delay in seconds between reconnection attempts
+RECONNECT_EVENTS        = 10    # Number of recent reconnections kept by each instance
+LED_FRAME_RATE_DEFAULT  = 20    # Default number of frames per second for ExternalLedAnimator
+RESTORE_COMMANDS        = [COMMAND_SET_FAILSAFE, COMMAND_SET_LED_BATT_MON, COMMAND_SET_LED1, COMMAND_SET_LED2, COMMAND_SET_LEDS, COMMAND_SET_BATT_LIMITS]  # Configuration commands sent again after reconnecting
+
+
+def CommandName(command):
+    """
+name = CommandName(command)
+
+Gets the name of a command code from the constants at the top of ThunderBorg.py, e.g. 'GET_ID' for COMMAND_GET_ID
+    """
+    for name, value in globals().iteritems():
+        if name.startswith('COMMAND_') and not name.startswith('COMMAND_VALUE_') and not name.startswith('COMMAND_ANALOG_'):
+            if value == command:
+                return name[8:]
+    return 'UNKNOWN'
+
+
+def OpenI2cBus(busNumber, address):
+    """
+i2cRead, i2cWrite = OpenI2cBus(busNumber, address)
+
+Opens the IC bus for reading and writing to the chip at address
+Replaced by boardSim.Install to talk to emulated boards instead
+    """
+    i2cRead = io.open("/dev/i2c-" + str(busNumber), "rb", buffering = 0)
+    fcntl.ioctl(i2cRead, I2C_SLAVE, address)
+    i2cWrite = io.open("/dev/i2c-" + str(busNumber), "wb", buffering = 0)
+    fcntl.ioctl(i2cWrite, I2C_SLAVE, address)
+    return i2cRead, i2cWrite
+
 
 def ScanForThunderBorg(busNumber = 1):
     """
@@ -184,6 +224,191 @@ Warning, this new I
         print 'Failed to set new IC address...'
 
 
+# Class used to buffer the colours for a strip of external LEDs
+class ExternalLedStrip:
+    """
+ExternalLedStrip(board, count)
+
+Frame buffer for a strip of SK9822 / APA102C LEDs attached to a ThunderBorg
+Set the colours with SetLed, SetLeds or SetAll, then call Show to update the strip
+Each LED is kept as the 4 byte word sent to the strip, so Show does not need to convert anything
+Show only sends the LEDs up to the last one which has changed, nothing at all if the strip is up to date
+
+count                   Number of LEDs on the strip
+shows                   Number of times Show has been called
+updates                 Number of times Show has written to the strip
+words                   Number of LED words written to the strip, not counting the start markers
+busTimeLast             Seconds spent writing to the I2C bus by the last update
+busTimeTotal            Seconds spent writing to the I2C bus by all of the updates
+busTimeMax              Longest time in seconds spent writing to the I2C bus by a single update
+    """
+
+    def __init__(self, board, count):
+        self.board = board
+        self.count = count
+        self.lock = threading.Lock()
+        self.buffer = array.array('B', [PWM_MAX, 0, 0, 0] * count)
+        self.sent = None
+        self.shows = 0
+        self.updates = 0
+        self.words = 0
+        self.busTimeLast = 0.0
+        self.busTimeTotal = 0.0
+        self.busTimeMax = 0.0
+
+
+    def SetLed(self, index, r, g, b):
+        """
+SetLed(index, r, g, b)
+
+Sets the colour of one LED in the buffer, index 0 is the LED nearest the ThunderBorg
+r, g, b are from 0 to 1, the strip is not changed until Show is called
+e.g.
+SetLed(0, 1.0, 1.0, 0.0)   -> first LED full yellow
+SetLed(4, 0.0, 0.0, 0.5)   -> fifth LED half blue
+        """
+        offset = index * 4
+        self.lock.acquire()
+        self.buffer[offset + 1] = max(0, min(PWM_MAX, int(PWM_MAX * b)))
+        self.buffer[offset + 2] = max(0, min(PWM_MAX, int(PWM_MAX * g)))
+        self.buffer[offset + 3] = max(0, min(PWM_MAX, int(PWM_MAX * r)))
+        self.lock.release()
+
+
+    def SetLeds(self, colours):
+        """
+SetLeds([[r, g, b], ..., [r, g, b]])
+
+Sets the colours of the LEDs in the buffer starting from the first LED, r, g, b are from 0 to 1
+LEDs after the end of the list are left as they are
+        """
+        for index in range(min(len(colours), self.count)):
+            r, g, b = colours[index]
+            self.SetLed(index, r, g, b)
+
+
+    def SetAll(self, r, g, b):
+        """
+SetAll(r, g, b)
+
+Sets every LED in the buffer to the same colour, r, g, b are from 0 to 1
+SetAll(0, 0, 0) turns the strip off once Show is called
+        """
+        word = [PWM_MAX, max(0, min(PWM_MAX, int(PWM_MAX * b))), max(0, min(PWM_MAX, int(PWM_MAX * g))), max(0, min(PWM_MAX, int(PWM_MAX * r)))]
+        self.lock.acquire()
+        self.buffer = array.array('B', word * self.count)
+        self.lock.release()
+
+
+    def Show(self, force = False):
+        """
+updated = Show([force])
+
+Sends the buffer to the strip, returns True if anything was written
+Only the LEDs up to the last one which has changed since the last Show are sent
+If force is True every LED is sent, e.g. after the strip has been powered off
+        """
+        self.lock.acquire()
+        buffer = self.buffer[:]
+        self.lock.release()
+        self.shows += 1
+        if force or (self.sent == None):
+            last = self.count
+        elif buffer == self.sent:
+            return False
+        else:
+            last = self.count
+            while (last > 0) and (buffer[(last - 1) * 4 : last * 4] == self.sent[(last - 1) * 4 : last * 4]):
+                last -= 1
+        startTime = time.time()
+        try:
+            # Send the start marker, then each colour in turn
+            self.board.RawWrite(COMMAND_WRITE_EXTERNAL_LED, [0, 0, 0, 0])
+            for offset in range(0, last * 4, 4):
+                self.board.RawWrite(COMMAND_WRITE_EXTERNAL_LED, buffer[offset : offset + 4])
+            self.sent = buffer
+        except KeyboardInterrupt:
+            raise
+        except:
+            # We do not know what the strip is showing now, send everything next time
+            self.board.Print('Failed sending words for the external LEDs!')
+            self.sent = None
+        busTime = time.time() - startTime
+        self.updates += 1
+        self.words += last
+        self.busTimeLast = busTime
+        self.busTimeTotal += busTime
+        if busTime > self.busTimeMax:
+            self.busTimeMax = busTime
+        return True
+
+
+# Thread used to animate a strip of external LEDs
+class ExternalLedAnimator(threading.Thread):
+    """
+ExternalLedAnimator(strip, animation, [frameRate])
+
+Background thread which calls animation(strip, seconds) up to frameRate times a second, then shows the strip
+seconds is the time since the animator was started, the animation should set the colours in the strip buffer
+The strip is only written to when the animation has changed the buffer, see ExternalLedStrip.Show
+Set terminated to True to stop the thread
+
+frames                  Number of frames the animation has been called for
+overruns                Number of frames which took longer than 1 / frameRate seconds
+    """
+
+    def __init__(self, strip, animation, frameRate = LED_FRAME_RATE_DEFAULT):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.strip = strip
+        self.animation = animation
+        self.frameRate = frameRate
+        self.frames = 0
+        self.overruns = 0
+        self.terminated = False
+        self.start()
+
+
+    def GetStats(self):
+        """
+frames, updates, busTimeMean, busTimeMax = GetStats()
+
+Gets the number of frames, the number of them which were written to the strip
+and the mean and longest I2C bus time in seconds for the frames which were written
+        """
+        updates = self.strip.updates
+        if updates > 0:
+            busTimeMean = self.strip.busTimeTotal / updates
+        else:
+            busTimeMean = 0.0
+        return self.frames, updates, busTimeMean, self.strip.busTimeMax
+
+
+    def run(self):
+        # This method runs in a separate thread
+        interval = 1.0 / self.frameRate
+        startTime = time.time()
+        nextTime = startTime
+        while not self.terminated:
+            try:
+                self.animation(self.strip, time.time() - startTime)
+            except KeyboardInterrupt:
+                raise
+            except Exception, e:
+                self.strip.board.Print('External LED animation failed: %s' % (e))
+            self.strip.Show()
+            self.frames += 1
+            # Wait for the next frame
+            nextTime += interval
+            delay = nextTime - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Running late, start counting again from now
+                self.overruns += 1
+                nextTime = time.time()
+
+
 # Class used to control ThunderBorg
 class ThunderBorg:
     """
@@ -194,6 +419,17 @@ bus                     the smbus object used to talk to the I
 i2cAddress              The IC address of the ThunderBorg chip to control
 foundChip               True if the ThunderBorg chip can be seen, False otherwise
 printFunction           Function reference to call when printing text, if None "print" is used
+retryCount              Number of attempts for each I2C transaction, see SetRetryPolicy for per command settings
+retryDelay              Delay in seconds before retrying a failed I2C transaction
+retryBackoff            Multiplier applied to the retry delay after each failed attempt
+errorLogFunction        Function reference called with a dictionary describing each logged I2C error, if None "Print" is used
+autoReconnect           True to reconnect in the background once RECONNECT_FAILURES I2C transactions in a row have failed
+reconnectDelay          Initial delay in seconds between reconnection attempts, doubled after each failed attempt
+reconnectDelayMax       Longest delay in seconds between reconnection attempts
+reconnectFunction       Function reference called after the board has been reconnected and its configuration restored
+reconnecting            True while the board is lost, other I2C transactions fail immediately until it is back
+i2cLock                 Held for each I2C transaction so threads sharing the board never interleave their writes and reads
+reconnects              Number of times the board has been reconnected
     """
 
     # Shared values used by this class
@@ -203,6 +439,28 @@ printFunction           Function reference to call when printing text, if None "
     printFunction           = None
     i2cWrite                = None
     i2cRead                 = None
+    retryCount              = RETRY_COUNT_DEFAULT
+    retryDelay              = RETRY_DELAY_DEFAULT
+    retryBackoff            = RETRY_BACKOFF_DEFAULT
+    retryPolicy             = None
+    errorLogFunction        = None
+    i2cStats                = None
+    i2cErrorLog             = None
+    i2cStatsLock            = threading.Lock()
+    i2cLock                 = None
+    autoReconnect           = False
+    reconnectDelay          = RECONNECT_DELAY
+    reconnectDelayMax       = RECONNECT_DELAY_MAX
+    reconnectFunction       = None
+    reconnecting            = False
+    reconnectThread         = None
+    reconnects              = 0
+    reconnectLast           = 0.0
+    reconnectMax            = 0.0
+    reconnectEvents         = None
+    consecutiveFailures     = 0
+    restoreWrites           = None
+    restoreSequence         = 0
 
 
     def RawWrite(self, command, data):
@@ -211,16 +469,43 @@ RawWrite(command, data)
 
 Sends a raw command on the I2C bus to the ThunderBorg
 Command codes can be found at the top of ThunderBorg.py, data is a list of 0 or more byte values
+Failed writes are retried using the retry policy for the command, see SetRetryPolicy
 
 Under most circumstances you should use the appropriate function instead of RawWrite
         """
+        if self.reconnecting and (threading.currentThread() != self.reconnectThread):
+            raise IOError('ThunderBorg at %02X is being reconnected' % (self.i2cAddress))
         rawOutput = chr(command)
         for singleByte in data:
             rawOutput += chr(singleByte)
-        self.i2cWrite.write(rawOutput)
-
-
-    def RawRead(self, command, length, retryCount = 3):
+        retryCount, retryDelay, retryBackoff = self.GetRetryPolicy(command)
+        startTime = time.time()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                self.i2cLock.acquire()
+                try:
+                    self.i2cWrite.write(rawOutput)
+                finally:
+                    self.i2cLock.release()
+                break
+            except IOError, e:
+                if attempts >= retryCount:
+                    self.RecordI2c(command, startTime, attempts, e)
+                    raise
+            if retryDelay > 0:
+                time.sleep(retryDelay)
+                retryDelay *= retryBackoff
+        self.RecordI2c(command, startTime, attempts, None)
+        if command in RESTORE_COMMANDS:
+            if self.restoreWrites == None:
+                self.restoreWrites = {}
+            self.restoreSequence += 1
+            self.restoreWrites[command] = (self.restoreSequence, command, list(data))
+
+
+    def RawRead(self, command, length, retryCount = None):
         """
 RawRead(command, length, [retryCount])
 
@@ -228,26 +513,276 @@ Reads data back from the ThunderBorg after sending a GET command
 Command codes can be found at the top of ThunderBorg.py, length is the number of bytes to read back
 
 The function checks that the first byte read back matches the requested command
-If it does not it will retry the request until retryCount is exhausted (default is 3 times)
+If it does not, or the bus reports an error, it will retry the request until retryCount is exhausted
+If retryCount is not supplied the retry policy for the command is used (default is 3 times), see SetRetryPolicy
 
 Under most circumstances you should use the appropriate function instead of RawRead
         """
-        while retryCount > 0:
-            self.RawWrite(command, [])
-            rawReply = self.i2cRead.read(length)
-            reply = []
-            for singleByte in rawReply:
-                reply.append(ord(singleByte))
-            if command == reply[0]:
-                break
-            else:
-                retryCount -= 1
-        if retryCount > 0:
+        if self.reconnecting and (threading.currentThread() != self.reconnectThread):
+            raise IOError('ThunderBorg at %02X is being reconnected' % (self.i2cAddress))
+        policyCount, retryDelay, retryBackoff = self.GetRetryPolicy(command)
+        if retryCount == None:
+            retryCount = policyCount
+        startTime = time.time()
+        attempts = 0
+        error = 'no attempts made'
+        while attempts < retryCount:
+            attempts += 1
+            try:
+                # The command and the reply are one transaction, other threads wait until both are done
+                self.i2cLock.acquire()
+                try:
+                    self.i2cWrite.write(chr(command))
+                    rawReply = self.i2cRead.read(length)
+                finally:
+                    self.i2cLock.release()
+                reply = []
+                for singleByte in rawReply:
+                    reply.append(ord(singleByte))
+                if (len(reply) > 0) and (command == reply[0]):
+                    error = None
+                    break
+                else:
+                    error = 'reply did not match the command'
+            except IOError, e:
+                error = e
+            if (attempts < retryCount) and (retryDelay > 0):
+                time.sleep(retryDelay)
+                retryDelay *= retryBackoff
+        self.RecordI2c(command, startTime, attempts, error)
+        if error == None:
             return reply
         else:
             raise IOError('I2C read for command %d failed' % (command))
 
 
+    def SetRetryPolicy(self, command, retryCount, retryDelay = RETRY_DELAY_DEFAULT, retryBackoff = RETRY_BACKOFF_DEFAULT):
+        """
+SetRetryPolicy(command, retryCount, [retryDelay], [retryBackoff])
+
+Sets how failed I2C transactions are retried for a single command code
+retryCount is the number of attempts, retryDelay is the time in seconds before the first retry
+retryBackoff multiplies the delay after each further failure, e.g. 2.0 doubles the delay each time
+Use None for command to change the default used by all commands without their own policy
+e.g.
+SetRetryPolicy(None, 5, 0.001)      -> all commands try up to 5 times, waiting 1 ms, 2 ms, 4 ms, 8 ms between attempts
+SetRetryPolicy(COMMAND_GET_ID, 1)   -> the board identifier is only read once
+        """
+        if command == None:
+            self.retryCount = retryCount
+            self.retryDelay = retryDelay
+            self.retryBackoff = retryBackoff
+        else:
+            if self.retryPolicy == None:
+                self.retryPolicy = {}
+            self.retryPolicy[command] = (retryCount, retryDelay, retryBackoff)
+
+
+    def GetRetryPolicy(self, command):
+        """
+retryCount, retryDelay, retryBackoff = GetRetryPolicy(command)
+
+Gets the retry policy used for I2C transactions with the given command code
+        """
+        if self.retryPolicy != None:
+            policy = self.retryPolicy.get(command)
+            if policy != None:
+                return policy
+        return self.retryCount, self.retryDelay, self.retryBackoff
+
+
+    def RecordI2c(self, command, startTime, attempts, error):
+        """
+RecordI2c(command, startTime, attempts, error)
+
+Updates the I2C statistics for a completed transaction, called by RawWrite and RawRead
+error should be None if the transaction succeeded
+Starts reconnecting if autoReconnect is True and RECONNECT_FAILURES transactions in a row have failed
+        """
+        latency = time.time() - startTime
+        self.i2cStatsLock.acquire()
+        if self.i2cStats == None:
+            self.i2cStats = {}
+        stats = self.i2cStats.get(command)
+        if stats == None:
+            stats = {'transactions': 0, 'retries': 0, 'failures': 0, 'latencyTotal': 0.0, 'latencyMax': 0.0}
+            self.i2cStats[command] = stats
+        stats['transactions'] += 1
+        stats['retries'] += attempts - 1
+        stats['latencyTotal'] += latency
+        if latency > stats['latencyMax']:
+            stats['latencyMax'] = latency
+        if error != None:
+            stats['failures'] += 1
+            self.consecutiveFailures += 1
+        else:
+            self.consecutiveFailures = 0
+        lost = self.autoReconnect and (not self.reconnecting) and (self.consecutiveFailures >= RECONNECT_FAILURES)
+        if lost:
+            self.reconnecting = True
+        self.i2cStatsLock.release()
+        if error != None:
+            self.LogI2cError(command, attempts, error)
+        if lost:
+            self.StartReconnect()
+
+
+    def LogI2cError(self, command, attempts, error):
+        """
+LogI2cError(command, attempts, error)
+
+Logs a failed I2C transaction, at most once every ERROR_LOG_INTERVAL seconds for each command
+Errors which are not logged are counted and reported with the next logged error for that command
+The error is passed to errorLogFunction as a dictionary if set, otherwise it is printed using Print
+        """
+        now = time.time()
+        self.i2cStatsLock.acquire()
+        if self.i2cErrorLog == None:
+            self.i2cErrorLog = {}
+        lastLog, suppressed = self.i2cErrorLog.get(command, (0.0, 0))
+        if (now - lastLog) < ERROR_LOG_INTERVAL:
+            self.i2cErrorLog[command] = (lastLog, suppressed + 1)
+            self.i2cStatsLock.release()
+            return
+        self.i2cErrorLog[command] = (now, 0)
+        self.i2cStatsLock.release()
+        record = {
+            'time': now,
+            'board': 'ThunderBorg',
+            'bus': self.busNumber,
+            'address': self.i2cAddress,
+            'command': command,
+            'name': CommandName(command),
+            'attempts': attempts,
+            'error': str(error),
+            'suppressed': suppressed,
+        }
+        if self.errorLogFunction == None:
+            self.Print('I2C error: board=%(board)s bus=%(bus)d address=%(address)02X command=%(name)s (%(command)d) attempts=%(attempts)d error="%(error)s" suppressed=%(suppressed)d' % record)
+        else:
+            self.errorLogFunction(record)
+
+
+    def GetI2cStats(self):
+        """
+stats = GetI2cStats()
+
+Gets the I2C statistics for each command code used so far as a dictionary of dictionaries, e.g.
+stats[COMMAND_GET_ID] = {'name': 'GET_ID', 'transactions': 1, 'retries': 0, 'failures': 0, 'latencyTotal': 0.0004, 'latencyMax': 0.0004}
+Latencies are in seconds and include any retries
+        """
+        result = {}
+        self.i2cStatsLock.acquire()
+        if self.i2cStats != None:
+            for command, stats in self.i2cStats.iteritems():
+                result[command] = dict(stats)
+                result[command]['name'] = CommandName(command)
+        self.i2cStatsLock.release()
+        return result
+
+
+    def ResetI2cStats(self):
+        """
+ResetI2cStats()
+
+Clears the I2C statistics collected so far
+        """
+        self.i2cStatsLock.acquire()
+        self.i2cStats = {}
+        self.i2cStatsLock.release()
+
+
+    def StartReconnect(self):
+        """
+StartReconnect()
+
+Starts reconnecting to the ThunderBorg in the background, called by RecordI2c when autoReconnect is True
+I2C transactions from other threads fail immediately until the board has been reconnected
+        """
+        self.Print('ThunderBorg at %02X lost after %d failed I2C transactions, reconnecting' % (self.i2cAddress, self.consecutiveFailures))
+        self.reconnecting = True
+        self.reconnectThread = threading.Thread(target = self.Reconnect)
+        self.reconnectThread.daemon = True
+        self.reconnectThread.start()
+
+
+    def Reconnect(self):
+        """
+Reconnect()
+
+Re-opens the I2C bus and waits for the ThunderBorg to answer, then restores the last configuration written
+The delay between attempts starts at reconnectDelay and doubles after each failure up to reconnectDelayMax
+Under most circumstances this is called automatically, see autoReconnect
+        """
+        startTime = time.time()
+        delay = self.reconnectDelay
+        attempts = 0
+        while True:
+            time.sleep(delay)
+            attempts += 1
+            try:
+                self.i2cRead.close()
+                self.i2cWrite.close()
+            except:
+                pass
+            try:
+                self.InitBusOnly(self.busNumber, self.i2cAddress)
+                i2cRecv = self.RawRead(COMMAND_GET_ID, I2C_MAX_LEN, 1)
+                if i2cRecv[1] == I2C_ID_THUNDERBORG:
+                    self.RestoreConfiguration()
+                    break
+            except KeyboardInterrupt:
+                raise
+            except:
+                pass
+            delay = min(delay * 2.0, self.reconnectDelayMax)
+        duration = time.time() - startTime
+        self.i2cStatsLock.acquire()
+        self.consecutiveFailures = 0
+        self.reconnects += 1
+        self.reconnectLast = duration
+        if duration > self.reconnectMax:
+            self.reconnectMax = duration
+        if self.reconnectEvents == None:
+            self.reconnectEvents = []
+        self.reconnectEvents.append((startTime, duration, attempts))
+        del self.reconnectEvents[:-RECONNECT_EVENTS]
+        self.reconnecting = False
+        self.i2cStatsLock.release()
+        self.Print('ThunderBorg at %02X reconnected after %.2f seconds (%d attempts)' % (self.i2cAddress, duration, attempts))
+        if self.reconnectFunction != None:
+            self.reconnectFunction()
+
+
+    def RestoreConfiguration(self):
+        """
+RestoreConfiguration()
+
+Sends the last value written with each of the RESTORE_COMMANDS again, in the order they were originally sent
+Used after reconnecting to put the board back into the state it was in before it was lost
+        """
+        if self.restoreWrites == None:
+            return
+        for sequence, command, data in sorted(self.restoreWrites.values()):
+            self.RawWrite(command, data)
+
+
+    def GetReconnectEvents(self):
+        """
+events = GetReconnectEvents()
+
+Gets the most recent reconnections as a list of (lostTime, duration, attempts) tuples, oldest first
+lostTime is from time.time(), duration is in seconds
+        """
+        self.i2cStatsLock.acquire()
+        if self.reconnectEvents == None:
+            events = []
+        else:
+            events = list(self.reconnectEvents)
+        self.i2cStatsLock.release()
+        return events
+
+
     def InitBusOnly(self, busNumber, address):
         """
 InitBusOnly(busNumber, address)
@@ -257,10 +792,9 @@ This call does not check the board is present or working, under most circumstanc
         """
         self.busNumber = busNumber
         self.i2cAddress = address
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        if self.i2cLock == None:
+            self.i2cLock = threading.Lock()
+        self.i2cRead, self.i2cWrite = OpenI2cBus(self.busNumber, self.i2cAddress)
 
 
     def Print(self, message):
@@ -298,10 +832,9 @@ If tryOtherBus is True, this function will attempt to use the other bus if the T
         self.Print('Loading ThunderBorg on bus %d, address %02X' % (self.busNumber, self.i2cAddress))
 
         # Open the bus
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        if self.i2cLock == None:
+            self.i2cLock = threading.Lock()
+        self.i2cRead, self.i2cWrite = OpenI2cBus(self.busNumber, self.i2cAddress)
 
         # Check for ThunderBorg
         try:
@@ -883,6 +1416,7 @@ SetExternalLedColours([[1.0, 1.0, 0.0]])
 will set a single LED to full yellow.
 SetExternalLedColours([[1.0, 0.0, 0.0], [0.5, 0.0, 0.0], [0.0, 0.0, 0.0]])
 will set LED 1 to full red, LED 2 to half red, and LED 3 to off.
+For strips which are updated often use ExternalLedStrip instead, it only sends the LEDs which have changed.
         """
         # Send the start marker
         self.WriteExternalLedWord(0, 0, 0, 0)
@@ -31,6 +31,7 @@ import io
 import fcntl
 import types
 import time
+import threading
 
 # Constant values
 I2C_SLAVE               = 0x0703
@@ -82,6 +83,44 @@ COMMAND_ANALOG_MAX      = 0x3FF # Maximum value for analog readings
 
 IR_MAX_BYTES            = I2C_LONG_LEN - 2
 
+RETRY_COUNT_DEFAULT     = 3     # Default number of attempts for each I2C transaction
+RETRY_DELAY_DEFAULT     = 0.0   # Default delay in seconds before retrying a failed I2C transaction
+RETRY_BACKOFF_DEFAULT   = 2.0   # Default multiplier applied to the retry delay after each failed attempt
+ERROR_LOG_INTERVAL      = 5.0   # Minimum time in seconds between logged errors for the same command
+RECONNECT_FAILURES      = 3     # Number of failed I2C transactions in a row before the board is treated as lost
+RECONNECT_DELAY         = 0.1   # Initial delay in seconds between reconnection attempts, doubled after each failed attempt
+RECONNECT_DELAY_MAX     = 5.0   # Longest delay in seconds between reconnection attempts
+RECONNECT_EVENTS        = 10    # Number of recent reconnections kept by each instance
+RESTORE_COMMANDS        = [COMMAND_SET_FAILSAFE, COMMAND_SET_EPO_IGNORE, COMMAND_SET_LED, COMMAND_SET_LED_IR]  # Configuration commands sent again after reconnecting
+
+
+def CommandName(command):
+    """
+name = CommandName(command)
+
+Gets the name of a command code from the constants at the top of ZeroBorg.py, e.g. 'GET_ID' for COMMAND_GET_ID
+    """
+    for name, value in globals().iteritems():
+        if name.startswith('COMMAND_') and not name.startswith('COMMAND_VALUE_') and not name.startswith('COMMAND_ANALOG_'):
+            if value == command:
+                return name[8:]
+    return 'UNKNOWN'
+
+
+def OpenI2cBus(busNumber, address):
+    """
+i2cRead, i2cWrite = OpenI2cBus(busNumber, address)
+
+Opens the IC bus for reading and writing to the chip at address
+Replaced by boardSim.Install to talk to emulated boards instead
+    """
+    i2cRead = io.open("/dev/i2c-" + str(busNumber), "rb", buffering = 0)
+    fcntl.ioctl(i2cRead, I2C_SLAVE, address)
+    i2cWrite = io.open("/dev/i2c-" + str(busNumber), "wb", buffering = 0)
+    fcntl.ioctl(i2cWrite, I2C_SLAVE, address)
+    return i2cRead, i2cWrite
+
+
 def ScanForZeroBorg(busNumber = 1):
     """
 ScanForZeroBorg([busNumber])
@@ -197,6 +236,17 @@ bus                     the smbus object used to talk to the I
 i2cAddress              The IC address of the ZeroBorg chip to control
 foundChip               True if the ZeroBorg chip can be seen, False otherwise
 printFunction           Function reference to call when printing text, if None "print" is used
+retryCount              Number of attempts for each I2C transaction, see SetRetryPolicy for per command settings
+retryDelay              Delay in seconds before retrying a failed I2C transaction
+retryBackoff            Multiplier applied to the retry delay after each failed attempt
+errorLogFunction        Function reference called with a dictionary describing each logged I2C error, if None "Print" is used
+autoReconnect           True to reconnect in the background once RECONNECT_FAILURES I2C transactions in a row have failed
+reconnectDelay          Initial delay in seconds between reconnection attempts, doubled after each failed attempt
+reconnectDelayMax       Longest delay in seconds between reconnection attempts
+reconnectFunction       Function reference called after the board has been reconnected and its configuration restored
+reconnecting            True while the board is lost, other I2C transactions fail immediately until it is back
+i2cLock                 Held for each I2C transaction so threads sharing the board never interleave their writes and reads
+reconnects              Number of times the board has been reconnected
     """
 
     # Shared values used by this class
@@ -206,6 +256,30 @@ printFunction           Function reference to call when printing text, if None "
     printFunction           = None
     i2cWrite                = None
     i2cRead                 = None
+    retryCount              = RETRY_COUNT_DEFAULT
+    retryDelay              = RETRY_DELAY_DEFAULT
+    retryBackoff            = RETRY_BACKOFF_DEFAULT
+    retryPolicy             = None
+    errorLogFunction        = None
+    i2cStats                = None
+    i2cErrorLog             = None
+    i2cStatsLock            = threading.Lock()
+    i2cLock                 = None
+    autoReconnect           = False
+    reconnectDelay          = RECONNECT_DELAY
+    reconnectDelayMax       = RECONNECT_DELAY_MAX
+    reconnectFunction       = None
+    reconnecting            = False
+    reconnectThread         = None
+    reconnects              = 0
+    reconnectLast           = 0.0
+    reconnectMax            = 0.0
+    reconnectEvents         = None
+    irPollCommand           = chr(COMMAND_GET_NEW_IR)
+    irPollBuffer            = None
+    consecutiveFailures     = 0
+    restoreWrites           = None
+    restoreSequence         = 0
 
 
     def RawWrite(self, command, data):
@@ -214,16 +288,43 @@ RawWrite(command, data)
 
 Sends a raw command on the I2C bus to the ZeroBorg
 Command codes can be found at the top of ZeroBorg.py, data is a list of 0 or more byte values
+Failed writes are retried using the retry policy for the command, see SetRetryPolicy
 
 Under most circumstances you should use the appropriate function instead of RawWrite
         """
+        if self.reconnecting and (threading.currentThread() != self.reconnectThread):
+            raise IOError('ZeroBorg at %02X is being reconnected' % (self.i2cAddress))
         rawOutput = chr(command)
         for singleByte in data:
             rawOutput += chr(singleByte)
-        self.i2cWrite.write(rawOutput)
-
-
-    def RawRead(self, command, length, retryCount = 3):
+        retryCount, retryDelay, retryBackoff = self.GetRetryPolicy(command)
+        startTime = time.time()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                self.i2cLock.acquire()
+                try:
+                    self.i2cWrite.write(rawOutput)
+                finally:
+                    self.i2cLock.release()
+                break
+            except IOError, e:
+                if attempts >= retryCount:
+                    self.RecordI2c(command, startTime, attempts, e)
+                    raise
+            if retryDelay > 0:
+                time.sleep(retryDelay)
+                retryDelay *= retryBackoff
+        self.RecordI2c(command, startTime, attempts, None)
+        if command in RESTORE_COMMANDS:
+            if self.restoreWrites == None:
+                self.restoreWrites = {}
+            self.restoreSequence += 1
+            self.restoreWrites[command] = (self.restoreSequence, command, list(data))
+
+
+    def RawRead(self, command, length, retryCount = None):
         """
 RawRead(command, length, [retryCount])
 
@@ -231,26 +332,276 @@ Reads data back from the ZeroBorg after sending a GET command
 Command codes can be found at the top of ZeroBorg.py, length is the number of bytes to read back
 
 The function checks that the first byte read back matches the requested command
-If it does not it will retry the request until retryCount is exhausted (default is 3 times)
+If it does not, or the bus reports an error, it will retry the request until retryCount is exhausted
+If retryCount is not supplied the retry policy for the command is used (default is 3 times), see SetRetryPolicy
 
 Under most circumstances you should use the appropriate function instead of RawRead
         """
-        while retryCount > 0:
-            self.RawWrite(command, [])
-            rawReply = self.i2cRead.read(length)
-            reply = []
-            for singleByte in rawReply:
-                reply.append(ord(singleByte))
-            if command == reply[0]:
-                break
-            else:
-                retryCount -= 1
-        if retryCount > 0:
+        if self.reconnecting and (threading.currentThread() != self.reconnectThread):
+            raise IOError('ZeroBorg at %02X is being reconnected' % (self.i2cAddress))
+        policyCount, retryDelay, retryBackoff = self.GetRetryPolicy(command)
+        if retryCount == None:
+            retryCount = policyCount
+        startTime = time.time()
+        attempts = 0
+        error = 'no attempts made'
+        while attempts < retryCount:
+            attempts += 1
+            try:
+                # The command and the reply are one transaction, other threads wait until both are done
+                self.i2cLock.acquire()
+                try:
+                    self.i2cWrite.write(chr(command))
+                    rawReply = self.i2cRead.read(length)
+                finally:
+                    self.i2cLock.release()
+                reply = []
+                for singleByte in rawReply:
+                    reply.append(ord(singleByte))
+                if (len(reply) > 0) and (command == reply[0]):
+                    error = None
+                    break
+                else:
+                    error = 'reply did not match the command'
+            except IOError, e:
+                error = e
+            if (attempts < retryCount) and (retryDelay > 0):
+                time.sleep(retryDelay)
+                retryDelay *= retryBackoff
+        self.RecordI2c(command, startTime, attempts, error)
+        if error == None:
             return reply
         else:
             raise IOError('I2C read for command %d failed' % (command))
 
 
+    def SetRetryPolicy(self, command, retryCount, retryDelay = RETRY_DELAY_DEFAULT, retryBackoff = RETRY_BACKOFF_DEFAULT):
+        """
+SetRetryPolicy(command, retryCount, [retryDelay], [retryBackoff])
+
+Sets how failed I2C transactions are retried for a single command code
+retryCount is the number of attempts, retryDelay is the time in seconds before the first retry
+retryBackoff multiplies the delay after each further failure, e.g. 2.0 doubles the delay each time
+Use None for command to change the default used by all commands without their own policy
+e.g.
+SetRetryPolicy(None, 5, 0.001)      -> all commands try up to 5 times, waiting 1 ms, 2 ms, 4 ms, 8 ms between attempts
+SetRetryPolicy(COMMAND_GET_ID, 1)   -> the board identifier is only read once
+        """
+        if command == None:
+            self.retryCount = retryCount
+            self.retryDelay = retryDelay
+            self.retryBackoff = retryBackoff
+        else:
+            if self.retryPolicy == None:
+                self.retryPolicy = {}
+            self.retryPolicy[command] = (retryCount, retryDelay, retryBackoff)
+
+
+    def GetRetryPolicy(self, command):
+        """
+retryCount, retryDelay, retryBackoff = GetRetryPolicy(command)
+
+Gets the retry policy used for I2C transactions with the given command code
+        """
+        if self.retryPolicy != None:
+            policy = self.retryPolicy.get(command)
+            if policy != None:
+                return policy
+        return self.retryCount, self.retryDelay, self.retryBackoff
+
+
+    def RecordI2c(self, command, startTime, attempts, error):
+        """
+RecordI2c(command, startTime, attempts, error)
+
+Updates the I2C statistics for a completed transaction, called by RawWrite and RawRead
+error should be None if the transaction succeeded
+Starts reconnecting if autoReconnect is True and RECONNECT_FAILURES transactions in a row have failed
+        """
+        latency = time.time() - startTime
+        self.i2cStatsLock.acquire()
+        if self.i2cStats == None:
+            self.i2cStats = {}
+        stats = self.i2cStats.get(command)
+        if stats == None:
+            stats = {'transactions': 0, 'retries': 0, 'failures': 0, 'latencyTotal': 0.0, 'latencyMax': 0.0}
+            self.i2cStats[command] = stats
+        stats['transactions'] += 1
+        stats['retries'] += attempts - 1
+        stats['latencyTotal'] += latency
+        if latency > stats['latencyMax']:
+            stats['latencyMax'] = latency
+        if error != None:
+            stats['failures'] += 1
+            self.consecutiveFailures += 1
+        else:
+            self.consecutiveFailures = 0
+        lost = self.autoReconnect and (not self.reconnecting) and (self.consecutiveFailures >= RECONNECT_FAILURES)
+        if lost:
+            self.reconnecting = True
+        self.i2cStatsLock.release()
+        if error != None:
+            self.LogI2cError(command, attempts, error)
+        if lost:
+            self.StartReconnect()
+
+
+    def LogI2cError(self, command, attempts, error):
+        """
+LogI2cError(command, attempts, error)
+
+Logs a failed I2C transaction, at most once every ERROR_LOG_INTERVAL seconds for each command
+Errors which are not logged are counted and reported with the next logged error for that command
+The error is passed to errorLogFunction as a dictionary if set, otherwise it is printed using Print
+        """
+        now = time.time()
+        self.i2cStatsLock.acquire()
+        if self.i2cErrorLog == None:
+            self.i2cErrorLog = {}
+        lastLog, suppressed = self.i2cErrorLog.get(command, (0.0, 0))
+        if (now - lastLog) < ERROR_LOG_INTERVAL:
+            self.i2cErrorLog[command] = (lastLog, suppressed + 1)
+            self.i2cStatsLock.release()
+            return
+        self.i2cErrorLog[command] = (now, 0)
+        self.i2cStatsLock.release()
+        record = {
+            'time': now,
+            'board': 'ZeroBorg',
+            'bus': self.busNumber,
+            'address': self.i2cAddress,
+            'command': command,
+            'name': CommandName(command),
+            'attempts': attempts,
+            'error': str(error),
+            'suppressed': suppressed,
+        }
+        if self.errorLogFunction == None:
+            self.Print('I2C error: board=%(board)s bus=%(bus)d address=%(address)02X command=%(name)s (%(command)d) attempts=%(attempts)d error="%(error)s" suppressed=%(suppressed)d' % record)
+        else:
+            self.errorLogFunction(record)
+
+
+    def GetI2cStats(self):
+        """
+stats = GetI2cStats()
+
+Gets the I2C statistics for each command code used so far as a dictionary of dictionaries, e.g.
+stats[COMMAND_GET_ID] = {'name': 'GET_ID', 'transactions': 1, 'retries': 0, 'failures': 0, 'latencyTotal': 0.0004, 'latencyMax': 0.0004}
+Latencies are in seconds and include any retries
+        """
+        result = {}
+        self.i2cStatsLock.acquire()
+        if self.i2cStats != None:
+            for command, stats in self.i2cStats.iteritems():
+                result[command] = dict(stats)
+                result[command]['name'] = CommandName(command)
+        self.i2cStatsLock.release()
+        return result
+
+
+    def ResetI2cStats(self):
+        """
+ResetI2cStats()
+
+Clears the I2C statistics collected so far
+        """
+        self.i2cStatsLock.acquire()
+        self.i2cStats = {}
+        self.i2cStatsLock.release()
+
+
+    def StartReconnect(self):
+        """
+StartReconnect()
+
+Starts reconnecting to the ZeroBorg in the background, called by RecordI2c when autoReconnect is True
+I2C transactions from other threads fail immediately until the board has been reconnected
+        """
+        self.Print('ZeroBorg at %02X lost after %d failed I2C transactions, reconnecting' % (self.i2cAddress, self.consecutiveFailures))
+        self.reconnecting = True
+        self.reconnectThread = threading.Thread(target = self.Reconnect)
+        self.reconnectThread.daemon = True
+        self.reconnectThread.start()
+
+
+    def Reconnect(self):
+        """
+Reconnect()
+
+Re-opens the I2C bus and waits for the ZeroBorg to answer, then restores the last configuration written
+The delay between attempts starts at reconnectDelay and doubles after each failure up to reconnectDelayMax
+Under most circumstances this is called automatically, see autoReconnect
+        """
+        startTime = time.time()
+        delay = self.reconnectDelay
+        attempts = 0
+        while True:
+            time.sleep(delay)
+            attempts += 1
+            try:
+                self.i2cRead.close()
+                self.i2cWrite.close()
+            except:
+                pass
+            try:
+                self.InitBusOnly(self.busNumber, self.i2cAddress)
+                i2cRecv = self.RawRead(COMMAND_GET_ID, I2C_NORM_LEN, 1)
+                if i2cRecv[1] == I2C_ID_ZEROBORG:
+                    self.RestoreConfiguration()
+                    break
+            except KeyboardInterrupt:
+                raise
+            except:
+                pass
+            delay = min(delay * 2.0, self.reconnectDelayMax)
+        duration = time.time() - startTime
+        self.i2cStatsLock.acquire()
+        self.consecutiveFailures = 0
+        self.reconnects += 1
+        self.reconnectLast = duration
+        if duration > self.reconnectMax:
+            self.reconnectMax = duration
+        if self.reconnectEvents == None:
+            self.reconnectEvents = []
+        self.reconnectEvents.append((startTime, duration, attempts))
+        del self.reconnectEvents[:-RECONNECT_EVENTS]
+        self.reconnecting = False
+        self.i2cStatsLock.release()
+        self.Print('ZeroBorg at %02X reconnected after %.2f seconds (%d attempts)' % (self.i2cAddress, duration, attempts))
+        if self.reconnectFunction != None:
+            self.reconnectFunction()
+
+
+    def RestoreConfiguration(self):
+        """
+RestoreConfiguration()
+
+Sends the last value written with each of the RESTORE_COMMANDS again, in the order they were originally sent
+Used after reconnecting to put the board back into the state it was in before it was lost
+        """
+        if self.restoreWrites == None:
+            return
+        for sequence, command, data in sorted(self.restoreWrites.values()):
+            self.RawWrite(command, data)
+
+
+    def GetReconnectEvents(self):
+        """
+events = GetReconnectEvents()
+
+Gets the most recent reconnections as a list of (lostTime, duration, attempts) tuples, oldest first
+lostTime is from time.time(), duration is in seconds
+        """
+        self.i2cStatsLock.acquire()
+        if self.reconnectEvents == None:
+            events = []
+        else:
+            events = list(self.reconnectEvents)
+        self.i2cStatsLock.release()
+        return events
+
+
     def InitBusOnly(self, busNumber, address):
         """
 InitBusOnly(busNumber, address)
@@ -260,10 +611,9 @@ This call does not check the board is present or working, under most circumstanc
         """
         self.busNumber = busNumber
         self.i2cAddress = address
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        if self.i2cLock == None:
+            self.i2cLock = threading.Lock()
+        self.i2cRead, self.i2cWrite = OpenI2cBus(self.busNumber, self.i2cAddress)
 
 
     def Print(self, message):
@@ -301,10 +651,9 @@ If tryOtherBus is True, this function will attempt to use the other bus if the T
         self.Print('Loading ZeroBorg on bus %d, address %02X' % (self.busNumber, self.i2cAddress))
 
         # Open the bus
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        if self.i2cLock == None:
+            self.i2cLock = threading.Lock()
+        self.i2cRead, self.i2cWrite = OpenI2cBus(self.busNumber, self.i2cAddress)
 
         # Check for ZeroBorg
         try:
@@ -769,6 +1118,37 @@ If True there has been a new IR message which can be read using GetIrMessage().
             return True
 
 
+    def PollIr(self):
+        """
+state = PollIr()
+
+Low overhead version of HasNewIrMessage() for checking the new IR message received flag in a loop.
+The same buffer is reused for every call and there are no retries, a failed poll is counted and logged like any other transaction.
+Returns True if there is a new IR message, False if not, None if the flag could not be read.
+        """ 
+        if self.reconnecting:
+            return None
+        if self.irPollBuffer == None:
+            self.irPollBuffer = bytearray(I2C_NORM_LEN)
+        startTime = time.time()
+        error = None
+        self.i2cLock.acquire()
+        try:
+            self.i2cWrite.write(self.irPollCommand)
+            if self.i2cRead.readinto(self.irPollBuffer) != I2C_NORM_LEN:
+                error = 'short reply'
+        except IOError, e:
+            error = e
+        finally:
+            self.i2cLock.release()
+        if (error == None) and (self.irPollBuffer[0] != COMMAND_GET_NEW_IR):
+            error = 'reply did not match the command'
+        self.RecordI2c(COMMAND_GET_NEW_IR, startTime, 1, error)
+        if error != None:
+            return None
+        return self.irPollBuffer[1] != COMMAND_VALUE_OFF
+
+
     def GetIrMessage(self):
         """
 message = GetIrMessage()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# coding: latin-1
+
+# Times the camera frame output, the change compare, flip, JPEG encode and publish stages from robotWeb.py, on recorded frames
+# Usage: ./benchCapture.py frames.npy [photo.jpg ... | video.h264]
+# The first time frames.npy is recorded from the photos or video given, or from the emulated camera test pattern
+# The frames are kept as raw BGR on disk and memory-mapped, a copy is made for each resolution tested
+
+# Load library functions we want
+import sys
+import os
+import time
+import json
+import threading
+import Queue
+import numpy
+import cv2
+import cameraSim
+import robotWeb
+
+# Settings for the test
+resolutions = [(240, 180), (320, 240), (640, 480)]  # Image sizes to test, (width, height)
+jpegQualities = [50, 80]                # JPEG quality levels to test
+flips = [False, True]                   # Values of flippedCamera to test
+changeThresholds = [0.0, 1.5]           # Values of changeThreshold to test, 0 sends every frame
+workerCounts = [1, 2, 4]                # Numbers of threads working on frames at the same time
+frameRates = [None, 30]                 # Frame rates to test, None sends frames as fast as they can be taken
+framesPerRun = 300                      # Number of frames put through for each test
+recordFrames = 100                      # Number of frames recorded into frames.npy
+outputFile = 'benchCapture.json'        # Machine readable results
+
+# Loads the frames for a resolution memory-mapped, making the file from the recording the first time
+def LoadFrames(fileName, resolution):
+    width, height = resolution
+    sizedName = '%s-%dx%d.npy' % (os.path.splitext(fileName)[0], width, height)
+    if not os.path.isfile(sizedName):
+        recorded = numpy.load(fileName, mmap_mode = 'r')
+        sized = numpy.zeros((len(recorded), height, width, 3), numpy.uint8)
+        for index in range(len(recorded)):
+            sized[index] = cv2.resize(recorded[index], resolution, interpolation = cv2.INTER_AREA)
+        numpy.save(sizedName, sized)
+    return numpy.load(sizedName, mmap_mode = 'r')
+
+# Records the frames from photos, a video or the test pattern at the largest resolution tested
+def RecordFrames(fileName, sources):
+    resolution = max(resolutions)
+    cameraSim.replayFlip = False
+    if len(sources) == 1:
+        frames = cameraSim.LoadReplayFrames(sources[0], resolution)
+    elif len(sources) > 1:
+        frames = []
+        for source in sources:
+            image = cv2.imread(source)
+            if image is not None:
+                frames.append(cv2.resize(image, resolution, interpolation = cv2.INTER_AREA))
+    else:
+        cameraSim.patternFrames = recordFrames
+        frames = cameraSim.MakePatternFrames(resolution)
+    if len(frames) == 0:
+        print 'No frames could be loaded'
+        sys.exit()
+    numpy.save(fileName, numpy.array(frames[:recordFrames], numpy.uint8))
+    print 'Recorded %d frames at %dx%d to %s' % (min(len(frames), recordFrames), resolution[0], resolution[1], fileName)
+
+# Worker thread, puts frames through the same stages as the stream processor and times each one
+# Frames which have not changed are skipped after the compare, like the stream processor does
+class Worker(threading.Thread):
+    def __init__(self, frames, work):
+        super(Worker, self).__init__()
+        self.frames = frames
+        self.work = work
+        self.stageTotals = {'compare': 0.0, 'flip': 0.0, 'encode': 0.0, 'publish': 0.0}
+        self.lastSmall = None
+        self.count = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.start()
+
+    def run(self):
+        while True:
+            index = self.work.get()
+            if index == None:
+                break
+            image = self.frames[index % len(self.frames)]
+            time1 = robotWeb.MonotonicTime()
+            changed, small = robotWeb.CompareFrame(image, self.lastSmall)
+            time2 = robotWeb.MonotonicTime()
+            self.stageTotals['compare'] += time2 - time1
+            self.count += 1
+            if not changed:
+                self.skipped += 1
+                continue
+            self.lastSmall = small
+            flipped = robotWeb.FlipFrame(image)
+            time3 = robotWeb.MonotonicTime()
+            thisFrame = robotWeb.EncodeFrame(flipped)
+            time4 = robotWeb.MonotonicTime()
+            robotWeb.PublishFrame(thisFrame)
+            time5 = robotWeb.MonotonicTime()
+            self.stageTotals['flip'] += time3 - time2
+            self.stageTotals['encode'] += time4 - time3
+            self.stageTotals['publish'] += time5 - time4
+            self.bytes += len(thisFrame)
+
+# Runs one test, frames are offered at frameRate and dropped if every worker is busy, like the camera does
+def RunTest(frames, workerCount, frameRate):
+    work = Queue.Queue()
+    workers = [Worker(frames, work) for i in range(workerCount)]
+    dropped = 0
+    startTime = robotWeb.MonotonicTime()
+    if frameRate == None:
+        for index in range(framesPerRun):
+            work.put(index)
+    else:
+        interval = 1.0 / frameRate
+        for index in range(framesPerRun):
+            delay = startTime + index * interval - robotWeb.MonotonicTime()
+            if delay > 0:
+                time.sleep(delay)
+            if work.qsize() >= workerCount:
+                dropped += 1
+            else:
+                work.put(index)
+    for worker in workers:
+        work.put(None)
+    for worker in workers:
+        worker.join()
+    seconds = robotWeb.MonotonicTime() - startTime
+    count = sum([worker.count for worker in workers])
+    skipped = sum([worker.skipped for worker in workers])
+    sent = count - skipped
+    result = {'fps': count / seconds, 'frames': count, 'dropped': dropped, 'skipped': skipped,
+              'bytesPerFrame': sum([worker.bytes for worker in workers]) / float(max(sent, 1))}
+    # The compare is timed for every frame, the later stages only for the frames which were sent
+    result['compareMs'] = sum([worker.stageTotals['compare'] for worker in workers]) * 1000.0 / max(count, 1)
+    for stage in ('flip', 'encode', 'publish'):
+        result[stage + 'Ms'] = sum([worker.stageTotals[stage] for worker in workers]) * 1000.0 / max(sent, 1)
+    return result
+
+# Load the recorded frames
+if len(sys.argv) < 2:
+    print 'Usage: %s frames.npy [photo.jpg ... | video.h264]' % (sys.argv[0])
+    sys.exit()
+fileName = sys.argv[1]
+if not os.path.isfile(fileName):
+    RecordFrames(fileName, sys.argv[2:])
+
+# Run every combination of the settings
+results = []
+print 'Size      Quality  Flip   Change  Workers  Rate  fps     Dropped  Skipped  Compare ms  Flip ms  Encode ms  Publish ms  Bytes/frame'
+for resolution in resolutions:
+    frames = LoadFrames(fileName, resolution)
+    for jpegQuality in jpegQualities:
+        for flip in flips:
+            for changeThreshold in changeThresholds:
+                robotWeb.jpegQuality = jpegQuality
+                robotWeb.flippedCamera = flip
+                robotWeb.changeThreshold = changeThreshold
+                for workerCount in workerCounts:
+                    for frameRate in frameRates:
+                        result = RunTest(frames, workerCount, frameRate)
+                        result.update({'width': resolution[0], 'height': resolution[1], 'jpegQuality': jpegQuality,
+                                       'flip': flip, 'changeThreshold': changeThreshold, 'workers': workerCount, 'frameRate': frameRate})
+                        results.append(result)
+                        if frameRate == None:
+                            rate = 'max'
+                        else:
+                            rate = '%d' % (frameRate)
+                        print '%-9s %7d  %-5s  %6.1f  %7d  %4s  %6.1f  %7d  %7d  %10.3f  %7.3f  %9.3f  %10.3f  %11.0f' % ('%dx%d' % resolution, jpegQuality, flip,
+                                                                                                                 changeThreshold, workerCount, rate,
+                                                                                                                 result['fps'], result['dropped'], result['skipped'],
+                                                                                                                 result['compareMs'], result['flipMs'], result['encodeMs'],
+                                                                                                                 result['publishMs'], result['bytesPerFrame'])
+outputJson = open(outputFile, 'w')
+json.dump(results, outputJson, indent = 2, sort_keys = True)
+outputJson.close()
+print 'Results written to %s' % (outputFile)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# coding: latin-1
+
+# Times each I2C command used by robotWeb.py, on the real bus or on the emulated board
+# Usage: ./benchI2c.py [--simulate] [robot] [output.json]
+# Each command is timed with the normal retries and again with a single attempt
+# From the drive command times it works out how much of the bus is left for sensors at the control rate
+
+# Load library functions we want
+import sys
+import time
+import json
+import robotBoards
+
+# Settings for the test
+robotName = 'diddy'                     # Robot to test, one of the names in robotBoards.py
+callsPerCommand = 200                   # Number of times each command is called for each retry setting
+simulatedBusSpeed = 100000              # I2C clock in Hz for the emulated bus, 0 for no bus delay
+simulatedLatency = 0.0                  # Extra delay in seconds for each I2C transaction with the emulated board
+simulatedErrorRate = 0.01               # Chance from 0.0 to 1.0 of each emulated I2C transaction failing, shows the cost of the retries
+outputFile = 'benchI2c.json'            # Machine readable results
+
+# Settings from robotWeb.py, these should match the robot being tested
+controlRate = 50                        # Number of times per second the motor outputs are updated
+distanceRate = 10                       # Number of times per second the ultrasonic distances are read
+
+# Returns the value at percent through a sorted list
+def Percentile(values, percent):
+    if len(values) == 0:
+        return None
+    index = int(round(percent / 100.0 * (len(values) - 1)))
+    return values[index]
+
+# Does nothing, stops the drivers printing every failed command
+def Quiet(message):
+    pass
+
+# Returns the commands to time as a list of (name, function) for the robot
+# The motors are set to 0, the same I2C write as any other level without the robot moving
+def GetCommands(robot, board, UB):
+    commands = []
+    for index in range(len(robot.setters)):
+        commands.append(('SetMotor%d' % (index + 1), lambda setter = robot.setters[index]: setter(0.0)))
+    for index in range(len(robot.setters)):
+        commands.append(('GetMotor%d' % (index + 1), getattr(board, 'GetMotor%d' % (index + 1))))
+    if robot.battery:
+        commands.append(('GetBatteryReading', board.GetBatteryReading))
+    if robot.ir:
+        commands.append(('PollIr', board.PollIr))
+        commands.append(('GetIrMessage', board.GetIrMessage))
+    if UB != None:
+        for index in range(4):
+            commands.append(('GetDistance%d' % (index + 1), getattr(UB, 'GetDistance%d' % (index + 1))))
+    return commands
+
+# Calls a command repeatedly, returns the timings and the driver I2C statistics for it
+def TimeCommand(board, function):
+    board.ResetI2cStats()
+    times = []
+    startTime = time.time()
+    for count in range(callsPerCommand):
+        callTime = time.time()
+        function()
+        times.append(time.time() - callTime)
+    seconds = time.time() - startTime
+    times.sort()
+    result = {'calls': callsPerCommand, 'callsPerSecond': callsPerCommand / seconds,
+              'p50': Percentile(times, 50), 'p95': Percentile(times, 95), 'p99': Percentile(times, 99),
+              'max': times[-1], 'mean': sum(times) / len(times)}
+    # The UltraBorg is not one of our drivers, so its commands have no I2C statistics
+    stats = board.GetI2cStats()
+    if len(stats) > 0:
+        result['transactions'] = sum([commandStats['transactions'] for commandStats in stats.values()])
+        result['retries'] = sum([commandStats['retries'] for commandStats in stats.values()])
+        result['failures'] = sum([commandStats['failures'] for commandStats in stats.values()])
+    return result
+
+# Read the command line
+simulate = '--simulate' in sys.argv[1:]
+arguments = [argument for argument in sys.argv[1:] if argument != '--simulate']
+if len(arguments) > 0:
+    robotName = arguments[0]
+if len(arguments) > 1:
+    outputFile = arguments[1]
+if not robotBoards.ROBOTS.has_key(robotName):
+    print 'No robot called "%s", the robots are: %s' % (robotName, ', '.join(sorted(robotBoards.ROBOTS.keys())))
+    sys.exit()
+robot = robotBoards.ROBOTS[robotName]
+
+# Open the board, and the UltraBorg if the robot has one
+if simulate:
+    import boardSim
+    bus = boardSim.SimulateRobot(robot, simulatedBusSpeed)
+    for emulatedBoard in bus.boards.values():
+        emulatedBoard.latency = simulatedLatency
+        emulatedBoard.errorRate = simulatedErrorRate
+if not robot.Open(False):
+    sys.exit()
+board = robot.board
+board.autoReconnect = False
+board.printFunction = Quiet
+UB = None
+if robot.ultrasonic:
+    if simulate:
+        UB = boardSim.SimulatedUltraBorg(bus)
+    else:
+        import UltraBorg
+        UB = UltraBorg.UltraBorg()
+    UB.Init()
+    if not UB.foundChip:
+        print 'No UltraBorg found, the distance commands are left out'
+        UB = None
+
+# Time each command with the normal retries, then with a single attempt
+retryCount, retryDelay, retryBackoff = board.GetRetryPolicy(None)
+results = {'robot': robotName, 'board': robot.boardName, 'simulated': simulate, 'callsPerCommand': callsPerCommand, 'commands': {}}
+if simulate:
+    results.update({'busSpeed': simulatedBusSpeed, 'latency': simulatedLatency, 'errorRate': simulatedErrorRate})
+print 'Command              Retries  p50 ms  p95 ms  p99 ms  max ms  Calls/s  Retried  Failed'
+try:
+    for name, function in GetCommands(robot, board, UB):
+        results['commands'][name] = {}
+        for retries in (True, False):
+            if retries:
+                board.SetRetryPolicy(None, retryCount, retryDelay, retryBackoff)
+            else:
+                board.SetRetryPolicy(None, 1, 0.0)
+            result = TimeCommand(board, function)
+            results['commands'][name][['single', 'retries'][retries]] = result
+            if result.has_key('retries'):
+                retried = '%7d  %6d' % (result['retries'], result['failures'])
+            else:
+                retried = '      -       -'
+            print '%-20s %-7s  %6.3f  %6.3f  %6.3f  %6.3f  %7.0f  %s' % (name, retries, result['p50'] * 1000.0, result['p95'] * 1000.0,
+                                                                        result['p99'] * 1000.0, result['max'] * 1000.0,
+                                                                        result['callsPerSecond'], retried)
+finally:
+    board.SetRetryPolicy(None, retryCount, retryDelay, retryBackoff)
+    robot.MotorsOff()
+
+# Work out the bus time left once the motors are written every control loop
+commands = results['commands']
+driveTime = sum([commands['SetMotor%d' % (index + 1)]['retries']['mean'] for index in range(len(robot.setters))])
+busyShare = driveTime * controlRate
+headroom = {'driveTimePerLoop': driveTime, 'driveShare': busyShare}
+print
+print 'Writing the motors takes %.3f ms per control loop, %.1f %% of the bus at %d loops per second' % (driveTime * 1000.0, busyShare * 100.0, controlRate)
+if UB != None:
+    distanceTime = sum([commands['GetDistance%d' % (index + 1)]['retries']['mean'] for index in range(4)])
+    busyShare += distanceTime * distanceRate
+    headroom['distanceTimePerRead'] = distanceTime
+    print 'Reading the distances takes %.3f ms, %.1f %% of the bus at %d readings per second' % (distanceTime * 1000.0, distanceTime * distanceRate * 100.0, distanceRate)
+sensorTime = commands['GetMotor1']['retries']['mean']
+spareShare = max(1.0 - busyShare, 0.0)
+headroom['spareShare'] = spareShare
+headroom['sensorReadsPerSecond'] = spareShare / sensorTime
+print 'That leaves %.1f %% of the bus, about %.0f more single register reads per second before the drive commands start waiting' % (spareShare * 100.0,
+                                                                                                                                    spareShare / sensorTime)
+results['headroom'] = headroom
+outputJson = open(outputFile, 'w')
+json.dump(results, outputJson, indent = 2, sort_keys = True)
+outputJson.close()
+print 'Results written to %s' % (outputFile)
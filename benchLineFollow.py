@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# coding: latin-1
+
+# Times the line following analysis on recorded frames
+# Usage: ./benchLineFollow.py photo1.jpg photo2.jpg ...
+# Photos saved from the web page with "Save Photo" are already the right way up
+
+# Load library functions we want
+import sys
+import time
+import cv2
+import lineFollow
+
+# Settings for the analysis, these should match robotWeb.py
+lineBands = [0.9, 0.75, 0.6]            # Positions down the image checked for the line, nearest the robot first
+lineBandHeight = 4                      # Number of rows averaged for each band
+lineThreshold = 80                      # Grey level between the line and the floor (0 to 255)
+lineDark = True                         # True for dark tape on a light floor, False for light tape on a dark floor
+repeats = 100                           # Number of times each frame is analysed
+
+# Load the recorded frames
+if len(sys.argv) < 2:
+    print 'Usage: %s frame.jpg [frame.jpg ...]' % (sys.argv[0])
+    sys.exit()
+frames = []
+for fileName in sys.argv[1:]:
+    frame = cv2.imread(fileName)
+    if frame is None:
+        print 'Could not read %s' % (fileName)
+    else:
+        frames.append((fileName, frame))
+if len(frames) == 0:
+    print 'No frames to test'
+    sys.exit()
+
+# Time each frame
+times = []
+found = 0
+for fileName, frame in frames:
+    startTime = time.time()
+    for i in range(repeats):
+        position = lineFollow.FindLine(frame, lineBands, lineBandHeight, lineThreshold, lineDark)
+    frameTime = (time.time() - startTime) / repeats
+    times.append(frameTime)
+    if position == None:
+        print '%s: no line, %.3f ms' % (fileName, frameTime * 1000.0)
+    else:
+        found += 1
+        print '%s: line at %+.2f, %.3f ms' % (fileName, position, frameTime * 1000.0)
+
+# Report the totals
+times.sort()
+print '%d frames, line found in %d' % (len(times), found)
+print 'Mean %.3f ms, median %.3f ms, max %.3f ms per frame' % (sum(times) * 1000.0 / len(times), times[len(times) / 2] * 1000.0, times[-1] * 1000.0)
@@ -0,0 +1,656 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module emulates the PiBorg motor boards so the web-page can run without a Raspberry Pi
+
+The emulated boards answer the same I2C commands as the real boards, using the command codes
+from PicoBorgRev.py, ThunderBorg.py, Diablo.py and ZeroBorg.py, and the drivers talk to them
+through a simulated bus instead of /dev/i2c-1, e.g.
+import boardSim
+import PicoBorgRev
+bus = boardSim.SimulatedBus()
+bus.Attach(boardSim.PicoBorgRevEmulator(), 0x44)
+boardSim.Install(bus)
+PBR = PicoBorgRev.PicoBorgRev()
+PBR.Init()
+
+The bus can be slowed down with busSpeed and latency, and errors can be injected with
+errorRate, mismatchRate, FailNext and offline to test the retries and reconnection
+"""
+
+# Import the libraries we need
+import time
+import random
+import threading
+import PicoBorgRev
+import ThunderBorg
+import Diablo
+import ZeroBorg
+
+# Constant values
+BUS_SPEED_DEFAULT       = 100000    # I2C clock in Hz, the Raspberry Pi default
+FAILSAFE_TIME           = 0.25      # Seconds without a command before a board with the failsafe enabled stops its motors
+ENCODER_RATE            = 500.0     # Encoder counts per second for a motor at full power
+DISTANCE_DEFAULT        = 1000.0    # Distance in mm reported by the emulated UltraBorg
+DRIVERS                 = [PicoBorgRev, ThunderBorg, Diablo, ZeroBorg]
+
+# UltraBorg values, UltraBorg.py is not part of this project so the ones it uses are copied here
+ULTRABORG_ADDRESS       = 0x36      # Default I2C address of the UltraBorg
+ULTRABORG_ID            = 0x36      # Value returned by GET_ID
+ULTRABORG_GET_ID        = 0x99      # Command to read the board ID
+ULTRABORG_GET_FILTER    = 41        # Command to read the filtered time for ultrasonic 1, 2 to 4 follow on
+ULTRABORG_REPLY_LEN     = 4         # Bytes read back for every UltraBorg command
+ULTRABORG_NO_READING    = 65535     # Time returned when a sensor has no reading
+ULTRABORG_US_TO_MM      = 0.171500  # Distance in mm for each us of echo time
+
+
+class EmulatedBoard:
+    """
+EmulatedBoard(driver, boardId, motorCount, registers)
+
+Common part of the board emulators, keeps the register state for the commands in the driver module
+
+driver                  Driver module the command codes are taken from, e.g. PicoBorgRev
+boardId                 Value returned by GET_ID
+motors                  Signed PWM level for each motor, motor A first
+registers               Dictionary of the values stored by each SET command, by command name without SET_
+latency                 Extra delay in seconds for each transaction, e.g. the board processing time
+jitter                  Largest random delay in seconds added to each transaction
+errorRate               Chance from 0.0 to 1.0 of each transaction failing with an I/O error
+mismatchRate            Chance from 0.0 to 1.0 of a read returning a reply for the wrong command
+offline                 True to stop the board answering, as if it has lost power
+epoLatched              True if the EPO has been tripped, the motors stay off until RESET_EPO
+writeFunction           Function reference called with (board, command, data) after each write has been handled
+transactions            Number of reads and writes seen
+errors                  Number of transactions failed by error injection or while offline
+failsafeStops           Number of times the failsafe has stopped the motors
+lastMotorWrite          Time from time.time() of the last command which changed the motors
+    """
+
+    latency                 = 0.0
+    jitter                  = 0.0
+    errorRate               = 0.0
+    mismatchRate            = 0.0
+    offline                 = False
+    epoLatched              = False
+    writeFunction           = None
+
+
+    def __init__(self, driver, boardId, motorCount, registers):
+        self.driver = driver
+        self.boardId = boardId
+        self.motors = [0] * motorCount
+        self.registers = dict(registers)
+        self.reply = []
+        self.failNext = 0
+        self.transactions = 0
+        self.errors = 0
+        self.failsafeStops = 0
+        self.lastCommand = time.time()
+        self.lastMotorWrite = 0.0
+        self.moveEnd = [0.0] * motorCount
+        self.bus = None
+
+
+    def FailNext(self, count):
+        """
+FailNext(count)
+
+Fails the next count transactions with an I/O error, e.g. to test the retries
+        """
+        self.failNext = count
+
+
+    def TripEpo(self):
+        """
+TripEpo()
+
+Latches the EPO as if the switch has been opened, the motors stop until RESET_EPO is sent
+        """
+        self.epoLatched = True
+        self.StopMotors()
+
+
+    def GetPowers(self):
+        """
+powers = GetPowers()
+
+Returns the motor outputs from -1.0 to +1.0, motor A first, after any failsafe or encoder move has finished
+        """
+        self.Update(time.time())
+        return [pwm / float(self.driver.PWM_MAX) for pwm in self.motors]
+
+
+    def StopMotors(self):
+        """
+StopMotors()
+
+Turns all of the motors off and ends any encoder moves
+        """
+        self.motors = [0] * len(self.motors)
+        self.moveEnd = [0.0] * len(self.motors)
+
+
+    def Update(self, now):
+        """
+Update(now)
+
+Works out what the board has done by itself since the last command, the failsafe and encoder moves
+        """
+        if self.registers.get('FAILSAFE', [0])[0] and ((now - self.lastCommand) > FAILSAFE_TIME):
+            if max(self.motors) != 0 or min(self.motors) != 0:
+                self.failsafeStops += 1
+                self.StopMotors()
+        for index in range(len(self.motors)):
+            if (self.moveEnd[index] > 0.0) and (now >= self.moveEnd[index]):
+                self.motors[index] = 0
+                self.moveEnd[index] = 0.0
+
+
+    def CheckFault(self):
+        """
+CheckFault()
+
+Raises an I/O error if the transaction should fail, used by the bus before each transaction
+        """
+        if self.offline:
+            self.errors += 1
+            raise IOError(121, 'Remote I/O error')
+        if self.failNext > 0:
+            self.failNext -= 1
+            self.errors += 1
+            raise IOError(121, 'Remote I/O error')
+        if (self.errorRate > 0) and (random.random() < self.errorRate):
+            self.errors += 1
+            raise IOError(121, 'Remote I/O error')
+
+
+    def Delay(self):
+        """
+seconds = Delay()
+
+Returns the extra time the board takes for a transaction from latency and jitter
+        """
+        if self.jitter > 0:
+            return self.latency + random.uniform(0.0, self.jitter)
+        else:
+            return self.latency
+
+
+    def Write(self, data):
+        """
+Write(data)
+
+Handles a command written to the board, data is a list of byte values starting with the command code
+        """
+        now = time.time()
+        self.transactions += 1
+        self.Update(now)
+        self.lastCommand = now
+        if len(data) == 0:
+            return
+        command = data[0]
+        reply = self.Command(command, self.driver.CommandName(command), data[1:], now)
+        if reply != None:
+            self.reply = reply
+        if self.writeFunction != None:
+            self.writeFunction(self, command, data[1:])
+
+
+    def Read(self, length):
+        """
+reply = Read(length)
+
+Returns the reply to the last GET command as a list of length byte values
+        """
+        self.transactions += 1
+        reply = (self.reply + [0] * length)[:length]
+        if (self.mismatchRate > 0) and (random.random() < self.mismatchRate):
+            reply[0] = (reply[0] + 1) & 0xFF
+        return reply
+
+
+    def SetMotor(self, index, forward, pwm, now):
+        """
+SetMotor(index, forward, pwm, now)
+
+Sets a motor output from a SET command, ignored while the EPO is latched
+        """
+        if self.epoLatched and not self.registers.get('EPO_IGNORE', [1])[0]:
+            return
+        if forward:
+            self.motors[index] = pwm
+        else:
+            self.motors[index] = -pwm
+        self.moveEnd[index] = 0.0
+        self.lastMotorWrite = now
+
+
+    def MoveMotor(self, index, forward, counts, now):
+        """
+MoveMotor(index, forward, counts, now)
+
+Starts an encoder move, the motor runs at the encoder speed until the counts have been seen
+        """
+        if not self.registers.get('ENC_MODE', [0])[0]:
+            return
+        pwm = self.registers.get('ENC_SPEED', [self.driver.PWM_MAX])[0]
+        self.SetMotor(index, forward, pwm, now)
+        if pwm > 0:
+            self.moveEnd[index] = now + counts / (ENCODER_RATE * pwm / float(self.driver.PWM_MAX))
+
+
+    def Command(self, command, name, data, now):
+        """
+reply = Command(command, name, data, now)
+
+Carries out a command, name is the command name from the driver without COMMAND_
+Returns the reply for a GET command, None otherwise
+Motor, GET_ID and SET / GET pairs are handled here, the emulators handle the commands particular to their board
+        """
+        parts = name.split('_')
+        if name == 'GET_ID':
+            return [command, self.boardId]
+        elif name == 'ALL_OFF':
+            self.StopMotors()
+            self.lastMotorWrite = now
+        elif (len(parts) == 3) and (parts[0] in ('SET', 'MOVE')) and (parts[2] in ('FWD', 'REV')):
+            # Motor commands, SET_A_FWD, MOVE_ALL_REV, ...
+            if parts[1] == 'ALL':
+                indexes = range(len(self.motors))
+            else:
+                indexes = [ord(parts[1]) - ord('A')]
+            for index in indexes:
+                if parts[0] == 'SET':
+                    self.SetMotor(index, parts[2] == 'FWD', data[0], now)
+                else:
+                    self.MoveMotor(index, parts[2] == 'FWD', (data[0] << 8) + data[1], now)
+        elif (len(parts) == 2) and (parts[0] == 'GET') and (len(parts[1]) == 1):
+            # Motor readings, GET_A, GET_B, ...
+            pwm = self.motors[ord(parts[1]) - ord('A')]
+            if pwm < 0:
+                return [command, self.driver.COMMAND_VALUE_REV, -pwm]
+            else:
+                return [command, self.driver.COMMAND_VALUE_FWD, pwm]
+        elif name == 'RESET_EPO':
+            self.epoLatched = False
+        elif name == 'GET_EPO':
+            return [command, int(self.epoLatched)]
+        elif name == 'GET_ENC_MOVING':
+            return [command, int(max(self.moveEnd) > 0.0)]
+        elif name.startswith('GET_DRIVE') and name.endswith('FAULT'):
+            return [command, self.driver.COMMAND_VALUE_OFF]
+        elif name == 'SET_I2C_ADD':
+            if self.bus != None:
+                self.bus.Move(self, data[0])
+        elif name.startswith('SET_'):
+            self.registers[name[4:]] = list(data)
+        elif name.startswith('GET_'):
+            return [command] + self.registers.get(name[4:], [0])
+        return None
+
+
+class PicoBorgRevEmulator(EmulatedBoard):
+    """
+PicoBorgRevEmulator()
+
+Emulates a PicoBorg Reverse, two motors with encoder moves, the LED starts on and the EPO starts latched
+    """
+
+    def __init__(self):
+        EmulatedBoard.__init__(self, PicoBorgRev, PicoBorgRev.I2C_ID_PICOBORG_REV, 2,
+                               {'LED': [1], 'EPO_IGNORE': [0], 'FAILSAFE': [0], 'ENC_MODE': [0], 'ENC_SPEED': [PicoBorgRev.PWM_MAX]})
+        self.epoLatched = True
+
+
+class DiabloEmulator(EmulatedBoard):
+    """
+DiabloEmulator()
+
+Emulates a Diablo, two motors with encoder moves and the EPO starts latched
+    """
+
+    def __init__(self):
+        EmulatedBoard.__init__(self, Diablo, Diablo.I2C_ID_DIABLO, 2,
+                               {'EPO_IGNORE': [0], 'FAILSAFE': [0], 'ENC_MODE': [0], 'ENC_SPEED': [Diablo.PWM_MAX], 'ENABLED': [1]})
+        self.epoLatched = True
+
+
+    def SetMotor(self, index, forward, pwm, now):
+        # The motors do nothing while the drives are disabled
+        if self.registers['ENABLED'][0]:
+            EmulatedBoard.SetMotor(self, index, forward, pwm, now)
+
+
+class ThunderBorgEmulator(EmulatedBoard):
+    """
+ThunderBorgEmulator([batteryVoltage])
+
+Emulates a ThunderBorg, two motors, the LEDs, battery readings and the external LED strip
+
+batteryVoltage          Voltage returned by GET_BATT_VOLT
+ledWords                Number of 32 bit words written to the external LED strip
+    """
+
+    def __init__(self, batteryVoltage = 12.0):
+        limits = [int(ThunderBorg.BATTERY_MIN_DEFAULT / ThunderBorg.VOLTAGE_PIN_MAX * 0xFF),
+                  int(ThunderBorg.BATTERY_MAX_DEFAULT / ThunderBorg.VOLTAGE_PIN_MAX * 0xFF)]
+        EmulatedBoard.__init__(self, ThunderBorg, ThunderBorg.I2C_ID_THUNDERBORG, 2,
+                               {'LED1': [0, 0, 0], 'LED2': [0, 0, 0], 'LED_BATT_MON': [1], 'FAILSAFE': [0], 'BATT_LIMITS': limits})
+        self.batteryVoltage = batteryVoltage
+        self.ledWords = 0
+
+
+    def SetMotor(self, index, forward, pwm, now):
+        # There is no EPO on the ThunderBorg
+        if forward:
+            self.motors[index] = pwm
+        else:
+            self.motors[index] = -pwm
+        self.lastMotorWrite = now
+
+
+    def Command(self, command, name, data, now):
+        if name == 'SET_LEDS':
+            self.registers['LED1'] = list(data)
+            self.registers['LED2'] = list(data)
+        elif name == 'GET_BATT_VOLT':
+            raw = int((self.batteryVoltage - ThunderBorg.VOLTAGE_PIN_CORRECTION) / ThunderBorg.VOLTAGE_PIN_MAX * ThunderBorg.COMMAND_ANALOG_MAX)
+            raw = max(0, min(ThunderBorg.COMMAND_ANALOG_MAX, raw))
+            return [command, (raw >> 8) & 0xFF, raw & 0xFF]
+        elif name == 'WRITE_EXTERNAL_LED':
+            self.ledWords += 1
+        else:
+            return EmulatedBoard.Command(self, command, name, data, now)
+        return None
+
+
+class ZeroBorgEmulator(EmulatedBoard):
+    """
+ZeroBorgEmulator()
+
+Emulates a ZeroBorg, four motors, the LED and the IR receiver, messages can be sent with SendIr
+
+analog1, analog2        Raw readings from 0 to COMMAND_ANALOG_MAX returned for the analog inputs
+    """
+
+    def __init__(self):
+        EmulatedBoard.__init__(self, ZeroBorg, ZeroBorg.I2C_ID_ZEROBORG, 4,
+                               {'LED': [0], 'EPO_IGNORE': [0], 'FAILSAFE': [0], 'LED_IR': [1]})
+        self.epoLatched = True
+        self.irMessage = [0] * ZeroBorg.IR_MAX_BYTES
+        self.irNew = False
+        self.analog1 = 0
+        self.analog2 = 0
+
+
+    def SendIr(self, message):
+        """
+SendIr(message)
+
+Receives an IR message, given as a hexadecimal string like the ones returned by GetIrMessage, e.g. 'F75AD5AA8'
+        """
+        message = message + '0' * (len(message) % 2)
+        data = [int(message[i : i + 2], 16) for i in range(0, len(message), 2)]
+        self.irMessage = (data + [0] * ZeroBorg.IR_MAX_BYTES)[:ZeroBorg.IR_MAX_BYTES]
+        self.irNew = True
+
+
+    def Command(self, command, name, data, now):
+        if name == 'GET_NEW_IR':
+            return [command, int(self.irNew)]
+        elif name == 'GET_LAST_IR':
+            self.irNew = False
+            return [command] + self.irMessage
+        elif name in ('GET_ANALOG_1', 'GET_ANALOG_2'):
+            if name == 'GET_ANALOG_1':
+                raw = self.analog1
+            else:
+                raw = self.analog2
+            return [command, (raw >> 8) & 0xFF, raw & 0xFF]
+        else:
+            return EmulatedBoard.Command(self, command, name, data, now)
+
+
+class UltraBorgEmulator(EmulatedBoard):
+    """
+UltraBorgEmulator()
+
+Emulates an UltraBorg, the four ultrasonic sensors answer GET_FILTER commands with their echo time
+It has no motors, the driver calls used by robotWeb.py are provided by SimulatedUltraBorg
+
+distances               Distance in mm for each of the four sensors, 0 for no reading
+    """
+
+    def __init__(self):
+        EmulatedBoard.__init__(self, None, ULTRABORG_ID, 0, {})
+        self.distances = [DISTANCE_DEFAULT] * 4
+
+
+    def Write(self, data):
+        now = time.time()
+        self.transactions += 1
+        self.lastCommand = now
+        if len(data) == 0:
+            return
+        command = data[0]
+        index = command - ULTRABORG_GET_FILTER
+        if command == ULTRABORG_GET_ID:
+            self.reply = [command, self.boardId]
+        elif (index >= 0) and (index < len(self.distances)):
+            if self.distances[index] > 0:
+                echoTime = min(int(round(self.distances[index] / ULTRABORG_US_TO_MM)), ULTRABORG_NO_READING - 1)
+            else:
+                echoTime = ULTRABORG_NO_READING
+            self.reply = [command, (echoTime >> 8) & 0xFF, echoTime & 0xFF]
+        if self.writeFunction != None:
+            self.writeFunction(self, command, data[1:])
+
+
+class SimulatedUltraBorg:
+    """
+SimulatedUltraBorg(bus, [address])
+
+Stands in for the UltraBorg driver object, UltraBorg.py is not part of this project
+Each reading is the same transactions as the real driver on the simulated bus, a one byte command
+then a ULTRABORG_REPLY_LEN byte reply, so the readings take their share of the bus from the motor commands
+Failed readings return None like the real driver
+
+bus                     SimulatedBus with an UltraBorgEmulator attached
+i2cAddress              I2C address of the UltraBorg
+foundChip               True once Init has found the board
+    """
+
+    def __init__(self, bus, address = ULTRABORG_ADDRESS):
+        self.bus = bus
+        self.i2cAddress = address
+        self.foundChip = False
+
+    def RawRead(self, command):
+        self.bus.Transfer(self.i2cAddress, [command], None)
+        reply = self.bus.Transfer(self.i2cAddress, None, ULTRABORG_REPLY_LEN)
+        if reply[0] != command:
+            raise IOError('Reply for the wrong command')
+        return reply
+
+    def Init(self):
+        try:
+            self.foundChip = self.RawRead(ULTRABORG_GET_ID)[1] == ULTRABORG_ID
+        except IOError:
+            self.foundChip = False
+
+    def GetDistance(self, index):
+        try:
+            reply = self.RawRead(ULTRABORG_GET_FILTER + index)
+        except IOError:
+            return None
+        echoTime = (reply[1] << 8) + reply[2]
+        if echoTime == ULTRABORG_NO_READING:
+            echoTime = 0
+        return float(echoTime) * ULTRABORG_US_TO_MM
+
+    def GetDistance1(self):
+        return self.GetDistance(0)
+
+    def GetDistance2(self):
+        return self.GetDistance(1)
+
+    def GetDistance3(self):
+        return self.GetDistance(2)
+
+    def GetDistance4(self):
+        return self.GetDistance(3)
+
+
+class SimulatedI2cFile:
+    """
+SimulatedI2cFile(bus, address)
+
+Used in place of the /dev/i2c-1 file objects, the drivers only read and write whole transactions
+    """
+
+    def __init__(self, bus, address):
+        self.bus = bus
+        self.address = address
+
+    def write(self, rawOutput):
+        self.bus.Transfer(self.address, [ord(singleByte) for singleByte in rawOutput], None)
+
+    def read(self, length):
+        return ''.join([chr(singleByte) for singleByte in self.bus.Transfer(self.address, None, length)])
+
+    def readinto(self, buffer):
+        reply = self.bus.Transfer(self.address, None, len(buffer))
+        buffer[:len(reply)] = bytearray(reply)
+        return len(reply)
+
+    def close(self):
+        pass
+
+
+class SimulatedBus:
+    """
+SimulatedBus([busSpeed])
+
+An I2C bus with emulated boards attached, one transaction is on the bus at a time like the real bus
+
+busSpeed                I2C clock in Hz used to work out the time each transaction takes, 0 for no delay
+boards                  Dictionary of the attached boards by address
+busTime                 Total seconds the bus has been busy
+    """
+
+    def __init__(self, busSpeed = BUS_SPEED_DEFAULT):
+        self.busSpeed = busSpeed
+        self.boards = {}
+        self.busTime = 0.0
+        self.lockBus = threading.Lock()
+
+
+    def Attach(self, board, address):
+        """
+Attach(board, address)
+
+Connects an emulated board to the bus at address
+        """
+        board.bus = self
+        self.boards[address] = board
+
+
+    def Move(self, board, address):
+        """
+Move(board, address)
+
+Changes the address of an attached board, used by SET_I2C_ADD
+        """
+        for oldAddress in self.boards.keys():
+            if self.boards[oldAddress] == board:
+                del self.boards[oldAddress]
+        self.boards[address] = board
+
+
+    def Open(self, busNumber, address):
+        """
+i2cRead, i2cWrite = Open(busNumber, address)
+
+Replacement for OpenI2cBus in the drivers, every bus number is this bus
+        """
+        return SimulatedI2cFile(self, address), SimulatedI2cFile(self, address)
+
+
+    def Transfer(self, address, data, length):
+        """
+reply = Transfer(address, data, length)
+
+Carries out one transaction, writes data if it is not None, otherwise reads length bytes
+Raises IOError if there is no board at address or the board fails the transaction
+        """
+        self.lockBus.acquire()
+        try:
+            startTime = time.time()
+            if not self.boards.has_key(address):
+                raise IOError(121, 'Remote I/O error')
+            board = self.boards[address]
+            if data != None:
+                byteCount = len(data)
+            else:
+                byteCount = length
+            # Each byte takes 9 clocks, plus the address byte at the start
+            if self.busSpeed > 0:
+                busDelay = (byteCount + 1) * 9.0 / self.busSpeed
+            else:
+                busDelay = 0.0
+            delay = busDelay + board.Delay()
+            if delay > 0:
+                time.sleep(delay)
+            board.CheckFault()
+            if data != None:
+                board.Write(data)
+                reply = None
+            else:
+                reply = board.Read(length)
+            return reply
+        finally:
+            self.busTime += time.time() - startTime
+            self.lockBus.release()
+
+
+# The emulator for each type of board, by the boardName used in robotBoards.py
+EMULATORS = {
+    'PicoBorg Reverse':     PicoBorgRevEmulator,
+    'Diablo':               DiabloEmulator,
+    'ThunderBorg':          ThunderBorgEmulator,
+    'ZeroBorg':             ZeroBorgEmulator,
+}
+
+
+def Install(bus):
+    """
+Install(bus)
+
+Makes the PicoBorg Reverse, ThunderBorg, Diablo and ZeroBorg drivers use bus instead of /dev/i2c-1
+    """
+    for driver in DRIVERS:
+        driver.OpenI2cBus = bus.Open
+
+
+def SimulateRobot(robot, busSpeed = BUS_SPEED_DEFAULT):
+    """
+bus = SimulateRobot(robot, [busSpeed])
+
+Creates a simulated bus with an emulated board for a robot from robotBoards.ROBOTS and installs it
+The board is at the address the robot uses, ThunderBorg battery readings start at the robot voltageIn
+Robots with ultrasonic sensors also get an UltraBorgEmulator at ULTRABORG_ADDRESS, use SimulatedUltraBorg to read it
+    """
+    bus = SimulatedBus(busSpeed)
+    board = EMULATORS[robot.boardName]()
+    if isinstance(board, ThunderBorgEmulator):
+        board.batteryVoltage = robot.voltageIn
+    address = robot.address
+    if address == None:
+        # The default address from the driver class, e.g. PicoBorgRev.PicoBorgRev
+        address = getattr(board.driver, board.driver.__name__).i2cAddress
+    bus.Attach(board, address)
+    if robot.ultrasonic:
+        bus.Attach(UltraBorgEmulator(), ULTRABORG_ADDRESS)
+    Install(bus)
+    return bus
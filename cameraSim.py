@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module emulates the parts of the picamera library used by robotWeb.py so the web-page can run without a camera
+
+Frames are either a moving test pattern or replayed from recorded photos or a video, at the camera frame rate, e.g.
+import cameraSim
+cameraSim.replayPath = '/home/pi/track'
+camera = cameraSim.PiCamera()
+camera.resolution = (240, 180)
+camera.framerate = 10
+stream = cameraSim.array.PiRGBArray(camera)
+camera.capture_sequence([stream], format = 'bgr', use_video_port = True)
+
+The test pattern has a dark line on a light floor and a blue ball moving across it, so the line and
+colour following modes have something to find. Motion vectors are not emulated, so sentry mode never records
+"""
+
+# Import the libraries we need
+import os
+import time
+import numpy
+import cv2
+
+# Settings for the emulated camera
+replayPath = None                       # Directory of photos or a video file to replay, None for the test pattern
+replayFlip = True                       # Rotate replayed frames by 180 to match a camera mounted upside down, photos from the web page are already the right way up
+replayFramesMax = 300                   # Largest number of frames loaded from a video file
+patternFrames = 50                      # Number of frames before the test pattern repeats
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class PiCameraRuntimeError(RuntimeError):
+    """
+Raised for the same mistakes as picamera, e.g. changing the resolution while recording
+    """
+    pass
+
+
+def LoadReplayFrames(path, resolution):
+    """
+frames = LoadReplayFrames(path, resolution)
+
+Loads the photos in a directory, or the frames of a video file, resized to resolution (width, height)
+    """
+    images = []
+    if os.path.isdir(path):
+        for fileName in sorted(os.listdir(path)):
+            if os.path.splitext(fileName)[1].lower() in IMAGE_EXTENSIONS:
+                image = cv2.imread(os.path.join(path, fileName))
+                if image is not None:
+                    images.append(image)
+    else:
+        video = cv2.VideoCapture(path)
+        while len(images) < replayFramesMax:
+            retval, image = video.read()
+            if not retval:
+                break
+            images.append(image)
+        video.release()
+    frames = []
+    for image in images:
+        frame = cv2.resize(image, resolution, interpolation = cv2.INTER_AREA)
+        if replayFlip:
+            frame = cv2.flip(frame, -1)
+        frames.append(frame)
+    return frames
+
+
+def MakePatternFrames(resolution):
+    """
+frames = MakePatternFrames(resolution)
+
+Makes the test pattern frames at resolution (width, height), the camera view is upside down like a robot with flippedCamera set
+    """
+    width, height = resolution
+    # A lightly textured floor so the JPEG encoding costs about the same as a real image
+    generator = numpy.random.RandomState(0)
+    floor = (170 + generator.randint(-12, 12, (height, width, 3))).astype(numpy.uint8)
+    floor = cv2.GaussianBlur(floor, (5, 5), 0)
+    frames = []
+    for index in range(patternFrames):
+        phase = index * 2.0 * numpy.pi / patternFrames
+        frame = floor.copy()
+        # Line of tape from the bottom to the top, curving from side to side over time
+        points = []
+        for y in range(0, height + 1, max(1, height / 8)):
+            x = width / 2 + int(numpy.sin(phase + y * 3.0 / height) * width / 4)
+            points.append((x, y))
+        cv2.polylines(frame, [numpy.array(points, numpy.int32)], False, (40, 40, 40), max(2, width / 24))
+        # Blue ball moving left and right across the top half
+        ballX = width / 2 + int(numpy.cos(phase) * width / 3)
+        cv2.circle(frame, (ballX, height / 4), max(4, height / 10), (200, 90, 30), -1)
+        frames.append(cv2.flip(frame, -1))
+    return frames
+
+
+class PiRGBArray:
+    """
+PiRGBArray(camera, [size])
+
+Emulates picamera.array.PiRGBArray, the captured frame is in array as a BGR numpy array
+    """
+
+    def __init__(self, camera, size = None):
+        self.camera = camera
+        self.size = size
+        self.array = None
+
+    def seek(self, position):
+        pass
+
+    def truncate(self, size = None):
+        pass
+
+
+class PiMotionAnalysis(object):
+    """
+PiMotionAnalysis(camera, [size])
+
+Emulates picamera.array.PiMotionAnalysis, analyse is never called as there are no motion vectors
+    """
+
+    def __init__(self, camera, size = None):
+        self.camera = camera
+        self.size = size
+
+    def analyse(self, vectors):
+        pass
+
+
+class PiCameraCircularIO:
+    """
+PiCameraCircularIO(camera, [size], [seconds], [bitrate], [splitter_port])
+
+Emulates picamera.PiCameraCircularIO, nothing is recorded so there is never anything to copy
+    """
+
+    def __init__(self, camera, size = None, seconds = None, bitrate = 17000000, splitter_port = 1):
+        self.camera = camera
+
+    def copy_to(self, output, size = None, seconds = None, first_frame = None):
+        pass
+
+    def clear(self):
+        pass
+
+
+# Matches the picamera.array module so the same code works with either
+class array:
+    PiRGBArray = PiRGBArray
+    PiMotionAnalysis = PiMotionAnalysis
+
+
+class PiCamera(object):
+    """
+PiCamera()
+
+Emulates picamera.PiCamera for the calls robotWeb.py makes
+
+resolution              (width, height) of the captured frames, cannot be changed while recording
+framerate               Frames per second delivered by capture_sequence, cannot be changed while recording
+frames                  Number of frames delivered
+late                    Number of frames which could not be delivered on time, the next frame is then taken straight away
+    """
+
+    def __init__(self):
+        self._resolution = (640, 480)
+        self._framerate = 30
+        self.recordings = {}
+        self.frameSource = None
+        self.frameList = []
+        self.frames = 0
+        self.late = 0
+        self.closed = False
+
+
+    def CheckNotRecording(self, name):
+        if len(self.recordings) > 0:
+            raise PiCameraRuntimeError('Recording is currently running, cannot change %s' % (name))
+
+
+    def GetResolution(self):
+        return self._resolution
+
+
+    def SetResolution(self, resolution):
+        self.CheckNotRecording('resolution')
+        self._resolution = (int(resolution[0]), int(resolution[1]))
+
+
+    def GetFramerate(self):
+        return self._framerate
+
+
+    def SetFramerate(self, framerate):
+        self.CheckNotRecording('framerate')
+        self._framerate = framerate
+
+    resolution = property(GetResolution, SetResolution)
+    framerate = property(GetFramerate, SetFramerate)
+
+
+    def GetFrames(self):
+        """
+frames = GetFrames()
+
+Returns the frames to deliver at the current resolution, they are only made again when the resolution or source changes
+        """
+        source = (self._resolution, replayPath)
+        if source != self.frameSource:
+            self.frameList = []
+            if replayPath != None:
+                self.frameList = LoadReplayFrames(replayPath, self._resolution)
+                if len(self.frameList) == 0:
+                    print 'No frames could be loaded from "%s", using the test pattern' % (replayPath)
+            if len(self.frameList) == 0:
+                self.frameList = MakePatternFrames(self._resolution)
+            self.frameSource = source
+        return self.frameList
+
+
+    def capture_sequence(self, outputs, format = 'bgr', use_video_port = False, resize = None, splitter_port = 0, burst = False):
+        """
+Delivers a frame into each output from outputs at the frame rate, outputs may be a generator
+        """
+        if self.closed:
+            raise PiCameraRuntimeError('Camera is closed')
+        frames = self.GetFrames()
+        interval = 1.0 / self._framerate
+        nextTime = time.time()
+        for output in outputs:
+            # Fixed-rate like the real camera, a late frame is taken straight away without catching up
+            now = time.time()
+            if nextTime > now:
+                time.sleep(nextTime - now)
+            elif (now - nextTime) > interval:
+                self.late += 1
+                nextTime = now
+            output.array = frames[self.frames % len(frames)].copy()
+            self.frames += 1
+            nextTime += interval
+
+
+    def start_recording(self, output, format = None, resize = None, splitter_port = 1, **options):
+        if self.recordings.has_key(splitter_port):
+            raise PiCameraRuntimeError('The camera is already using port %d' % (splitter_port))
+        self.recordings[splitter_port] = output
+
+
+    def split_recording(self, output, splitter_port = 1, **options):
+        if not self.recordings.has_key(splitter_port):
+            raise PiCameraRuntimeError('There is no recording in progress on port %d' % (splitter_port))
+        self.recordings[splitter_port] = output
+
+
+    def wait_recording(self, timeout = 0, splitter_port = 1):
+        if not self.recordings.has_key(splitter_port):
+            raise PiCameraRuntimeError('There is no recording in progress on port %d' % (splitter_port))
+        time.sleep(timeout)
+
+
+    def stop_recording(self, splitter_port = 1):
+        if not self.recordings.has_key(splitter_port):
+            raise PiCameraRuntimeError('There is no recording in progress on port %d' % (splitter_port))
+        del self.recordings[splitter_port]
+
+
+    def close(self):
+        self.recordings = {}
+        self.closed = True
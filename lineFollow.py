@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module finds a line of tape in camera frames for the line following mode
+
+The frame is only looked at in a few horizontal bands, each band is averaged down to a single row,
+thresholded and the position of the line found from the centroid of the matching pixels, e.g.
+import lineFollow
+position = lineFollow.FindLine(frame, [0.9, 0.75, 0.6], 4, 80)
+if position != None:
+    # -1.0 is the left edge of the image, +1.0 is the right edge
+    print position
+
+The PID class turns the line position into a steering level
+"""
+
+# Import the libraries we need
+import numpy
+
+
+def FindLine(image, bands, bandHeight, threshold, darkLine = True, upsideDown = False):
+    """
+position = FindLine(image, bands, bandHeight, threshold, [darkLine], [upsideDown])
+
+Finds the line in a BGR or grey image, returns the position from -1.0 (left edge) to +1.0 (right edge)
+Returns None if none of the bands can see the line
+
+bands is a list of positions down the image to check, from 0.0 (top) to 1.0 (bottom), nearest the robot first
+bandHeight is the number of rows averaged for each band
+threshold is the grey level between the line and the floor (0 to 255)
+darkLine should be True for dark tape on a light floor, False for light tape on a dark floor
+upsideDown should be True if the image has not been rotated to match the camera mounting, e.g.
+straight from the capture stream when the web page shows the image flipped
+    """
+    height = image.shape[0]
+    width = image.shape[1]
+    # Take the rows for each band, the bands nearest the robot count for more
+    rows = []
+    for band in bands:
+        if upsideDown:
+            band = 1.0 - band
+        top = int(band * (height - bandHeight))
+        rows.append(image[top : top + bandHeight])
+    rows = numpy.array(rows)
+    if rows.ndim == 4:
+        # Colour image, convert to grey by averaging the channels
+        rows = rows.mean(axis = 3)
+    levels = rows.mean(axis = 1)
+    if darkLine:
+        matches = levels < threshold
+    else:
+        matches = levels > threshold
+    # Centroid of the matching pixels in each band, ignoring bands with no line or no floor
+    counts = matches.sum(axis = 1)
+    columns = numpy.arange(width)
+    valid = (counts > 0) & (counts < (width / 2))
+    if not valid.any():
+        return None
+    centroids = (matches * columns).sum(axis = 1)[valid] / counts[valid].astype(float)
+    weights = numpy.arange(len(bands), 0, -1)[valid]
+    centroid = (centroids * weights).sum() / weights.sum()
+    position = (centroid / (width - 1)) * 2.0 - 1.0
+    if upsideDown:
+        position = -position
+    return position
+
+
+class PID:
+    """
+PID(kp, ki, kd, [limit])
+
+Proportional, integral and derivative controller, Update returns the output for a new error value
+The output and the integral are limited to +/- limit
+    """
+
+    def __init__(self, kp, ki, kd, limit = 1.0):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.limit = limit
+        self.Reset()
+
+
+    def Reset(self):
+        """
+Reset()
+
+Clears the integral and the last error, use when starting to follow again
+        """
+        self.integral = 0.0
+        self.lastError = None
+
+
+    def Update(self, error, interval):
+        """
+output = Update(error, interval)
+
+Works out the output for a new error, interval is the time in seconds since the last update
+        """
+        self.integral += error * interval
+        self.integral = max(-self.limit, min(self.integral, self.limit))
+        if (self.lastError == None) or (interval <= 0):
+            derivative = 0.0
+        else:
+            derivative = (error - self.lastError) / interval
+        self.lastError = error
+        output = self.kp * error + self.ki * self.integral + self.kd * derivative
+        return max(-self.limit, min(output, self.limit))
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# coding: latin-1
+
+# Measures how the drive latency changes as more people watch the camera
+# Runs the web-page with the emulated board and camera, adds camera viewers and sends /set commands at a fixed rate
+# The latency is from sending /set to the emulated board seeing the new motor level on the simulated bus
+# Usage: ./loadTest.py [robot] [output.json]
+
+# Load library functions we want
+import sys
+import os
+import time
+import json
+import socket
+import random
+import threading
+import subprocess
+
+# Settings for the test
+robotName = 'diddy'                     # Robot to run, one of the names in robotBoards.py
+webPort = 8080                          # Port for the web-page, above 1024 so sudo is not needed
+viewerCounts = [0, 1, 2, 4, 8]          # Numbers of camera viewers to measure with, each is run in turn
+viewerMode = 'stream'                   # 'stream' checks /frame/ like the /stream page, 'jpeg' fetches /cam.jpg back to back
+viewerBandwidth = 250000                # Bytes per second each viewer can receive, 0 for no limit
+setRate = 20                            # Number of /set commands sent per second
+settleSeconds = 2.0                     # Seconds after the viewers start before measuring
+measureSeconds = 10.0                   # Seconds each number of viewers is measured for
+slewLimits = False                      # False so each /set is one motor write, True to keep the acceleration limits and include the ramp in the latency
+outputFile = 'loadTest.json'            # Machine readable results, written after every number of viewers
+
+# Returns the value at percent through a sorted list
+def Percentile(values, percent):
+    if len(values) == 0:
+        return None
+    index = int(round(percent / 100.0 * (len(values) - 1)))
+    return values[index]
+
+# Fetches a path from the web-page, reading no faster than bandwidth bytes per second, returns (status, body)
+def Fetch(path, bandwidth):
+    connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if bandwidth > 0:
+        # A small receive buffer so the server feels the slow connection like it would over WiFi
+        connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    connection.connect(('127.0.0.1', webPort))
+    connection.sendall('GET %s HTTP/1.0\r\n\r\n' % (path))
+    startTime = time.time()
+    chunks = []
+    received = 0
+    while True:
+        chunk = connection.recv(4096)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        received += len(chunk)
+        if bandwidth > 0:
+            delay = startTime + received / float(bandwidth) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+    connection.close()
+    reply = ''.join(chunks)
+    header, separator, body = reply.partition('\n\n')
+    status = header.split(' ')[1] if ' ' in header else '0'
+    return status, body
+
+# Camera viewer, run as its own process so it does not take processor time from the web-page
+# Prints its results as JSON once it has finished
+def Viewer(mode, bandwidth, displayRate, measureStart, measureEnd):
+    frames = 0
+    received = 0
+    errors = 0
+    frameNumber = ''
+    displayDelay = 1.0 / displayRate
+    while time.time() < measureEnd:
+        startTime = time.time()
+        try:
+            if mode == 'stream':
+                # The same requests as the /stream page, only fetch the image when the frame number changes
+                status, body = Fetch('/frame/%s?%f' % (frameNumber, random.random()), bandwidth)
+                if (status == '200') and (body != frameNumber):
+                    frameNumber = body
+                    status, body = Fetch('/cam.jpg?%s' % (frameNumber), bandwidth)
+                    if (status == '200') and (startTime >= measureStart):
+                        frames += 1
+                        received += len(body)
+                delay = startTime + displayDelay - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                status, body = Fetch('/cam.jpg', bandwidth)
+                if (status == '200') and (startTime >= measureStart):
+                    frames += 1
+                    received += len(body)
+        except socket.error:
+            errors += 1
+            time.sleep(0.1)
+    seconds = measureEnd - measureStart
+    print json.dumps({'fps': frames / seconds, 'bytesPerSecond': received / seconds, 'errors': errors})
+
+# Matches each /set command with the motor write it causes on the emulated board
+class LatencyTracker:
+    def __init__(self):
+        self.lockPending = threading.Lock()
+        self.pending = []
+        self.latencies = []
+        self.superseded = 0
+
+    def Reset(self):
+        self.lockPending.acquire()
+        self.latencies = []
+        self.superseded = 0
+        self.lockPending.release()
+
+    def Sent(self, pwm, sendTime):
+        self.lockPending.acquire()
+        self.pending.append((pwm, sendTime))
+        self.lockPending.release()
+
+    def Written(self, pwm, writeTime):
+        # The newest command with this level is the one written, any sent before it were replaced before reaching the board
+        self.lockPending.acquire()
+        for index in range(len(self.pending) - 1, -1, -1):
+            if self.pending[index][0] == pwm:
+                self.latencies.append(writeTime - self.pending[index][1])
+                self.superseded += index
+                del self.pending[:index + 1]
+                break
+        self.lockPending.release()
+
+# Called by the emulated board after each write, records the motor levels
+def MotorWritten(board, command, data):
+    name = board.driver.CommandName(command)
+    if name.startswith('SET_') and (name.endswith('_FWD') or name.endswith('_REV')) and (len(data) > 0):
+        tracker.Written(data[0], time.time())
+
+# Sends /set commands at a fixed rate, each with a different level so the motor writes can be matched up
+class DriveSender(threading.Thread):
+    def __init__(self):
+        super(DriveSender, self).__init__()
+        self.responseTimes = []
+        self.errors = 0
+        self.terminated = False
+        self.start()
+
+    def run(self):
+        interval = 1.0 / setRate
+        nextTime = time.time()
+        count = 0
+        while not self.terminated:
+            level = 0.3 + 0.5 * (count % 10) / 10.0
+            pwm = int(pwmMax * (level * robotWeb.maxPower))
+            count += 1
+            sendTime = time.time()
+            tracker.Sent(pwm, sendTime)
+            try:
+                Fetch('/set/%.3f/%.3f' % (level, level), 0)
+                self.responseTimes.append(time.time() - sendTime)
+            except socket.error:
+                self.errors += 1
+            nextTime += interval
+            delay = nextTime - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                nextTime = time.time()
+
+# Started as a viewer by the main test
+if (len(sys.argv) == 7) and (sys.argv[1] == '--viewer'):
+    webPort = int(sys.argv[3])
+    Viewer(sys.argv[2], int(sys.argv[4]), float(sys.argv[5]), float(sys.argv[6]), float(sys.argv[6]) + measureSeconds)
+    sys.exit()
+if len(sys.argv) > 1:
+    robotName = sys.argv[1]
+if len(sys.argv) > 2:
+    outputFile = sys.argv[2]
+
+# Start the web-page with the emulated board and camera, ignoring any settings file
+import robotWeb
+robotWeb.webPort = webPort
+robotWeb.settingsFile = os.devnull
+if not slewLimits:
+    robotWeb.accelerationLimit = 1000.0
+    robotWeb.decelerationLimit = 1000.0
+server = threading.Thread(target = robotWeb.Run, args = (robotName, True))
+server.start()
+if not robotWeb.systemReady.wait(30):
+    print 'The web-page did not start'
+    robotWeb.running = False
+    sys.exit()
+tracker = LatencyTracker()
+# Only the motor board is tracked, an emulated UltraBorg shares the bus but has no motors
+emulatedBoard = robotWeb.simulatedBus.boards[robotWeb.board.i2cAddress]
+emulatedBoard.writeFunction = MotorWritten
+pwmMax = emulatedBoard.driver.PWM_MAX
+sender = DriveSender()
+
+# Measure with each number of viewers in turn
+results = {'robot': robotName, 'viewerMode': viewerMode, 'viewerBandwidth': viewerBandwidth, 'setRate': setRate,
+           'measureSeconds': measureSeconds, 'slewLimits': slewLimits, 'imageWidth': robotWeb.imageWidth,
+           'imageHeight': robotWeb.imageHeight, 'frameRate': robotWeb.frameRate, 'jpegQuality': robotWeb.jpegQuality, 'steps': []}
+print
+print 'Viewers   p50 ms   p95 ms   p99 ms   max ms   Missed   fps/viewer   Process CPU %'
+try:
+    for viewers in viewerCounts:
+        measureStart = time.time() + settleSeconds
+        processes = []
+        for index in range(viewers):
+            processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), '--viewer', viewerMode, str(webPort),
+                                               str(viewerBandwidth), str(robotWeb.displayRate), repr(measureStart)], stdout = subprocess.PIPE))
+        time.sleep(max(measureStart - time.time(), 0.0))
+        tracker.Reset()
+        sender.responseTimes = []
+        loopsBefore, overrunsBefore, jitterMean, jitterMax = robotWeb.motorControl.GetStats()
+        timesBefore = os.times()
+        time.sleep(measureSeconds)
+        timesAfter = os.times()
+        loopsAfter, overrunsAfter, jitterMean, jitterMax = robotWeb.motorControl.GetStats()
+        latencies = sorted(tracker.latencies)
+        responseTimes = sorted(sender.responseTimes)
+        # The whole of this process, the web-page plus the /set sender and the motor write tracking, the viewers are separate processes
+        cpu = ((timesAfter[0] - timesBefore[0]) + (timesAfter[1] - timesBefore[1])) / (timesAfter[4] - timesBefore[4]) * 100.0
+        viewerResults = []
+        for process in processes:
+            output = process.communicate()[0]
+            try:
+                viewerResults.append(json.loads(output.strip().split('\n')[-1]))
+            except ValueError:
+                viewerResults.append({'fps': 0.0, 'bytesPerSecond': 0.0, 'errors': -1})
+        step = {'viewers': viewers, 'samples': len(latencies), 'missed': tracker.superseded, 'processCpuPercent': cpu,
+                'controlOverruns': overrunsAfter - overrunsBefore, 'viewerResults': viewerResults}
+        for name, values in (('latency', latencies), ('response', responseTimes)):
+            step[name] = {'p50': Percentile(values, 50), 'p95': Percentile(values, 95), 'p99': Percentile(values, 99)}
+            if len(values) > 0:
+                step[name]['max'] = values[-1]
+                step[name]['mean'] = sum(values) / len(values)
+        results['steps'].append(step)
+        if len(latencies) > 0:
+            fps = sum([viewer['fps'] for viewer in viewerResults]) / max(len(viewerResults), 1)
+            print '%7d  %7.1f  %7.1f  %7.1f  %7.1f  %7d  %11.1f  %14.1f' % (viewers, step['latency']['p50'] * 1000.0, step['latency']['p95'] * 1000.0,
+                                                                            step['latency']['p99'] * 1000.0, step['latency']['max'] * 1000.0,
+                                                                            tracker.superseded, fps, cpu)
+        else:
+            print '%7d  no motor writes seen' % (viewers)
+        outputJson = open(outputFile, 'w')
+        json.dump(results, outputJson, indent = 2, sort_keys = True)
+        outputJson.close()
+finally:
+    # Stop sending, then close the web-page
+    sender.terminated = True
+    sender.join()
+    robotWeb.running = False
+    server.join()
+print 'Results written to %s' % (outputFile)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module describes the robots robotWeb.py can drive and how each one uses its motor board
+
+Each robot is a board adapter, it knows how to find the board, how the motors are wired,
+the power limits and what else the board can do, e.g.
+import robotBoards
+robot = robotBoards.ROBOTS['diddy']
+if robot.Open(False):
+    robot.SetDrive(0.5, 0.5)
+
+To add a robot put a new entry in ROBOTS, for a new type of board add a class based on BoardAdapter
+"""
+
+# Constant values
+LEFT                    = 'left'
+RIGHT                   = 'right'
+
+
+class BoardAdapter:
+    """
+BoardAdapter(title, voltageIn, voltageOut, motors, [settings], [address], [epoIgnore], [ultrasonic])
+
+Common part of the board adapters, wraps the board driver with what robotWeb.py needs to know
+
+title                   Name of the robot
+voltageIn               Total battery voltage to the board
+voltageOut              Maximum motor voltage
+voltageOutMax           Highest voltageOut which can be set while running, the voltageOut given for the robot
+motors                  (side, sign) for each motor output in order, side is LEFT or RIGHT and sign is +1 or -1
+settings                Dictionary of robotWeb.py settings which are different for this robot, e.g. {'frameRate': 30}
+address                 IC address of the board, None for the default address
+epoIgnore               True to disable the EPO latch, needed if you do not have a switch / jumper
+ultrasonic              True if the robot has an UltraBorg, enables the Semi-Auto, Auto, Line Follow and Follow modes
+board                   The board driver object, set by Open
+
+Capabilities, set by the adapter for each type of board:
+boardName               Name of the board used in messages
+moves                   True if the board can do encoder moves (/move)
+battery                 True if the board can read its battery voltage (/battery)
+leds                    True if the board can drive an external LED strip
+ir                      True if the board has an IR receiver
+
+Each type of board must also provide:
+CreateBoard()           Creates the board driver object and sets setters to its SetMotorN functions in order
+ScanForBoards()         Returns the addresses of the boards of this type which can be found
+    """
+
+    boardName               = 'board'
+    moves                   = False
+    battery                 = False
+    leds                    = False
+    ir                      = False
+    board                   = None
+
+
+    def __init__(self, title, voltageIn, voltageOut, motors, settings = {}, address = None, epoIgnore = False, ultrasonic = False):
+        self.title = title
+        self.voltageIn = voltageIn
+        self.voltageOut = voltageOut
+        self.voltageOutMax = voltageOut
+        self.motors = motors
+        self.settings = settings
+        self.address = address
+        self.epoIgnore = epoIgnore
+        self.ultrasonic = ultrasonic
+
+
+    def Prepare(self):
+        """
+Prepare()
+
+Puts the board into its starting state once it has been found
+        """
+        pass
+
+
+    def Open(self, commsFailsafe, reconnectFunction = None):
+        """
+found = Open(commsFailsafe, [reconnectFunction])
+
+Finds the board and sets it up, returns False if the board cannot be found
+reconnectFunction is called by the board driver once the board has been reconnected
+        """
+        self.board = self.CreateBoard()
+        if self.address != None:
+            self.board.i2cAddress = self.address
+        self.board.Init()
+        if not self.board.foundChip:
+            boards = self.ScanForBoards()
+            if len(boards) == 0:
+                print 'No %s found, check you are attached :)' % (self.boardName)
+            else:
+                print 'No %s at address %02X, but we did find boards:' % (self.boardName, self.board.i2cAddress)
+                for board in boards:
+                    print '    %02X (%d)' % (board, board)
+                print 'If you need to change the IC address set it for the robot in robotBoards.py, e.g.'
+                print 'address = 0x%02X' % (boards[0])
+            self.board = None
+            return False
+        self.board.SetCommsFailsafe(commsFailsafe)
+        self.Prepare()
+        self.board.reconnectFunction = reconnectFunction
+        self.board.autoReconnect = True
+        return True
+
+
+    def Reconnected(self):
+        """
+Reconnected()
+
+Called once the board has been reconnected, restores anything the driver does not
+        """
+        pass
+
+
+    def SetDrive(self, driveLeft, driveRight):
+        """
+SetDrive(driveLeft, driveRight)
+
+Sets the motor outputs from the left and right drive levels using the motor wiring
+        """
+        for index in range(len(self.motors)):
+            side, sign = self.motors[index]
+            if side == LEFT:
+                self.setters[index](sign * driveLeft)
+            else:
+                self.setters[index](sign * driveRight)
+
+
+    def EncoderMoveAsync(self, countsLeft, countsRight, timeout = None, callback = None):
+        """
+move = EncoderMoveAsync(countsLeft, countsRight, [timeout], [callback])
+
+Queues an encoder move by left and right counts using the motor wiring, only for boards with moves
+Returns the EncoderMove handle from the board driver
+        """
+        counts = []
+        for side, sign in self.motors:
+            if side == LEFT:
+                counts.append(sign * countsLeft)
+            else:
+                counts.append(sign * countsRight)
+        return self.board.EncoderMoveAsync(counts[0], counts[1], timeout, callback)
+
+
+    def MotorsOff(self):
+        """
+MotorsOff()
+
+Stops all of the motors straight away, including any encoder moves
+        """
+        if self.moves:
+            self.board.CancelEncoderMoves()
+        self.board.MotorsOff()
+
+
+    def ShowControlled(self, controlled):
+        """
+ShowControlled(controlled)
+
+Shows on the board if someone is in control of the robot, called when the watchdog times out or reconnects
+        """
+        pass
+
+
+    def Close(self):
+        """
+Close()
+
+Leaves the board in its finished state when the script ends
+        """
+        pass
+
+
+class PicoBorgRevAdapter(BoardAdapter):
+    """
+PicoBorgRevAdapter(title, voltageIn, voltageOut, motors, ...)
+
+Board adapter for the PicoBorg Reverse, the LED is left on when the script ends
+    """
+
+    boardName               = 'PicoBorg Reverse'
+    moves                   = True
+
+
+    def CreateBoard(self):
+        import PicoBorgRev
+        board = PicoBorgRev.PicoBorgRev()
+        self.setters = [board.SetMotor1, board.SetMotor2]
+        return board
+
+
+    def ScanForBoards(self):
+        import PicoBorgRev
+        return PicoBorgRev.ScanForPicoBorgReverse()
+
+
+    def Prepare(self):
+        if self.epoIgnore:
+            self.board.SetEpoIgnore(True)
+        self.board.ResetEpo()
+
+
+    def Reconnected(self):
+        # The board has forgotten any encoder move it was part way through
+        self.board.CancelEncoderMoves()
+        self.board.SetEncoderMoveMode(False)
+        self.board.ResetEpo()
+
+
+    def Close(self):
+        self.board.SetLed(True)
+
+
+class DiabloAdapter(BoardAdapter):
+    """
+DiabloAdapter(title, voltageIn, voltageOut, motors, ...)
+
+Board adapter for the Diablo
+    """
+
+    boardName               = 'Diablo'
+    moves                   = True
+
+
+    def CreateBoard(self):
+        import Diablo
+        board = Diablo.Diablo()
+        self.setters = [board.SetMotor1, board.SetMotor2]
+        return board
+
+
+    def ScanForBoards(self):
+        import Diablo
+        return Diablo.ScanForDiablo()
+
+
+    def Prepare(self):
+        if self.epoIgnore:
+            self.board.SetEpoIgnore(True)
+        self.board.ResetEpo()
+
+
+    def Reconnected(self):
+        # The board has forgotten any encoder move it was part way through
+        self.board.CancelEncoderMoves()
+        self.board.SetEncoderMoveMode(False)
+        self.board.ResetEpo()
+
+
+class ThunderBorgAdapter(BoardAdapter):
+    """
+ThunderBorgAdapter(title, voltageIn, voltageOut, motors, ...)
+
+Board adapter for the ThunderBorg, the LEDs are blue while waiting for a connection
+and show the battery level while someone is in control of the robot
+    """
+
+    boardName               = 'ThunderBorg'
+    battery                 = True
+    leds                    = True
+
+
+    def CreateBoard(self):
+        import ThunderBorg
+        board = ThunderBorg.ThunderBorg()
+        self.setters = [board.SetMotor1, board.SetMotor2]
+        return board
+
+
+    def ScanForBoards(self):
+        import ThunderBorg
+        return ThunderBorg.ScanForThunderBorg()
+
+
+    def Prepare(self):
+        self.board.SetLedShowBattery(False)
+        self.board.SetLeds(0,0,1)
+
+
+    def ShowControlled(self, controlled):
+        if controlled:
+            self.board.SetLedShowBattery(True)
+        else:
+            self.board.SetLedShowBattery(False)
+            self.board.SetLeds(0,0,1)
+
+
+    def Close(self):
+        self.board.SetLedShowBattery(False)
+        self.board.SetLeds(0,0,0)
+        self.board.MotorsOff()
+
+
+class ZeroBorgAdapter(BoardAdapter):
+    """
+ZeroBorgAdapter(title, voltageIn, voltageOut, motors, ...)
+
+Board adapter for the ZeroBorg, the LED is left on when the script ends
+    """
+
+    boardName               = 'ZeroBorg'
+    ir                      = True
+
+
+    def CreateBoard(self):
+        import ZeroBorg
+        board = ZeroBorg.ZeroBorg()
+        self.setters = [board.SetMotor1, board.SetMotor2, board.SetMotor3, board.SetMotor4]
+        return board
+
+
+    def ScanForBoards(self):
+        import ZeroBorg
+        return ZeroBorg.ScanForZeroBorg()
+
+
+    def Prepare(self):
+        if self.epoIgnore:
+            self.board.SetEpoIgnore(True)
+        self.board.ResetEpo()
+        self.board.SetLed(False)
+
+
+    def Reconnected(self):
+        self.board.ResetEpo()
+
+
+    def Close(self):
+        self.board.SetLed(True)
+
+
+# The robots, voltageOut is limited to 95% on some robots to allow the RPi to get uninterrupted power
+# For the 4Borg and YetiBorg change voltageIn to 9V if using a non-rechargeable battery
+# The YetiBorg motors are front right, front left, rear left and rear right
+ROBOTS = {
+    'diddy':        PicoBorgRevAdapter('DiddyBorg', 1.2 * 10, 6.0, [(RIGHT, +1), (LEFT, -1)]),
+    'diddyRed':     PicoBorgRevAdapter('DiddyBorg Red Edition', 1.2 * 10, 12.0 * 0.95, [(RIGHT, +1), (LEFT, -1)]),
+    'metal':        PicoBorgRevAdapter('DiddyBorg Metal Edition', 1.2 * 12, 12.0, [(RIGHT, +1), (LEFT, -1)]),
+    'metalv2':      PicoBorgRevAdapter('DiddyBorg Metal Edition', 1.2 * 12, 12.0, [(RIGHT, +1), (LEFT, -1)], ultrasonic = True),
+    '4Borg':        PicoBorgRevAdapter('4Borg', 8.4, 6.0, [(LEFT, -1), (RIGHT, +1)]),
+    'diablo':       DiabloAdapter('Diablo robot', 1.2 * 10, 12.0 * 0.95, [(LEFT, +1), (RIGHT, +1)]),
+    'monster':      ThunderBorgAdapter('MonsterBorg', 1.2 * 10, 12.0 * 0.95, [(RIGHT, +1), (LEFT, +1)],
+                                       settings = {'imageHeight': 192, 'frameRate': 30, 'displayRate': 10}),
+    'yeti':         ZeroBorgAdapter('YetiBorg', 8.4, 6.0, [(RIGHT, -1), (LEFT, -1), (LEFT, -1), (RIGHT, -1)]),
+}
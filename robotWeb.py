@@ -0,0 +1,3213 @@
+#!/usr/bin/env python
+# coding: Latin-1
+
+# Creates a web-page interface for any of the robots described in robotBoards.py
+# Usage: sudo ./robotWeb.py robot, e.g. sudo ./robotWeb.py diddy
+# The scripts for each robot, such as diddyWeb.py, run this with their robot already chosen
+# Semi-Auto and Auto modes from metalWebv2.py by wingers999, with /touch interface, keyboard control for /hold (arrow keys) and the Ultraborg sensor values
+# thanks to gt213296's post on http://forum.piborg.org/comment/4090 for Ultraborg information and for Semi-Auto and Auto mode additions
+# thanks to WS at http://forum.piborg.org/thunderborg/examples/users for /touch mode, keyboard control for /hold mode and jpeg quality settings
+
+# Import library functions we need
+import robotBoards
+import time
+import ctypes
+import sys
+import os
+import threading
+import SocketServer
+import bisect
+import traceback
+try:
+    import picamera
+    import picamera.array
+except ImportError:
+    # Not on a Raspberry Pi, only the emulated camera can be used (--simulate)
+    import cameraSim as picamera
+import cv2
+import numpy
+import lineFollow
+import targetFollow
+import datetime
+
+# Settings for the web-page
+webPort = 80                            # Port number for the web-page, 80 is what web-pages normally use
+imageWidth = 240                        # Width of the captured image in pixels
+imageHeight = 180                       # Height of the captured image in pixels
+frameRate = 10                          # Number of images to capture per second
+displayRate = 2                         # Number of images to request per second
+photoDirectory = '/home/pi'             # Directory to save photos to
+flippedCamera = True                    # Swap between True and False if the camera image is rotated by 180
+jpegQuality = 80                        # JPEG quality level, smaller is faster, higher looks better (0 to 100)
+
+# Settings file, the values in it replace the settings in this script and it is checked for changes while running
+settingsFile = 'robotWeb-%s.cfg'        # Name of the settings file, %s is replaced by the robot name so each robot has its own, a name without a directory is next to robotWeb.py
+settingsCheckInterval = 2.0             # Seconds between checks for changes to the settings file
+settingsHistorySize = 50                # Number of applied changes listed on /settings
+
+# Settings which can be changed while running, with the type, the allowed range and how the change is applied
+# 'live' is used straight away, 'power' works out maxPower again, 'camera' reconfigures the camera and 'restart' is used next time
+tunableSettings = {
+    'webPort':          (int, 1, 65535, 'restart'),
+    'imageWidth':       (int, 32, 1920, 'camera'),
+    'imageHeight':      (int, 16, 1080, 'camera'),
+    'frameRate':        (int, 1, 90, 'camera'),
+    'displayRate':      (int, 1, 30, 'live'),
+    'jpegQuality':      (int, 0, 100, 'live'),
+    'flippedCamera':    (bool, None, None, 'live'),
+    'changeThreshold':  (float, 0.0, 255.0, 'live'),
+    'watchdogTimeout':  (float, 0.1, 60.0, 'live'),
+    'voltageIn':        (float, 0.1, 40.0, 'power'),
+    'voltageOut':       (float, 0.1, 40.0, 'power'),
+}
+
+# Simulation settings, used when started with --simulate to run without a robot or camera
+simulatedReplay = None                  # Directory of photos or a video file for the emulated camera, None for a test pattern
+simulatedBusSpeed = 100000              # I2C clock in Hz for the emulated bus, 0 for no bus delay
+simulatedLatency = 0.0                  # Extra delay in seconds for each I2C transaction with the emulated board
+simulatedErrorRate = 0.0                # Chance from 0.0 to 1.0 of each I2C transaction with the emulated board failing
+
+# I2C profiling settings, /i2cprofile shows which commands are using up the bus time
+i2cProfile = False                      # Set to True to start profiling with the script, it can also be turned on from /i2cprofile
+i2cProfileInterval = 1.0                # Seconds between samples of the I2C statistics
+i2cProfileSamples = 60                  # Number of samples kept, the profile covers the last i2cProfileSamples * i2cProfileInterval seconds
+
+# Metrics settings, /metrics gives the counters and timings in the Prometheus text format
+metricsRoutesMax = 40                   # Most different request paths counted separately, any more are counted as 'other'
+
+# Debug settings, /debug/profile and /debug/threads show what each thread is doing
+debugEnabled = False                    # Set to True to allow the /debug pages, they show the inside of the script to anyone who can reach the web-page
+debugProfileSeconds = 10                # Length of a profile in seconds when none is given
+debugProfileMax = 60                    # Longest profile in seconds which can be asked for
+debugProfileRate = 50                   # Number of times per second the thread stacks are sampled while profiling
+
+# Histogram buckets for /metrics, upper limits in seconds
+REQUEST_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+ENCODE_BUCKETS = [0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2]
+
+# Movement mode constants
+MANUAL_MODE = 0                         # User controlled movement
+SEMI_AUTO_MODE = 1                      # Semi-automatic movement
+AUTO_MODE = 2                           # Fully automatic movement
+LINE_MODE = 3                           # Follow a line of tape on the floor
+FOLLOW_MODE = 4                         # Follow a coloured object or a face
+
+# Global values
+global robot
+global robotName
+global board
+global lastFrame
+global frameNumber
+global lockFrame
+global camera
+global processor
+global running
+global watchdog
+global movementMode
+global captureThread
+global sentry
+global autoMovement
+global distanceSampler
+global vision
+global lineFollower
+global follower
+global battery
+global ledAnimator
+global ledBatteryEmpty
+global ledBatteryFull
+global irInput
+global motorControl
+global maxPower
+global systemReady
+global startupStages
+global startupTime
+global settingsHistory
+global settingsWatcher
+global simulatedBus
+global i2cProfiler
+global debugProfiler
+running = True
+movementMode = MANUAL_MODE
+robot = None
+robotName = None
+board = None
+camera = None
+processor = None
+captureThread = None
+sentry = None
+watchdog = None
+motorControl = None
+autoMovement = None
+distanceSampler = None
+vision = None
+lineFollower = None
+follower = None
+battery = None
+ledAnimator = None
+ledBatteryEmpty = None
+ledBatteryFull = None
+irInput = None
+maxPower = 1.0
+systemReady = threading.Event()
+startupStages = []
+startupTime = time.time()
+settingsHistory = []
+settingsWatcher = None
+simulatedBus = None
+i2cProfiler = None
+debugProfiler = None
+lockSettings = threading.Lock()
+
+# Setup the UltraBorg, only for robots with ultrasonic sensors
+global UB
+UB = None
+def SetupUltraBorg():
+    global UB
+    if simulatedBus != None:
+        UB = boardSim.SimulatedUltraBorg(simulatedBus)  # Reads the emulated UltraBorg on the simulated bus
+    else:
+        import UltraBorg
+        UB = UltraBorg.UltraBorg()          # Create a new UltraBorg object
+    UB.Init()                               # Set the board up (checks the board is connected)
+    return True
+
+# Setup the motor board using the adapter for the robot
+def SetupBoard():
+    global board
+    if not robot.Open(commsFailsafe, BoardReconnected):
+        return False
+    board = robot.board
+    return True
+
+# Motor control settings
+controlRate = 50                        # Number of times per second the motor outputs are updated
+accelerationLimit = 4.0                 # Maximum increase in drive level per second, 1.0 is full power
+decelerationLimit = 8.0                 # Maximum decrease in drive level per second, 1.0 is full power
+driveRefresh = 0.2                      # Seconds between repeating unchanged motor outputs, puts right a write which failed
+
+# Communications failsafe settings
+commsFailsafe = False                   # Set to True to have the board stop the motors itself if it is not commanded every 1/4 of a second
+failsafeHeartbeats = 1.5                # Heartbeats the control page can miss before the motors stop being kept alive, it sends one every 1/3 of watchdogTimeout
+failsafeRefresh = 0.1                   # Seconds between repeated motor commands while a client is connected
+failsafeBoardTimeout = 0.25             # Seconds the board keeps the motors running without a command before its failsafe stops them
+failsafeCheckMargin = 0.1               # Extra seconds after failsafeBoardTimeout before the motor levels are read back to check the board stopped them
+
+# Watchdog settings
+watchdogTimeout = 1.0                   # Seconds without a command from the controlling page before the motors are stopped, can be as low as 0.1
+
+# Frame change settings
+changeThreshold = 1.5                   # Average change in pixel level (0 to 255) before a new frame is sent, 0 sends every frame
+changeWidth = 32                        # Width in pixels of the reduced image compared between frames
+changeHeight = 24                       # Height in pixels of the reduced image compared between frames
+
+# Encoder move settings, PicoBorg Reverse and Diablo only, the motors need encoders attached to the board for /move to work
+moveSpeed = 0.5                         # Drive limit for encoder moves, 0.0 to 1.0 of the maximum power
+moveTimeout = 10.0                      # Seconds an encoder move may take before the motors are stopped
+moveSegmentsMax = 20                    # Largest number of move segments accepted by one /move request
+
+# Sentry settings
+sentryDirectory = '/home/pi'            # Directory that sentry recordings and photos are saved to
+sentryVectorLimit = 60                  # Length of a motion vector, for a 16x16 pixel block, counted as movement
+sentryBlocks = 10                       # Number of moving blocks in a frame needed to start recording
+sentryPreRecord = 3                     # Seconds of video kept from before the movement started
+sentryHoldTime = 5.0                    # Seconds without movement before the recording stops
+
+# Battery settings, ThunderBorg only
+batteryInterval = 1.0                   # Seconds between battery readings, kept slow so the readings do not get in the way of the motor commands
+batterySamples = 120                    # Number of battery readings kept for the /battery page
+batteryCompensation = False             # Set to True to work out maxPower from the measured battery voltage so the speed stays the same as the battery drains
+batteryAverage = 10                     # Number of recent readings averaged when working out maxPower
+
+# External LED strip settings, ThunderBorg only
+ledCount = 0                            # Number of SK9822 / APA102C LEDs attached to the ThunderBorg, 0 for none
+ledFrameRate = 10                       # Most times per second the LED strip is updated, it is only written to when it changes
+
+# IR remote settings, ZeroBorg only
+irEnabled = True                        # Set to True to drive with an IR remote control as well as the web page
+irPollRate = 20                         # Number of times per second the ZeroBorg is checked for a new IR message
+irSpeed = 1.0                           # Drive level used by the IR remote, 1.0 is full power
+
+# IR remote buttons, maps the message from the remote to a button name
+# Messages which are not listed are shown on /telemetry as ir.last_unknown, add them here with the button they should act as
+# The robot keeps moving while a button is held, the remote repeats the message and the watchdog stops the robot when it is released
+irButtons = {
+    # 'F75AD5AA8000': 'forward',
+}
+
+# Drive levels (left, right) for each button name
+irActions = {
+    'forward':      ( 1.0,  1.0),
+    'reverse':      (-1.0, -1.0),
+    'spin left':    (-1.0,  1.0),
+    'spin right':   ( 1.0, -1.0),
+    'turn left':    ( 0.0,  1.0),
+    'turn right':   ( 1.0,  0.0),
+    'stop':         ( 0.0,  0.0),
+}
+
+# Ultrasonic distance settings, robots with an UltraBorg only
+distanceRate = 10                       # Number of times per second the ultrasonic distances are read
+distanceMaxAge = 0.5                    # Seconds before the last distance readings are too old to drive with
+
+# Automatic movement settings
+autoSpeed = 0.5                         # Drive level used when moving forward in Auto mode, 1.0 is full power
+autoTurnSpeed = 0.4                     # Drive level used when turning away from an obstacle in Auto mode
+autoClearDistance = 300                 # Distance in mm in front that Auto mode treats as clear to move at full autoSpeed
+autoTurnDistance = 100                  # Distance in mm in front at which Auto mode turns instead of moving forward
+
+# Vision settings
+visionEnabled = True                    # Set to True to look for obstacles in the camera image as well as using the ultrasonics
+visionRate = 5                          # Number of camera frames checked for obstacles each second, does not change the streamed frame rate
+visionWidth = 80                        # Width in pixels of the reduced image used for obstacle detection
+visionHeight = 60                       # Height in pixels of the reduced image used for obstacle detection
+visionFloorRows = 6                     # Rows at the bottom of the reduced image assumed to be floor, used as the floor colour
+visionThreshold = 60                    # Colour difference from the floor colour counted as an obstacle, lower is more sensitive
+visionBlocked = 0.25                    # Free space in front, as a fraction of the image height, below which the way is treated as blocked
+
+# Line following settings
+lineBands = [0.9, 0.75, 0.6]            # Positions down the image checked for the line, 0.0 is the top and 1.0 the bottom, nearest the robot first
+lineBandHeight = 4                      # Number of rows averaged for each band
+lineThreshold = 80                      # Grey level between the line and the floor (0 to 255)
+lineDark = True                         # True for dark tape on a light floor, False for light tape on a dark floor
+lineSpeed = 0.4                         # Drive level when the line is straight ahead, 1.0 is full power
+lineLostTime = 0.5                      # Seconds without seeing the line before the robot stops
+lineKp = 0.6                            # Proportional gain for steering towards the line
+lineKi = 0.0                            # Integral gain for steering towards the line
+lineKd = 0.05                           # Derivative gain for steering towards the line
+
+# Target following settings
+followTarget = 'colour'                 # What to follow, 'colour' for a coloured object or 'face' for a face
+followColourLower = (100, 150, 50)      # Lowest (hue, saturation, value) of the colour to follow, hue is 0 to 179, the default is blue
+followColourUpper = (130, 255, 255)     # Highest (hue, saturation, value) of the colour to follow
+followWidth = 120                       # Width in pixels of the reduced image used to find the target
+followHeight = 90                       # Height in pixels of the reduced image used to find the target
+followRateMax = 10                      # Most times per second to look for the target
+followCpuShare = 0.25                   # Largest share of the processor time spent looking for the target, the rate is lowered to stay within it
+followSpeed = 0.4                       # Drive level used when moving towards the target, 1.0 is full power
+followTurn = 0.5                        # How strongly the robot turns to keep the target centred
+followSize = 0.1                        # Target size, as a fraction of the image, at which the robot stops moving closer
+followLostTime = 1.0                    # Seconds without seeing the target before the robot stops
+followStopDistance = 150                # Distance in mm in front at which the robot stops moving closer, robots with an UltraBorg only
+
+# Startup stage thread, runs one part of the startup sequence once the stages it depends on are ready
+class StartupStage(threading.Thread):
+    def __init__(self, name, setup, dependencies = []):
+        super(StartupStage, self).__init__()
+        self.name = name
+        self.setup = setup
+        self.dependencies = dependencies
+        self.ready = False
+        self.failed = False
+        self.duration = 0.0
+        self.start()
+
+    def run(self):
+        global running
+        # This method runs in a separate thread
+        for stage in self.dependencies:
+            stage.join()
+            if not stage.ready:
+                print 'Startup stage %s skipped, %s did not start' % (self.name, stage.name)
+                self.failed = True
+                return
+        startTime = time.time()
+        try:
+            self.ready = (self.setup() != False)
+        except KeyboardInterrupt:
+            raise
+        except Exception, e:
+            print 'Startup stage %s failed: %s' % (self.name, e)
+        self.duration = time.time() - startTime
+        if self.ready:
+            print 'Startup stage %s ready in %.2f seconds' % (self.name, self.duration)
+            CheckStartupComplete()
+        else:
+            # Without this stage we cannot run, flag the script to exit
+            self.failed = True
+            running = False
+
+# Reports the time to ready once every startup stage has finished
+lockStartup = threading.Lock()
+def CheckStartupComplete():
+    lockStartup.acquire()
+    if not systemReady.is_set():
+        if startupStages and all([stage.ready for stage in startupStages]):
+            print 'Ready after %.2f seconds' % (time.time() - startupTime)
+            systemReady.set()
+    lockStartup.release()
+
+# Monotonic clock in seconds, unlike time.time() it does not jump when the system time is set after boot
+CLOCK_MONOTONIC = 1
+class Timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+try:
+    clockGetTime = ctypes.CDLL('librt.so.1', use_errno = True).clock_gettime
+    clockGetTime.argtypes = [ctypes.c_int, ctypes.POINTER(Timespec)]
+except:
+    clockGetTime = None
+def MonotonicTime():
+    if clockGetTime == None:
+        return time.time()
+    now = Timespec()
+    clockGetTime(CLOCK_MONOTONIC, ctypes.byref(now))
+    return now.tv_sec + now.tv_nsec * 1e-9
+
+# Sets the motor outputs from the left and right drive levels, the robot adapter knows how the motors are wired
+def SetDrive(driveLeft, driveRight):
+    if board.reconnecting:
+        # The board is being reconnected, the control loop will ramp back up once it returns
+        return
+    robot.SetDrive(driveLeft * maxPower, driveRight * maxPower)
+
+# Encoder moves, the board is kept in encoder mode until all of the queued moves have finished
+lockMoves = threading.Lock()
+def QueueMoves(segments):
+    motorControl.Stop()
+    # Hold the drive lock as well so the motor control does not repeat the stopped outputs over the new moves
+    motorControl.lockDrive.acquire()
+    lockMoves.acquire()
+    if board.GetEncoderMovesPending() == 0:
+        board.SetEncoderSpeed(moveSpeed * maxPower)
+        board.SetEncoderMoveMode(True)
+    moves = []
+    for countsLeft, countsRight in segments:
+        moves.append(robot.EncoderMoveAsync(countsLeft, countsRight, moveTimeout, MoveFinished))
+    lockMoves.release()
+    motorControl.lockDrive.release()
+    return moves
+
+# Called by the board driver as each queued move finishes
+def MoveFinished(move):
+    lockMoves.acquire()
+    if board.GetEncoderMovesPending() == 0:
+        board.SetEncoderMoveMode(False)
+    lockMoves.release()
+
+# Returns True while encoder moves are driving the motors
+def MovesPending():
+    return robot.moves and (board.GetEncoderMovesPending() > 0)
+
+# Stops any encoder moves so the motors can be driven normally again
+def CancelMoves():
+    if (board != None) and MovesPending():
+        motorControl.Stop()
+
+# Called by the board driver once it has been reconnected and its configuration restored
+def BoardReconnected():
+    robot.Reconnected()
+    if motorControl != None:
+        motorControl.Restart()
+
+# Limits the change from current towards target, slows to a stop before reversing
+def SlewLimit(current, target, accelStep, decelStep):
+    if current > 0 and target < current:
+        return max(current - decelStep, target, 0.0)
+    elif current < 0 and target > current:
+        return min(current + decelStep, target, 0.0)
+    elif target > current:
+        return min(current + accelStep, target)
+    else:
+        return max(current - accelStep, target)
+
+# Motor control thread, moves the motor outputs towards the target drive at a fixed rate
+class MotorControl(threading.Thread):
+    def __init__(self):
+        super(MotorControl, self).__init__()
+        self.lockDrive = threading.Lock()
+        self.targetLeft = 0.0
+        self.targetRight = 0.0
+        self.driveLeft = 0.0
+        self.driveRight = 0.0
+        self.loops = 0
+        self.overruns = 0
+        self.jitterTotal = 0.0
+        self.jitterMax = 0.0
+        self.lastWrite = 0.0
+        self.lostTime = None
+        self.failsafeStops = 0
+        self.failsafeUnconfirmed = 0
+        self.stopLatencyLast = 0.0
+        self.stopLatencyMax = 0.0
+        self.terminated = False
+        self.start()
+
+    def SetTarget(self, driveLeft, driveRight):
+        self.lockDrive.acquire()
+        self.targetLeft = driveLeft
+        self.targetRight = driveRight
+        self.lockDrive.release()
+
+    def Stop(self):
+        # Immediate stop, skips the deceleration limit
+        self.lockDrive.acquire()
+        self.targetLeft = 0.0
+        self.targetRight = 0.0
+        self.driveLeft = 0.0
+        self.driveRight = 0.0
+        self.lostTime = None
+        robot.MotorsOff()
+        self.lockDrive.release()
+
+    def Restart(self):
+        # The board restarted with the motors off, ramp up to the current target again
+        self.lockDrive.acquire()
+        self.driveLeft = 0.0
+        self.driveRight = 0.0
+        self.lockDrive.release()
+
+    def GetStats(self):
+        if self.loops > 0:
+            jitterMean = self.jitterTotal / self.loops
+        else:
+            jitterMean = 0.0
+        return self.loops, self.overruns, jitterMean, self.jitterMax
+
+    def FailsafeWaiting(self):
+        # True while waiting for the board failsafe, nothing may be sent to the board or it will keep the motors running
+        return self.lostTime != None
+
+    def CheckFailsafeStop(self):
+        # Reads the motors back once, after the board failsafe should have stopped them
+        # Reading is a command as well, so it cannot be done any earlier without keeping the motors running
+        motor1 = board.GetMotor1()
+        motor2 = board.GetMotor2()
+        if (motor1 == 0) and (motor2 == 0):
+            # The board stopped failsafeBoardTimeout after the last command we sent
+            self.stopLatencyLast = self.lastWrite + failsafeBoardTimeout - self.lostTime
+            if self.stopLatencyLast > self.stopLatencyMax:
+                self.stopLatencyMax = self.stopLatencyLast
+            self.failsafeStops += 1
+        else:
+            # The board has not stopped on its own, stop the motors ourselves
+            print 'Communications failsafe did not stop the motors'
+            self.failsafeUnconfirmed += 1
+            robot.MotorsOff()
+        self.lostTime = None
+
+    def run(self):
+        interval = 1.0 / controlRate
+        accelStep = accelerationLimit * interval
+        decelStep = decelerationLimit * interval
+        nextTime = MonotonicTime()
+        # This method runs in a separate thread
+        while not self.terminated:
+            self.lockDrive.acquire()
+            now = MonotonicTime()
+            driving = (self.driveLeft != 0) or (self.driveRight != 0)
+            if commsFailsafe and driving and (watchdog != None):
+                if (now - watchdog.timestamp) >= (failsafeHeartbeats * HeartbeatInterval()):
+                    # Client lost, stop sending commands so the board failsafe stops the motors
+                    self.targetLeft = 0.0
+                    self.targetRight = 0.0
+                    self.driveLeft = 0.0
+                    self.driveRight = 0.0
+                    self.lostTime = watchdog.timestamp
+                    driving = False
+            # Move the outputs towards the target and write them if they changed
+            driveLeft = SlewLimit(self.driveLeft, self.targetLeft, accelStep, decelStep)
+            driveRight = SlewLimit(self.driveRight, self.targetRight, accelStep, decelStep)
+            if (driveLeft != self.driveLeft) or (driveRight != self.driveRight):
+                self.driveLeft = driveLeft
+                self.driveRight = driveRight
+                SetDrive(driveLeft, driveRight)
+                self.lastWrite = now
+                self.lostTime = None
+            elif commsFailsafe and driving and (self.lostTime == None) and ((now - self.lastWrite) >= failsafeRefresh):
+                # Repeat the last command to keep the board failsafe from stopping the motors
+                SetDrive(driveLeft, driveRight)
+                self.lastWrite = now
+            elif (self.lostTime == None) and ((now - self.lastWrite) >= driveRefresh) and not MovesPending():
+                # The drivers only print a failed write, repeat the outputs so a lost stop does not leave the motors running
+                SetDrive(driveLeft, driveRight)
+                self.lastWrite = now
+            self.lockDrive.release()
+            # Check the board failsafe has stopped the motors, outside the lock so Stop is not held up
+            if (self.lostTime != None) and ((now - self.lastWrite) >= (failsafeBoardTimeout + failsafeCheckMargin)):
+                self.CheckFailsafeStop()
+            # Wait for the next time slot
+            nextTime += interval
+            delay = nextTime - MonotonicTime()
+            if delay > 0:
+                time.sleep(delay)
+            jitter = MonotonicTime() - nextTime
+            self.loops += 1
+            self.jitterTotal += abs(jitter)
+            if jitter > self.jitterMax:
+                self.jitterMax = jitter
+            if jitter > interval:
+                # Missed at least one time slot, start counting again from now
+                self.overruns += 1
+                nextTime = MonotonicTime()
+
+# Seconds between the heartbeats sent by the control page, three for each watchdogTimeout
+def HeartbeatInterval():
+    return watchdogTimeout / 3.0
+
+# Timeout thread, stops the motors if the controlling page stops sending commands
+# Only the control requests count, pages just showing the camera do not keep the robot moving
+class Watchdog(threading.Thread):
+    def __init__(self):
+        super(Watchdog, self).__init__()
+        self.event = threading.Event()
+        self.lockSessions = threading.Lock()
+        self.sessions = {}
+        self.driver = None
+        self.timedOut = True
+        self.timeouts = 0
+        self.lastTimeout = None
+        self.terminated = False
+        self.timestamp = MonotonicTime()
+        self.start()
+
+    def Command(self, client, driving):
+        # Records a control request, driving commands make the client the one in control
+        now = MonotonicTime()
+        self.lockSessions.acquire()
+        self.sessions[client] = now
+        if driving:
+            self.driver = client
+        if client == self.driver:
+            self.timestamp = now
+        self.lockSessions.release()
+        self.event.set()
+
+    def GetSessions(self):
+        # Returns the seconds since the last command for each control session
+        now = MonotonicTime()
+        self.lockSessions.acquire()
+        ages = [(client, now - last) for client, last in self.sessions.iteritems()]
+        self.lockSessions.release()
+        return ages
+
+    def run(self):
+        # This method runs in a separate thread
+        while not self.terminated:
+            # Wait until the controlling client would time out, or for a new command
+            if self.timedOut:
+                self.event.wait(watchdogTimeout)
+            else:
+                self.event.wait(max(self.timestamp + watchdogTimeout - MonotonicTime(), 0.0))
+            self.event.clear()
+            now = MonotonicTime()
+            self.lockSessions.acquire()
+            age = now - self.timestamp
+            reconnected = self.timedOut and (self.driver != None) and (age < watchdogTimeout)
+            expired = (not self.timedOut) and (age >= watchdogTimeout)
+            if reconnected:
+                self.timedOut = False
+            elif expired:
+                self.timedOut = True
+                self.timeouts += 1
+                self.lastTimeout = self.driver
+            # Forget sessions we have not heard from in a long time
+            for client, last in self.sessions.items():
+                if (now - last) > 60.0:
+                    del self.sessions[client]
+            self.lockSessions.release()
+            if reconnected:
+                # Connection
+                print 'Reconnected...'
+                robot.ShowControlled(True)
+            elif expired:
+                # Timed out
+                print 'Timed out...'
+                robot.ShowControlled(False)
+                motorControl.Stop()
+
+# Timing histogram for /metrics, only one thread may call Observe so no lock is needed
+# The counts are not cumulative, FormatHistogram adds them up when they are read
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def Observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+# Request counters for /metrics, only the web server thread updates them so no locks are needed
+class RequestStats:
+    def __init__(self):
+        self.counts = {}
+        self.bytes = {}
+        self.times = {}
+        self.framesSent = 0
+        self.framesNotModified = 0
+
+    def RouteName(self, getPath):
+        # Groups requests by the first part of the path, e.g. /set/0.5/0.5 is /set
+        route = '/' + getPath.split('?')[0].split('/')[1]
+        if (not self.counts.has_key(route)) and (len(self.counts) >= metricsRoutesMax):
+            route = 'other'
+        return route
+
+    def Record(self, route, bytesSent, duration):
+        if not self.counts.has_key(route):
+            self.counts[route] = 0
+            self.bytes[route] = 0
+            self.times[route] = Histogram(REQUEST_BUCKETS)
+        self.counts[route] += 1
+        self.bytes[route] += bytesSent
+        self.times[route].Observe(duration)
+
+# Frame output stages, used by the stream processor and by benchCapture.py to time them
+# Turns the frame the right way up if the camera is mounted upside down
+def FlipFrame(image):
+    if flippedCamera:
+        return cv2.flip(image, -1) # Flips X and Y
+    else:
+        return image
+
+# Compares a reduced copy of the frame with lastSmall, the copy from the last frame sent
+# Returns (changed, small), the caller keeps small as lastSmall if the frame is sent
+def CompareFrame(image, lastSmall):
+    small = cv2.resize(image, (changeWidth, changeHeight), interpolation = cv2.INTER_AREA)
+    if (lastSmall is None) or (changeThreshold <= 0):
+        changed = True
+    else:
+        changed = cv2.absdiff(small, lastSmall).mean() >= changeThreshold
+    return changed, small
+
+# Encodes the frame as a JPEG
+def EncodeFrame(image):
+    retval, thisFrame = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, jpegQuality])
+    return thisFrame
+
+# Makes an encoded frame the one sent to the web pages
+def PublishFrame(thisFrame):
+    global lastFrame
+    global frameNumber
+    lockFrame.acquire()
+    lastFrame = thisFrame
+    frameNumber += 1
+    lockFrame.release()
+
+# Image stream processing thread
+class StreamProcessor(threading.Thread):
+    def __init__(self):
+        super(StreamProcessor, self).__init__()
+        self.stream = picamera.array.PiRGBArray(camera)
+        self.event = threading.Event()
+        self.lastSmall = None
+        self.frames = 0
+        self.encoded = 0
+        self.unchanged = 0
+        self.diffTotal = 0.0
+        self.encodeTotal = 0.0
+        self.encodeTimes = Histogram(ENCODE_BUCKETS)
+        self.bytesSaved = 0
+        self.terminated = False
+        self.start()
+        self.begin = 0
+
+    def Changed(self, image):
+        # Compares a reduced copy of the frame with the last one sent, returns True if it needs sending again
+        startTime = MonotonicTime()
+        changed, small = CompareFrame(image, self.lastSmall)
+        if changed:
+            self.lastSmall = small
+        self.diffTotal += MonotonicTime() - startTime
+        self.frames += 1
+        return changed
+
+    def GetStats(self):
+        # Returns the counts, the mean compare and encode times, and the encoding time saved by skipping unchanged frames
+        if self.frames > 0:
+            diffMean = self.diffTotal / self.frames
+        else:
+            diffMean = 0.0
+        if self.encoded > 0:
+            encodeMean = self.encodeTotal / self.encoded
+        else:
+            encodeMean = 0.0
+        timeSaved = self.unchanged * encodeMean - self.diffTotal
+        return self.frames, self.encoded, self.unchanged, diffMean, encodeMean, timeSaved
+
+    def run(self):
+        # This method runs in a separate thread
+        while not self.terminated:
+            # Wait for an image to be written to the stream
+            if self.event.wait(1):
+                try:
+                    # Read the image and save globally
+                    self.stream.seek(0)
+                    if vision != None:
+                        vision.Offer(self.stream.array)
+                    if (movementMode == LINE_MODE) and (lineFollower != None):
+                        lineFollower.Process(self.stream.array)
+                    if (movementMode == FOLLOW_MODE) and (follower != None):
+                        follower.Offer(self.stream.array)
+                    if self.Changed(self.stream.array):
+                        startTime = MonotonicTime()
+                        thisFrame = EncodeFrame(FlipFrame(self.stream.array))
+                        encodeTime = MonotonicTime() - startTime
+                        self.encodeTotal += encodeTime
+                        self.encodeTimes.Observe(encodeTime)
+                        self.encoded += 1
+                        PublishFrame(thisFrame)
+                    else:
+                        # Nothing has moved, keep sending the last frame
+                        self.unchanged += 1
+                    if not firstFrame.is_set():
+                        firstFrame.set()
+                finally:
+                    # Reset the stream and event
+                    self.stream.seek(0)
+                    self.stream.truncate()
+                    self.event.clear()
+
+# Obstacle detection thread, works out how much floor is visible in the left, centre and right of the image
+# Runs on a reduced copy of the frame at its own rate so it does not slow down the stream
+class VisionProcessor(threading.Thread):
+    def __init__(self):
+        super(VisionProcessor, self).__init__()
+        self.event = threading.Event()
+        self.image = None
+        self.freeSpace = (None, 0.0, 0.0, 0.0)
+        self.nextTime = MonotonicTime()
+        self.frames = 0
+        self.costTotal = 0.0
+        self.costMax = 0.0
+        self.reduceCost = 0.0
+        self.terminated = False
+        self.start()
+
+    def Offer(self, frame):
+        # Called by the stream processor with each full frame, takes a reduced copy when the next check is due
+        now = MonotonicTime()
+        if self.event.is_set() or (now < self.nextTime):
+            return
+        self.nextTime += 1.0 / visionRate
+        if self.nextTime < now:
+            self.nextTime = now + 1.0 / visionRate
+        self.image = cv2.resize(frame, (visionWidth, visionHeight), interpolation = cv2.INTER_AREA)
+        self.reduceCost = MonotonicTime() - now
+        self.event.set()
+
+    def GetFreeSpace(self):
+        # Returns the (left, centre, right) free space fractions, or None if there is no recent estimate
+        timestamp, left, centre, right = self.freeSpace
+        if (timestamp == None) or ((MonotonicTime() - timestamp) > distanceMaxAge):
+            return None
+        return left, centre, right
+
+    def GetStats(self):
+        if self.frames > 0:
+            costMean = self.costTotal / self.frames
+        else:
+            costMean = 0.0
+        return self.frames, costMean, self.costMax
+
+    def Analyse(self, image):
+        # Flip to match the streamed image, the bottom rows are then the floor just in front of the robot
+        if flippedCamera:
+            image = cv2.flip(image, -1)
+        image = cv2.GaussianBlur(image, (5, 5), 0)
+        floorColour = numpy.median(image[-visionFloorRows:].reshape(-1, 3), axis = 0)
+        difference = numpy.abs(image.astype(numpy.int16) - floorColour.astype(numpy.int16)).sum(axis = 2)
+        # Count the floor pixels in each column up from the bottom until the first obstacle
+        obstacles = (difference > visionThreshold)[::-1]
+        clear = numpy.where(obstacles.any(axis = 0), obstacles.argmax(axis = 0), visionHeight)
+        clear = clear / float(visionHeight)
+        third = visionWidth / 3
+        return clear[:third].mean(), clear[third:-third].mean(), clear[-third:].mean()
+
+    def run(self):
+        # This method runs in a separate thread
+        while not self.terminated:
+            # Wait for a reduced frame from the stream processor
+            if self.event.wait(1):
+                startTime = MonotonicTime()
+                try:
+                    left, centre, right = self.Analyse(self.image)
+                    self.freeSpace = (MonotonicTime(), left, centre, right)
+                except KeyboardInterrupt:
+                    raise
+                except:
+                    print 'Obstacle detection failed'
+                cost = MonotonicTime() - startTime + self.reduceCost
+                self.frames += 1
+                self.costTotal += cost
+                if cost > self.costMax:
+                    self.costMax = cost
+                self.event.clear()
+
+# Line following, the stream processor finds the line in each frame and the movement step steers towards it
+class LineFollower:
+    def __init__(self):
+        self.position = (None, 0.0)
+        self.pid = lineFollow.PID(lineKp, lineKi, lineKd)
+        self.lastStep = None
+        self.frames = 0
+        self.found = 0
+        self.costTotal = 0.0
+        self.costMax = 0.0
+
+    def Process(self, frame):
+        # Called by the stream processor, the frame has not been flipped yet so the bands are flipped instead
+        startTime = MonotonicTime()
+        position = lineFollow.FindLine(frame, lineBands, lineBandHeight, lineThreshold, lineDark, flippedCamera)
+        now = MonotonicTime()
+        if position != None:
+            self.position = (now, position)
+            self.found += 1
+        cost = now - startTime
+        self.frames += 1
+        self.costTotal += cost
+        if cost > self.costMax:
+            self.costMax = cost
+
+    def GetStats(self):
+        if self.frames > 0:
+            costMean = self.costTotal / self.frames
+        else:
+            costMean = 0.0
+        return self.frames, self.found, costMean, self.costMax
+
+    def Step(self):
+        # Steer towards the last line position, slow to a stop if it has not been seen for a while
+        # Only the target is changed while lost, the motor control writes the board as the speed ramps down
+        now = MonotonicTime()
+        timestamp, position = self.position
+        if (timestamp == None) or ((now - timestamp) > lineLostTime):
+            motorControl.SetTarget(0.0, 0.0)
+            if self.lastStep != None:
+                self.pid.Reset()
+                self.lastStep = None
+            return
+        if self.lastStep == None:
+            interval = 0.0
+        else:
+            interval = now - self.lastStep
+        self.lastStep = now
+        steering = self.pid.Update(position, interval)
+        speed = lineSpeed * (1.0 - 0.5 * abs(position))
+        driveLeft = max(-1.0, min(speed + steering, 1.0))
+        driveRight = max(-1.0, min(speed - steering, 1.0))
+        motorControl.SetTarget(driveLeft, driveRight)
+
+# Target following thread, looks for the target in a reduced copy of the frame
+# The rate adapts to the detection time so the stream processor always gets most of the processor
+class FollowProcessor(threading.Thread):
+    def __init__(self):
+        super(FollowProcessor, self).__init__()
+        self.event = threading.Event()
+        self.image = None
+        self.imageTime = 0.0
+        self.target = (None, 0.0, 0.0)
+        self.interval = 1.0 / followRateMax
+        self.nextTime = MonotonicTime()
+        self.cascade = None
+        if followTarget == 'face':
+            self.cascade = targetFollow.LoadFaceCascade()
+            if self.cascade == None:
+                print 'Could not load the face cascade, following colour instead'
+        self.detections = 0
+        self.found = 0
+        self.rate = 0.0
+        self.latencyTotal = 0.0
+        self.latencyMax = 0.0
+        self.terminated = False
+        self.start()
+
+    def Offer(self, frame):
+        # Called by the stream processor with each full frame, takes a reduced copy when the next check is due
+        now = MonotonicTime()
+        if self.event.is_set() or (now < self.nextTime):
+            return
+        self.nextTime = now + self.interval
+        self.image = cv2.resize(frame, (followWidth, followHeight), interpolation = cv2.INTER_AREA)
+        self.imageTime = now
+        self.event.set()
+
+    def GetTarget(self):
+        # Returns the (position, size) of the target, or None if it has not been seen recently
+        timestamp, position, size = self.target
+        if (timestamp == None) or ((MonotonicTime() - timestamp) > followLostTime):
+            return None
+        return position, size
+
+    def GetStats(self):
+        if self.detections > 0:
+            latencyMean = self.latencyTotal / self.detections
+        else:
+            latencyMean = 0.0
+        return self.detections, self.found, self.rate, self.interval, latencyMean, self.latencyMax
+
+    def run(self):
+        windowStart = MonotonicTime()
+        windowDetections = 0
+        # This method runs in a separate thread
+        while not self.terminated:
+            # Wait for a reduced frame from the stream processor
+            if self.event.wait(1):
+                startTime = MonotonicTime()
+                try:
+                    # Flip to match the streamed image, faces are not found upside down
+                    image = self.image
+                    if flippedCamera:
+                        image = cv2.flip(image, -1)
+                    if self.cascade != None:
+                        target = targetFollow.FindFace(image, self.cascade)
+                    else:
+                        target = targetFollow.FindColour(image, followColourLower, followColourUpper)
+                except KeyboardInterrupt:
+                    raise
+                except:
+                    print 'Target detection failed'
+                    target = None
+                now = MonotonicTime()
+                if target != None:
+                    self.target = (now, target[0], target[1])
+                    self.found += 1
+                # Latency is from the frame being captured to the result being available
+                latency = now - self.imageTime
+                self.detections += 1
+                self.latencyTotal += latency
+                if latency > self.latencyMax:
+                    self.latencyMax = latency
+                # Slow down if detection is taking more than our share of the processor
+                cost = now - startTime
+                self.interval = max(1.0 / followRateMax, cost / followCpuShare)
+                windowDetections += 1
+                if (now - windowStart) >= 1.0:
+                    self.rate = windowDetections / (now - windowStart)
+                    windowStart = now
+                    windowDetections = 0
+                self.event.clear()
+
+# Sentry motion detection, the H.264 encoder works out motion vectors for each frame with almost no processor time
+class SentryDetector(picamera.array.PiMotionAnalysis):
+    def __init__(self, camera):
+        super(SentryDetector, self).__init__(camera)
+        self.lastMotion = None
+        self.frames = 0
+        self.motionFrames = 0
+        self.costTotal = 0.0
+
+    def analyse(self, vectors):
+        # Called by picamera with the vectors for each frame, counts the blocks which have moved far enough
+        startTime = MonotonicTime()
+        magnitude = numpy.sqrt(numpy.square(vectors['x'].astype(numpy.float32)) + numpy.square(vectors['y'].astype(numpy.float32)))
+        moving = (magnitude > sentryVectorLimit).sum()
+        now = MonotonicTime()
+        if moving > sentryBlocks:
+            self.lastMotion = now
+            self.motionFrames += 1
+        self.frames += 1
+        self.costTotal += now - startTime
+
+# Sentry thread, records video and saves a photo while there is movement in front of the camera
+# The video is recorded from a second camera port so the stream keeps running
+class Sentry(threading.Thread):
+    def __init__(self):
+        super(Sentry, self).__init__()
+        self.detector = SentryDetector(camera)
+        self.buffer = picamera.PiCameraCircularIO(camera, seconds = sentryPreRecord, splitter_port = 2)
+        self.recording = None
+        self.recordings = 0
+        self.terminated = False
+        camera.start_recording(self.buffer, format = 'h264', splitter_port = 2, motion_output = self.detector)
+        self.start()
+
+    def GetStats(self):
+        if self.detector.frames > 0:
+            costMean = self.detector.costTotal / self.detector.frames
+        else:
+            costMean = 0.0
+        return self.detector.frames, self.detector.motionFrames, self.recordings, costMean
+
+    def StartRecording(self):
+        # Record into a new file, then save what happened just before and a photo
+        name = '%s/Sentry %s' % (sentryDirectory, datetime.datetime.utcnow())
+        print 'Sentry: movement, recording to "%s.h264"' % (name)
+        camera.split_recording(name + '.h264', splitter_port = 2)
+        self.buffer.copy_to(name + ' before.h264', seconds = sentryPreRecord)
+        self.buffer.clear()
+        lockFrame.acquire()
+        captureFrame = lastFrame
+        lockFrame.release()
+        if captureFrame is not None:
+            try:
+                photoFile = open(name + '.jpg', 'wb')
+                photoFile.write(captureFrame)
+                photoFile.close()
+            except:
+                print 'Sentry: failed to save photo "%s.jpg"' % (name)
+        self.recording = name
+        self.recordings += 1
+
+    def StopRecording(self):
+        # Go back to keeping a few seconds in memory
+        print 'Sentry: movement stopped'
+        camera.split_recording(self.buffer, splitter_port = 2)
+        self.recording = None
+
+    def run(self):
+        # This method runs in a separate thread
+        while not self.terminated:
+            camera.wait_recording(0.2, splitter_port = 2)
+            lastMotion = self.detector.lastMotion
+            if lastMotion == None:
+                moving = False
+            else:
+                moving = (MonotonicTime() - lastMotion) < sentryHoldTime
+            if moving and (self.recording == None):
+                self.StartRecording()
+            elif (not moving) and (self.recording != None):
+                self.StopRecording()
+        if self.recording != None:
+            self.StopRecording()
+        camera.stop_recording(splitter_port = 2)
+
+# Turns sentry mode on or off
+def SetSentry(enabled):
+    global sentry
+    if enabled and (sentry == None):
+        sentry = Sentry()
+    elif (not enabled) and (sentry != None):
+        sentry.terminated = True
+        sentry.join()
+        sentry = None
+
+# Image capture thread
+# The camera can be reconfigured between captures without closing it
+class ImageCapture(threading.Thread):
+    def __init__(self):
+        super(ImageCapture, self).__init__()
+        self.pending = None
+        self.reconfigured = threading.Event()
+        self.reconfigureError = None
+        self.captured = 0
+        self.dropped = 0
+        self.start()
+
+    def Reconfigure(self, resolution, framerate):
+        # Stops the capture, changes the camera and starts capturing again, returns None or the error
+        # Nothing else may be recording from the camera while it is changed
+        self.reconfigured.clear()
+        self.pending = (resolution, framerate)
+        if not self.reconfigured.wait(10):
+            return 'timed out'
+        return self.reconfigureError
+
+    def run(self):
+        global camera
+        global processor
+        print 'Start the stream using the video port'
+        while running:
+            camera.capture_sequence(self.TriggerStream(), format='bgr', use_video_port=True)
+            if self.pending != None:
+                resolution, framerate = self.pending
+                # Wait for the processor to finish with the last frame before swapping the buffer
+                while processor.event.is_set() and running:
+                    time.sleep(0.01)
+                try:
+                    camera.resolution = resolution
+                    camera.framerate = framerate
+                    processor.stream = picamera.array.PiRGBArray(camera)
+                    processor.lastSmall = None
+                    self.reconfigureError = None
+                except Exception, e:
+                    self.reconfigureError = str(e)
+                self.pending = None
+                self.reconfigured.set()
+        print 'Terminating camera processing...'
+        processor.terminated = True
+        processor.join()
+        print 'Processing terminated.'
+
+    # Stream delegation loop
+    def TriggerStream(self):
+        global running
+        while running and (self.pending == None):
+            if processor.event.is_set():
+                # The camera keeps going while the processor is busy, each frame interval spent waiting is a frame lost
+                waitStart = MonotonicTime()
+                while processor.event.is_set() and running:
+                    time.sleep(0.01)
+                self.dropped += int((MonotonicTime() - waitStart) * frameRate)
+            else:
+                yield processor.stream
+                self.captured += 1
+                processor.event.set()
+
+# Fixed-rate timing for the periodic threads, each time slot follows on from the last so small delays do not build up
+class PeriodicTimer:
+    def __init__(self, interval, event = None):
+        self.event = event
+        self.loops = 0
+        self.overruns = 0
+        self.jitterTotal = 0.0
+        self.jitterMax = 0.0
+        self.Reset(interval)
+
+    def Reset(self, interval):
+        # Starts timing from now, used when the interval changes
+        self.interval = interval
+        self.nextTime = MonotonicTime()
+
+    def Wait(self):
+        # Waits for the next time slot, returns False if the event was set first
+        self.nextTime += self.interval
+        delay = self.nextTime - MonotonicTime()
+        if delay > 0:
+            if self.event == None:
+                time.sleep(delay)
+            elif self.event.wait(delay):
+                self.event.clear()
+                return False
+        jitter = MonotonicTime() - self.nextTime
+        self.loops += 1
+        self.jitterTotal += abs(jitter)
+        if jitter > self.jitterMax:
+            self.jitterMax = jitter
+        if jitter > self.interval:
+            # Missed at least one time slot, start counting again from now
+            self.overruns += 1
+            self.nextTime = MonotonicTime()
+        return True
+
+    def GetStats(self):
+        if self.loops > 0:
+            jitterMean = self.jitterTotal / self.loops
+        else:
+            jitterMean = 0.0
+        return self.loops, self.overruns, jitterMean, self.jitterMax
+
+# Ultrasonic sampling thread, reads all of the distances at a fixed rate
+# Web pages and the automatic modes use the last readings instead of waiting on the UltraBorg themselves
+class DistanceSampler(threading.Thread):
+    def __init__(self):
+        super(DistanceSampler, self).__init__()
+        self.snapshot = (None, [0, 0, 0, 0])
+        self.samples = 0
+        self.failures = 0
+        self.rate = 0.0
+        self.readTotal = 0.0
+        self.readMax = 0.0
+        self.terminated = False
+        self.start()
+
+    def GetDistances(self):
+        # Returns the last readings and their age in seconds, the snapshot is replaced as a whole so no lock is needed
+        timestamp, distances = self.snapshot
+        if timestamp == None:
+            return distances, None
+        return distances, MonotonicTime() - timestamp
+
+    def GetStats(self):
+        if self.samples > 0:
+            readMean = self.readTotal / self.samples
+        else:
+            readMean = 0.0
+        return self.samples, self.failures, self.rate, readMean, self.readMax
+
+    def run(self):
+        self.timer = PeriodicTimer(1.0 / distanceRate)
+        windowStart = MonotonicTime()
+        windowSamples = 0
+        # This method runs in a separate thread
+        while not self.terminated:
+            startTime = MonotonicTime()
+            try:
+                distances = [int(UB.GetDistance1()), int(UB.GetDistance2()), int(UB.GetDistance3()), int(UB.GetDistance4())]
+                now = MonotonicTime()
+                self.snapshot = (now, distances)
+                readTime = now - startTime
+                self.samples += 1
+                self.readTotal += readTime
+                if readTime > self.readMax:
+                    self.readMax = readTime
+                windowSamples += 1
+            except KeyboardInterrupt:
+                raise
+            except:
+                self.failures += 1
+                now = MonotonicTime()
+            # Work out the achieved sample rate once a second
+            if (now - windowStart) >= 1.0:
+                self.rate = windowSamples / (now - windowStart)
+                windowStart = now
+                windowSamples = 0
+            # Wait for the next time slot
+            self.timer.Wait()
+
+# Returns True if the camera shows little free floor in front of the robot
+def VisionBlocked():
+    if vision == None:
+        return False
+    freeSpace = vision.GetFreeSpace()
+    if freeSpace == None:
+        return False
+    return freeSpace[1] < visionBlocked
+
+# Semi-automatic movement, stops or slows the user's driving when something is close in front
+def SemiAutoStep():
+    # Get the latest readings from ultra sensors
+    distances, age = distanceSampler.GetDistances()
+    distance1, distance2, distance3, distance4 = distances
+
+    # Set critical allowed distance to object in front
+    if (age == None) or (age > distanceMaxAge):
+        # No recent readings, we cannot tell what is in front so slow to a stop
+        motorControl.SetTarget(0.0, 0.0)
+    elif distance1 <= 50:
+        motorControl.Stop()
+    elif (distance1 <= 100) or VisionBlocked():
+        driveRight = 0.3
+        driveLeft = 0.3
+        motorControl.SetTarget(driveLeft, driveRight)
+
+# Automatic movement, drives forward and turns towards the more open side when something is in front
+def AutoStep():
+    # Get the latest readings from ultra sensors, 0 means nothing was in range
+    distances, age = distanceSampler.GetDistances()
+    front, right, left, rear = distances
+    if (age == None) or (age > distanceMaxAge):
+        # No recent readings, we cannot tell what is around us so slow to a stop
+        motorControl.SetTarget(0.0, 0.0)
+        return
+    if front == 0:
+        front = autoClearDistance
+    if right == 0:
+        right = autoClearDistance
+    if left == 0:
+        left = autoClearDistance
+
+    freeSpace = None
+    if vision != None:
+        freeSpace = vision.GetFreeSpace()
+    if freeSpace != None:
+        # Use the camera to pick the turn direction when the ultrasonics see the same on both sides
+        if (left == right) and (freeSpace[0] != freeSpace[2]):
+            if freeSpace[0] > freeSpace[2]:
+                left += 1
+            else:
+                right += 1
+
+    if (front <= autoTurnDistance) or VisionBlocked():
+        # Blocked, turn on the spot towards the side with more space
+        if left > right:
+            motorControl.SetTarget(-autoTurnSpeed, autoTurnSpeed)
+        else:
+            motorControl.SetTarget(autoTurnSpeed, -autoTurnSpeed)
+    else:
+        # Move forward, slowing down as we get closer to something
+        speed = autoSpeed * min(float(front) / autoClearDistance, 1.0)
+        motorControl.SetTarget(speed, speed)
+
+# Line following, steers at the camera frame rate
+def LineStep():
+    lineFollower.Step()
+
+# Target following, turns to keep the target centred and moves closer until it is big enough
+def FollowStep():
+    target = follower.GetTarget()
+    if target == None:
+        # Lost the target, slow to a stop and wait for it to come back into view
+        motorControl.SetTarget(0.0, 0.0)
+        return
+    position, size = target
+    steering = followTurn * position
+    if size < followSize:
+        speed = followSpeed
+    else:
+        speed = 0.0
+    if distanceSampler != None:
+        # Robots with an UltraBorg also stop moving closer when something is just in front
+        distances, age = distanceSampler.GetDistances()
+        if (age == None) or (age > distanceMaxAge) or (0 < distances[0] <= followStopDistance):
+            speed = 0.0
+    driveLeft = max(-1.0, min(speed + steering, 1.0))
+    driveRight = max(-1.0, min(speed - steering, 1.0))
+    motorControl.SetTarget(driveLeft, driveRight)
+
+# Automatic movement steps for each mode with the number of times per second they run, None runs at the camera frame rate
+# Add an entry here to give a new mode its own behaviour
+movementSteps = {
+    SEMI_AUTO_MODE: (SemiAutoStep, 2),
+    AUTO_MODE: (AutoStep, 5),
+    LINE_MODE: (LineStep, None),
+    FOLLOW_MODE: (FollowStep, followRateMax),
+}
+
+# Changes the movement mode, the automatic movement thread switches straight away
+def SetMovementMode(mode):
+    global movementMode
+    CancelMoves()
+    movementMode = mode
+    if autoMovement != None:
+        autoMovement.event.set()
+
+# Automatic movement thread, runs the step for the current mode at its own fixed rate
+class AutoMovement(threading.Thread):
+    def __init__(self):
+        super(AutoMovement, self).__init__()
+        self.event = threading.Event()
+        self.timer = PeriodicTimer(1.0, self.event)
+        self.mode = MANUAL_MODE
+        self.steps = 0
+        self.stepTotal = 0.0
+        self.stepMax = 0.0
+        self.terminated = False
+        self.start()
+
+    def GetStats(self):
+        loops, overruns, jitterMean, jitterMax = self.timer.GetStats()
+        if self.steps > 0:
+            stepMean = self.stepTotal / self.steps
+        else:
+            stepMean = 0.0
+        return loops, overruns, jitterMean, jitterMax, stepMean, self.stepMax
+
+    def run(self):
+        # This method runs in a separate thread
+        while not self.terminated:
+            # See which mode we are in
+            if self.mode != movementMode:
+                self.mode = movementMode
+                if self.mode in movementSteps:
+                    step, rate = movementSteps[self.mode]
+                    if rate == None:
+                        rate = frameRate
+                    self.timer.Reset(1.0 / rate)
+            if self.mode == MANUAL_MODE:
+                # User movement, wait until the mode changes
+                if self.event.wait(1.0):
+                    self.event.clear()
+            elif self.mode in movementSteps:
+                startTime = MonotonicTime()
+                try:
+                    step()
+                except KeyboardInterrupt:
+                    raise
+                except:
+                    print 'Movement step for mode %d failed' % (self.mode)
+                stepTime = MonotonicTime() - startTime
+                self.steps += 1
+                self.stepTotal += stepTime
+                if stepTime > self.stepMax:
+                    self.stepMax = stepTime
+                # Wait for the next time slot, or a change of mode
+                self.timer.Wait()
+            else:
+                # Unexpected, print an error and wait a second before trying again
+                print 'Unexpected movement mode %d' % (self.mode)
+                if self.event.wait(1.0):
+                    self.event.clear()
+
+# Battery monitoring thread, keeps the recent battery readings and can adjust maxPower to match the battery voltage
+class BatterySampler(threading.Thread):
+    def __init__(self):
+        super(BatterySampler, self).__init__()
+        self.lockReadings = threading.Lock()
+        self.times = [0.0] * batterySamples
+        self.voltages = [0.0] * batterySamples
+        self.count = 0
+        self.failures = 0
+        self.terminated = False
+        self.start()
+
+    def GetReadings(self):
+        # Returns the stored (time, voltage) readings, oldest first
+        self.lockReadings.acquire()
+        if self.count < batterySamples:
+            readings = zip(self.times[:self.count], self.voltages[:self.count])
+        else:
+            index = self.count % batterySamples
+            readings = zip(self.times[index:] + self.times[:index], self.voltages[index:] + self.voltages[:index])
+        self.lockReadings.release()
+        return readings
+
+    def GetTrend(self, readings):
+        # Returns the change in voltage per minute from a straight line fit to the readings
+        if len(readings) < 2:
+            return 0.0
+        meanTime = sum([reading[0] for reading in readings]) / len(readings)
+        meanVoltage = sum([reading[1] for reading in readings]) / len(readings)
+        top = sum([(reading[0] - meanTime) * (reading[1] - meanVoltage) for reading in readings])
+        bottom = sum([(reading[0] - meanTime) ** 2 for reading in readings])
+        if bottom <= 0:
+            return 0.0
+        return (top / bottom) * 60.0
+
+    def run(self):
+        global maxPower
+        # This method runs in a separate thread
+        while not self.terminated:
+            time.sleep(batteryInterval)
+            if board.reconnecting or motorControl.FailsafeWaiting():
+                continue
+            # The driver holds the bus for one transaction at a time, so a slow or retried reading never holds up the drive commands
+            voltage = board.GetBatteryReading()
+            if voltage == None:
+                self.failures += 1
+                continue
+            self.lockReadings.acquire()
+            index = self.count % batterySamples
+            self.times[index] = MonotonicTime()
+            self.voltages[index] = voltage
+            self.count += 1
+            self.lockReadings.release()
+            if batteryCompensation:
+                # Use the average of the latest readings so a short dip under load does not change the speed
+                recent = [reading[1] for reading in self.GetReadings()[-batteryAverage:]]
+                voltageMeasured = sum(recent) / len(recent)
+                if robot.voltageOut > voltageMeasured:
+                    maxPower = 1.0
+                else:
+                    maxPower = robot.voltageOut / float(voltageMeasured)
+
+# LED strip animation, a bar showing the battery level with the first LED lit blue while someone is in control
+def LedAnimation(strip, seconds):
+    readings = []
+    if battery != None:
+        readings = battery.GetReadings()
+    if len(readings) == 0:
+        # No readings yet, leave the bar off
+        level = 0.0
+    else:
+        level = (readings[-1][1] - ledBatteryEmpty) / (ledBatteryFull - ledBatteryEmpty)
+        level = max(0.0, min(level, 1.0))
+    lit = int(round(level * (strip.count - 1)))
+    colours = []
+    for index in range(1, strip.count):
+        if index <= lit:
+            colours.append([1.0 - level, level, 0.0])
+        else:
+            colours.append([0.0, 0.0, 0.0])
+    if (watchdog != None) and not watchdog.timedOut:
+        colours.insert(0, [0.0, 0.0, 1.0])
+    else:
+        colours.insert(0, [0.0, 0.0, 0.1])
+    strip.SetLeds(colours)
+
+# IR remote thread, checks for messages from the remote and drives the same way as the web page does
+class IrInput(threading.Thread):
+    def __init__(self):
+        super(IrInput, self).__init__()
+        self.polls = 0
+        self.messages = 0
+        self.unknown = 0
+        self.lastButton = None
+        self.lastUnknown = None
+        self.pollTotal = 0.0
+        self.pollMax = 0.0
+        self.terminated = False
+        self.start()
+
+    def GetStats(self):
+        if self.polls > 0:
+            pollMean = self.pollTotal / self.polls
+        else:
+            pollMean = 0.0
+        return self.polls, self.messages, self.unknown, pollMean, self.pollMax
+
+    def HandleMessage(self, message):
+        # Look the message up and send the drive command for the button
+        button = irButtons.get(message)
+        if button == None:
+            self.unknown += 1
+            self.lastUnknown = message
+            return
+        self.messages += 1
+        self.lastButton = button
+        driveLeft, driveRight = irActions[button]
+        watchdog.Command('ir', True)
+        motorControl.SetTarget(driveLeft * irSpeed, driveRight * irSpeed)
+
+    def run(self):
+        interval = 1.0 / irPollRate
+        # This method runs in a separate thread
+        while not self.terminated:
+            if motorControl.FailsafeWaiting():
+                # Polling would keep the motors running, wait for the board failsafe to stop them
+                time.sleep(interval)
+                continue
+            startTime = MonotonicTime()
+            newMessage = board.PollIr()
+            pollTime = MonotonicTime() - startTime
+            self.polls += 1
+            self.pollTotal += pollTime
+            if pollTime > self.pollMax:
+                self.pollMax = pollTime
+            if newMessage:
+                message = board.GetIrMessage()
+                if message != None:
+                    self.HandleMessage(message)
+            time.sleep(interval)
+
+# I2C profiling thread, samples the I2C statistics from the board driver and keeps the changes for a sliding window
+# The UltraBorg is not one of our drivers, its reads are taken from the distance sampler instead
+class I2cProfiler(threading.Thread):
+    def __init__(self):
+        super(I2cProfiler, self).__init__()
+        self.lockSamples = threading.Lock()
+        self.samples = []
+        self.lastTotals = self.ReadTotals()
+        self.lastTime = MonotonicTime()
+        self.terminated = False
+        self.start()
+
+    def ReadTotals(self):
+        # Running totals of [transactions, retries, failures, busTime] for each command name
+        totals = {}
+        if board != None:
+            for stats in board.GetI2cStats().values():
+                totals[stats['name']] = [stats['transactions'], stats['retries'], stats['failures'], stats['latencyTotal']]
+        if distanceSampler != None:
+            totals['ULTRABORG_DISTANCES'] = [distanceSampler.samples + distanceSampler.failures, 0,
+                                             distanceSampler.failures, distanceSampler.readTotal]
+        return totals
+
+    def Sample(self):
+        now = MonotonicTime()
+        totals = self.ReadTotals()
+        changes = {}
+        for name, current in totals.iteritems():
+            previous = self.lastTotals.get(name, [0, 0, 0, 0.0])
+            if current[0] < previous[0]:
+                # The statistics have been reset, count from zero
+                previous = [0, 0, 0, 0.0]
+            if current[0] > previous[0]:
+                changes[name] = [current[index] - previous[index] for index in range(4)]
+        self.lockSamples.acquire()
+        self.samples.append((now - self.lastTime, changes))
+        del self.samples[:-i2cProfileSamples]
+        self.lockSamples.release()
+        self.lastTotals = totals
+        self.lastTime = now
+
+    def GetProfile(self):
+        # Returns the seconds covered and a list of (name, transactions, retries, failures, busTime), most bus time first
+        self.lockSamples.acquire()
+        samples = list(self.samples)
+        self.lockSamples.release()
+        seconds = 0.0
+        totals = {}
+        for duration, changes in samples:
+            seconds += duration
+            for name, change in changes.iteritems():
+                total = totals.setdefault(name, [0, 0, 0, 0.0])
+                for index in range(4):
+                    total[index] += change[index]
+        profile = [(name, total[0], total[1], total[2], total[3]) for name, total in totals.iteritems()]
+        profile.sort(key = lambda entry: entry[4], reverse = True)
+        return seconds, profile
+
+    def run(self):
+        # This method runs in a separate thread
+        while not self.terminated:
+            time.sleep(i2cProfileInterval)
+            self.Sample()
+
+# Turns the I2C profiling on or off
+def SetI2cProfile(enabled):
+    global i2cProfiler
+    if enabled and (i2cProfiler == None):
+        i2cProfiler = I2cProfiler()
+    elif (not enabled) and (i2cProfiler != None):
+        i2cProfiler.terminated = True
+        i2cProfiler.join()
+        i2cProfiler = None
+
+# Formats the labels of a metric, e.g. {route="/set"}
+def FormatLabels(labels):
+    if len(labels) == 0:
+        return ''
+    parts = []
+    for name in sorted(labels.keys()):
+        value = str(labels[name]).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append('%s="%s"' % (name, value))
+    return '{%s}' % (','.join(parts))
+
+# Formats one counter or gauge for /metrics, samples is a list of (labels, value)
+def FormatMetric(name, kind, description, samples):
+    text = '# HELP %s %s\n' % (name, description)
+    text += '# TYPE %s %s\n' % (name, kind)
+    for labels, value in samples:
+        text += '%s%s %s\n' % (name, FormatLabels(labels), repr(float(value)))
+    return text
+
+# Formats one histogram for /metrics, samples is a list of (labels, histogram)
+def FormatHistogram(name, description, samples):
+    text = '# HELP %s %s\n' % (name, description)
+    text += '# TYPE %s histogram\n' % (name)
+    for labels, histogram in samples:
+        # Copy first so the buckets add up to the count even if an observation is made while we read
+        counts = list(histogram.counts)
+        total = histogram.total
+        cumulative = 0
+        for index in range(len(histogram.buckets)):
+            cumulative += counts[index]
+            bucketLabels = dict(labels)
+            bucketLabels['le'] = repr(float(histogram.buckets[index]))
+            text += '%s_bucket%s %d\n' % (name, FormatLabels(bucketLabels), cumulative)
+        cumulative += counts[-1]
+        bucketLabels = dict(labels)
+        bucketLabels['le'] = '+Inf'
+        text += '%s_bucket%s %d\n' % (name, FormatLabels(bucketLabels), cumulative)
+        text += '%s_sum%s %s\n' % (name, FormatLabels(labels), repr(total))
+        text += '%s_count%s %d\n' % (name, FormatLabels(labels), cumulative)
+    return text
+
+# Builds the /metrics page from the counters kept by each thread, nothing is counted here
+def GetMetrics():
+    routes = sorted(requestStats.counts.keys())
+    text = FormatMetric('robot_http_requests_total', 'counter', 'Requests handled by the web-page',
+                        [({'route': route}, requestStats.counts[route]) for route in routes])
+    text += FormatMetric('robot_http_response_bytes_total', 'counter', 'Bytes sent in reply to requests',
+                         [({'route': route}, requestStats.bytes[route]) for route in routes])
+    text += FormatHistogram('robot_http_request_seconds', 'Time taken to handle requests',
+                            [({'route': route}, requestStats.times[route]) for route in routes])
+    if (processor != None) and (captureThread != None):
+        text += FormatMetric('robot_camera_frames_total', 'counter', 'Camera frames at each stage of the stream',
+                             [({'stage': 'captured'}, captureThread.captured),
+                              ({'stage': 'dropped'}, captureThread.dropped),
+                              ({'stage': 'processed'}, processor.frames),
+                              ({'stage': 'encoded'}, processor.encoded),
+                              ({'stage': 'unchanged'}, processor.unchanged),
+                              ({'stage': 'sent'}, requestStats.framesSent),
+                              ({'stage': 'not_modified'}, requestStats.framesNotModified)])
+        text += FormatHistogram('robot_camera_encode_seconds', 'Time taken to flip and JPEG encode each frame',
+                                [({}, processor.encodeTimes)])
+    queues = [({'queue': 'stream'}, processor != None and processor.event.is_set())]
+    if vision != None:
+        queues.append(({'queue': 'vision'}, vision.event.is_set()))
+    if (board != None) and robot.moves:
+        queues.append(({'queue': 'encoder_moves'}, board.GetEncoderMovesPending()))
+    text += FormatMetric('robot_queue_depth', 'gauge', 'Work waiting for each thread', queues)
+    if motorControl != None:
+        loops, overruns, jitterMean, jitterMax = motorControl.GetStats()
+        text += FormatMetric('robot_control_loops_total', 'counter', 'Motor control loops run', [({}, loops)])
+        text += FormatMetric('robot_control_overruns_total', 'counter', 'Motor control loops which started late', [({}, overruns)])
+        text += FormatMetric('robot_failsafe_stops_total', 'counter', 'Motor stops by the board communications failsafe',
+                             [({}, motorControl.failsafeStops)])
+    if watchdog != None:
+        text += FormatMetric('robot_watchdog_timeouts_total', 'counter', 'Times the controls stopped because the driver went quiet',
+                             [({}, watchdog.timeouts)])
+        text += FormatMetric('robot_watchdog_timed_out', 'gauge', '1 while the watchdog has stopped the robot', [({}, watchdog.timedOut)])
+    if battery != None:
+        readings = battery.GetReadings()
+        if len(readings) > 0:
+            text += FormatMetric('robot_battery_volts', 'gauge', 'Latest battery voltage reading', [({}, readings[-1][1])])
+        text += FormatMetric('robot_battery_read_failures_total', 'counter', 'Battery readings which failed', [({}, battery.failures)])
+    if board != None:
+        i2cStats = board.GetI2cStats().values()
+        i2cStats.sort(key = lambda stats: stats['name'])
+        labels = [{'board': robot.boardName, 'command': stats['name']} for stats in i2cStats]
+        text += FormatMetric('robot_i2c_transactions_total', 'counter', 'I2C transactions for each board command',
+                             [(labels[index], i2cStats[index]['transactions']) for index in range(len(i2cStats))])
+        text += FormatMetric('robot_i2c_retries_total', 'counter', 'I2C transaction attempts which had to be retried',
+                             [(labels[index], i2cStats[index]['retries']) for index in range(len(i2cStats))])
+        text += FormatMetric('robot_i2c_errors_total', 'counter', 'I2C transactions which failed after all of the retries',
+                             [(labels[index], i2cStats[index]['failures']) for index in range(len(i2cStats))])
+        text += FormatMetric('robot_i2c_seconds_total', 'counter', 'Time spent in I2C transactions, including retries',
+                             [(labels[index], i2cStats[index]['latencyTotal']) for index in range(len(i2cStats))])
+        text += FormatMetric('robot_i2c_seconds_max', 'gauge', 'Longest I2C transaction',
+                             [(labels[index], i2cStats[index]['latencyMax']) for index in range(len(i2cStats))])
+        text += FormatMetric('robot_board_reconnects_total', 'counter', 'Times the board was lost and reconnected', [({}, board.reconnects)])
+    if distanceSampler != None:
+        text += FormatMetric('robot_distance_samples_total', 'counter', 'Ultrasonic readings taken', [({}, distanceSampler.samples)])
+        text += FormatMetric('robot_distance_failures_total', 'counter', 'Ultrasonic readings which failed', [({}, distanceSampler.failures)])
+    return text
+
+# Returns the name to show for each running thread by its identifier, our threads are named after their class
+def ThreadNames():
+    names = {}
+    for thread in threading.enumerate():
+        if thread.__class__.__module__ == 'threading':
+            names[thread.ident] = thread.name
+        else:
+            names[thread.ident] = thread.__class__.__name__
+    return names
+
+# Sampling profiler thread for /debug/profile, records the stack of every other thread at a fixed rate
+# Each different stack is counted in the collapsed format used by flamegraph.pl, the thread name is the root
+class DebugProfiler(threading.Thread):
+    def __init__(self, seconds):
+        super(DebugProfiler, self).__init__()
+        self.seconds = seconds
+        self.stacks = {}
+        self.samples = 0
+        self.sampleTotal = 0.0
+        self.endTime = MonotonicTime() + seconds
+        self.finished = False
+        self.terminated = False
+        self.start()
+
+    def Sample(self):
+        names = ThreadNames()
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            parts = []
+            while frame != None:
+                code = frame.f_code
+                parts.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), frame.f_lineno))
+                frame = frame.f_back
+            parts.append(names.get(ident, 'Thread-%d' % (ident)))
+            parts.reverse()
+            stack = ';'.join(parts)
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+    def GetReport(self):
+        # Only called once finished, the stacks are not changed after that
+        lines = ['%s %d\n' % (stack, count) for stack, count in sorted(self.stacks.iteritems())]
+        return ''.join(lines)
+
+    def run(self):
+        timer = PeriodicTimer(1.0 / debugProfileRate)
+        # This method runs in a separate thread
+        while (not self.terminated) and (MonotonicTime() < self.endTime):
+            startTime = MonotonicTime()
+            self.Sample()
+            self.sampleTotal += MonotonicTime() - startTime
+            timer.Wait()
+        self.finished = True
+
+# Returns the current stack of every thread as text, for /debug/threads
+def GetThreadStacks():
+    names = ThreadNames()
+    daemons = dict([(thread.ident, thread.daemon) for thread in threading.enumerate()])
+    text = ''
+    for ident, frame in sorted(sys._current_frames().items()):
+        text += 'Thread %s, id %d, daemon %s\n' % (names.get(ident, 'unknown'), ident, daemons.get(ident, 'unknown'))
+        text += ''.join(traceback.format_stack(frame))
+        text += '\n'
+    return text
+
+# Returns the value of a parameter from the end of a path, e.g. seconds from /debug/profile?seconds=5, or None
+def GetQueryValue(getPath, name):
+    if '?' not in getPath:
+        return None
+    for parameter in getPath.split('?', 1)[1].split('&'):
+        if parameter.startswith(name + '='):
+            return parameter[len(name) + 1:]
+    return None
+
+# Returns the current value of a tunable setting, the voltages belong to the robot
+def GetSetting(name):
+    if name in ('voltageIn', 'voltageOut'):
+        return getattr(robot, name)
+    else:
+        return globals()[name]
+
+# Converts a setting from text and checks it is allowed, returns (value, error)
+def ParseSetting(name, text):
+    if not tunableSettings.has_key(name):
+        return None, 'not a setting which can be changed'
+    kind, minimum, maximum, apply = tunableSettings[name]
+    try:
+        if kind == bool:
+            if text.lower() in ('true', 'on', 'yes', '1'):
+                value = True
+            elif text.lower() in ('false', 'off', 'no', '0'):
+                value = False
+            else:
+                raise ValueError
+        else:
+            value = kind(text)
+    except ValueError:
+        return None, '"%s" is not a valid %s' % (text, kind.__name__)
+    if (minimum != None) and ((value < minimum) or (value > maximum)):
+        return None, '%s is not between %s and %s' % (value, minimum, maximum)
+    # Rounded so a value saved to the settings file can be read back, e.g. 12.0 * 0.95 is saved as 11.4
+    if (name == 'voltageOut') and (value > round(robot.voltageOutMax, 3)):
+        return None, '%s is more than the %s V set for the motors in robotBoards.py' % (value, round(robot.voltageOutMax, 3))
+    return value, None
+
+# Works out the power limit from the battery and motor voltages
+def SetPowerLimit():
+    global maxPower
+    if robot.voltageOut > robot.voltageIn:
+        maxPower = 1.0
+    else:
+        maxPower = robot.voltageOut / float(robot.voltageIn)
+
+# Keeps a record of each settings change and prints it
+def RecordSetting(source, name, old, new, result):
+    global settingsHistory
+    when = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print 'Setting %s from %s to %s (%s): %s' % (name, old, new, source, result)
+    settingsHistory.insert(0, (when, source, name, old, new, result))
+    del settingsHistory[settingsHistorySize:]
+
+# Applies a list of checked (name, value) changes from source, the camera is only reconfigured once for all of them
+def ApplySettings(changes, source):
+    lockSettings.acquire()
+    applied = []
+    for name, value in changes:
+        old = GetSetting(name)
+        if value == old:
+            continue
+        if name in ('voltageIn', 'voltageOut'):
+            setattr(robot, name, value)
+        else:
+            globals()[name] = value
+        applied.append((name, old, value))
+    apply = [tunableSettings[name][3] for name, old, value in applied]
+    if 'power' in apply:
+        SetPowerLimit()
+    cameraResult = 'applied'
+    if ('camera' in apply) and (captureThread != None):
+        # Sentry records from the camera as well, it is stopped while the camera changes
+        oldSettings = dict([(name, old) for name, old, value in applied])
+        wasSentry = sentry != None
+        SetSentry(False)
+        startTime = MonotonicTime()
+        error = captureThread.Reconfigure((imageWidth, imageHeight), frameRate)
+        if error == None:
+            cameraResult = 'camera reconfigured in %.2f s' % (MonotonicTime() - startTime)
+        else:
+            # Put the old camera settings back
+            for name in ('imageWidth', 'imageHeight', 'frameRate'):
+                if oldSettings.has_key(name):
+                    globals()[name] = oldSettings[name]
+            captureThread.Reconfigure((imageWidth, imageHeight), frameRate)
+            cameraResult = 'camera failed (%s), kept %dx%d at %d fps' % (error, imageWidth, imageHeight, frameRate)
+        if wasSentry:
+            SetSentry(True)
+    for name, old, value in applied:
+        how = tunableSettings[name][3]
+        if how == 'camera':
+            result = cameraResult
+        elif how == 'power':
+            result = 'maxPower now %.3f' % (maxPower)
+        elif how == 'restart':
+            result = 'used after a restart'
+        else:
+            result = 'applied'
+        RecordSetting(source, name, old, GetSetting(name), result)
+    lockSettings.release()
+    return len(applied)
+
+# Returns the full path of the settings file for the robot
+def SettingsFilePath():
+    if '%s' in settingsFile:
+        fileName = settingsFile % (robotName)
+    else:
+        fileName = settingsFile
+    if os.path.dirname(fileName) == '':
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), fileName)
+    else:
+        return fileName
+
+# Reads the settings file and applies any changes, lines are "name = value" and # starts a comment
+# Lines which cannot be used are recorded and skipped, the rest of the file is still applied
+def LoadSettingsFile(source):
+    path = SettingsFilePath()
+    try:
+        settingsLines = open(path, 'r').readlines()
+    except IOError:
+        return 0
+    changes = []
+    for line in settingsLines:
+        line = line.split('#')[0].strip()
+        if line == '':
+            continue
+        if not '=' in line:
+            RecordSetting(source, line, None, None, 'rejected: not "name = value"')
+            continue
+        name, text = line.split('=', 1)
+        name = name.strip()
+        value, error = ParseSetting(name, text.strip())
+        if error != None:
+            RecordSetting(source, name, None, text.strip(), 'rejected: %s' % (error))
+        else:
+            changes.append((name, value))
+    return ApplySettings(changes, source)
+
+# Writes the current tunable settings to the settings file
+def SaveSettingsFile():
+    path = SettingsFilePath()
+    settingsOut = open(path, 'w')
+    settingsOut.write('# Settings for robotWeb.py on %s, saved %s\n' % (robotName, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    for name in sorted(tunableSettings.keys()):
+        settingsOut.write('%s = %s\n' % (name, GetSetting(name)))
+    settingsOut.close()
+    return path
+
+# Returns the time the settings file was last changed, None if there is no file
+def SettingsFileModified():
+    try:
+        return os.path.getmtime(SettingsFilePath())
+    except OSError:
+        return None
+
+# Settings file thread, applies the file again whenever it changes
+class SettingsWatcher(threading.Thread):
+    def __init__(self):
+        super(SettingsWatcher, self).__init__()
+        self.lastModified = SettingsFileModified()
+        self.reloads = 0
+        self.terminated = False
+        self.start()
+
+    def run(self):
+        # This method runs in a separate thread
+        while not self.terminated:
+            time.sleep(settingsCheckInterval)
+            modified = SettingsFileModified()
+            if modified != self.lastModified:
+                self.lastModified = modified
+                if modified != None:
+                    LoadSettingsFile('file')
+                    self.reloads += 1
+
+# Class used to implement the web server
+class WebServer(SocketServer.BaseRequestHandler):
+    def handle(self):
+        # Times and counts each request for /metrics, the server handles one request at a time
+        startTime = MonotonicTime()
+        self.route = 'other'
+        self.bytesSent = 0
+        self.handleRequest()
+        requestStats.Record(self.route, self.bytesSent, MonotonicTime() - startTime)
+
+    def handleRequest(self):
+        global board
+        global debugProfiler
+        global lastFrame
+        global watchdog
+        # Get the HTTP request data
+        reqData = self.request.recv(1024).strip()
+        reqData = reqData.split('\n')
+        # Get the URL requested
+        getPath = ''
+        for line in reqData:
+            if line.startswith('GET'):
+                parts = line.split(' ')
+                getPath = parts[1]
+                break
+        if getPath.startswith('/'):
+            self.route = requestStats.RouteName(getPath)
+
+        if not systemReady.is_set():
+            # Still starting up, report progress instead
+            self.sendStarting()
+            return
+
+        # Only control requests feed the watchdog
+        if getPath.startswith('/set/') or getPath.startswith('/off') or getPath.startswith('/semiAuto') or getPath.startswith('/Auto') or getPath.startswith('/lineFollow') or getPath.startswith('/follow') or getPath.startswith('/move'):
+            watchdog.Command(self.client_address[0], True)
+        elif getPath.startswith('/keepalive'):
+            watchdog.Command(self.client_address[0], False)
+
+        if robot.ultrasonic and getPath.startswith('/distances-once'):
+            # Ultrasonic distance readings
+            # Get the latest readings from the sampling thread
+            distances, age = distanceSampler.GetDistances()
+            distance1, distance2, distance3, distance4 = distances
+
+            # Build a table for the values
+            httpText = '<html><body><center><table border="0" style="width:50%"><tr>'
+            if distance1 == 0:
+                httpText += '<td width="25%"><center>None</center></td>'
+            else:
+                httpText += '<td width="25%%"><center>%04d</center></td>' % (distance1)
+            if distance2 == 0:
+                httpText += '<td width="25%"><center>None</center></td>'
+            else:
+                httpText += '<td width="25%%"><center>%04d</center></td>' % (distance2)
+            if distance3 == 0:
+                httpText += '<td width="25%"><center>None</center></td>'
+            else:
+                httpText += '<td width="25%%"><center>%04d</center></td>' % (distance3)
+            if distance4 == 0:
+                httpText += '<td width="25%"><center>None</center></td>'
+            else:
+                httpText += '<td width="25%%"><center>%04d</center></td>' % (distance4)
+            httpText += '</tr></table>'
+            if (age == None) or (age > distanceMaxAge):
+                httpText += 'Readings are out of date'
+            httpText += '</center></body></html>'
+            self.send(httpText)
+
+        elif robot.ultrasonic and getPath.startswith('/semiAuto'):
+              # Toggle Auto mode
+              if movementMode == SEMI_AUTO_MODE:
+                  # We are in semi-auto mode, turn it off
+                  SetMovementMode(MANUAL_MODE)
+                  httpText = '<html><body><center>'
+                  httpText += 'Speeds: 0 %, 0 %'
+                  httpText += '</center></body></html>'
+                  self.send(httpText)
+                  motorControl.SetTarget(0.0, 0.0)
+              else:
+                  # We are not in semi-auto mode, turn it on
+                  SetMovementMode(SEMI_AUTO_MODE)
+                  httpText = '<html><body><center>'
+                  httpText += 'Semi Mode'
+                  httpText += '</center></body></html>'
+                  self.send(httpText)
+
+        elif robot.ultrasonic and getPath.startswith('/Auto'):
+              # Toggle Auto mode
+              if movementMode == AUTO_MODE:
+                  # We are in auto mode, turn it off
+                  SetMovementMode(MANUAL_MODE)
+                  httpText = '<html><body><center>'
+                  httpText += 'Speeds: 0 %, 0 %'
+                  httpText += '</center></body></html>'
+                  self.send(httpText)
+                  motorControl.SetTarget(0.0, 0.0)
+              else:
+                  # We are not in auto mode, turn it on
+                  SetMovementMode(AUTO_MODE)
+                  httpText = '<html><body><center>'
+                  httpText += 'Auto Mode'
+                  httpText += '</center></body></html>'
+                  self.send(httpText)
+
+        elif (camera != None) and getPath.startswith('/lineFollow'):
+              # Toggle line following mode
+              if movementMode == LINE_MODE:
+                  # We are following a line, turn it off
+                  SetMovementMode(MANUAL_MODE)
+                  httpText = '<html><body><center>'
+                  httpText += 'Speeds: 0 %, 0 %'
+                  httpText += '</center></body></html>'
+                  self.send(httpText)
+                  motorControl.SetTarget(0.0, 0.0)
+              else:
+                  # We are not following a line, turn it on
+                  SetMovementMode(LINE_MODE)
+                  httpText = '<html><body><center>'
+                  httpText += 'Line Follow Mode'
+                  httpText += '</center></body></html>'
+                  self.send(httpText)
+
+        elif (camera != None) and getPath.startswith('/follow'):
+              # Toggle target following mode
+              if movementMode == FOLLOW_MODE:
+                  # We are following a target, turn it off
+                  SetMovementMode(MANUAL_MODE)
+                  httpText = '<html><body><center>'
+                  httpText += 'Speeds: 0 %, 0 %'
+                  httpText += '</center></body></html>'
+                  self.send(httpText)
+                  motorControl.SetTarget(0.0, 0.0)
+              else:
+                  # We are not following a target, turn it on
+                  SetMovementMode(FOLLOW_MODE)
+                  httpText = '<html><body><center>'
+                  httpText += 'Follow Mode'
+                  httpText += '</center></body></html>'
+                  self.send(httpText)
+
+        elif getPath.startswith('/cam.jpg'):
+            # Camera snapshot
+            lockFrame.acquire()
+            sendFrame = lastFrame
+            sendNumber = frameNumber
+            lockFrame.release()
+            if sendFrame is not None:
+                # Clients which already have this frame get told it has not changed
+                etag = '"%d"' % (sendNumber)
+                unchanged = False
+                for line in reqData:
+                    if line.strip().lower() == 'if-none-match: %s' % (etag):
+                        unchanged = True
+                if unchanged:
+                    processor.bytesSaved += len(sendFrame)
+                    requestStats.framesNotModified += 1
+                    self.sendRaw('HTTP/1.0 304 Not Modified\nETag: %s\n\n' % (etag))
+                else:
+                    requestStats.framesSent += 1
+                    self.sendRaw('HTTP/1.0 200 OK\nETag: %s\nCache-Control: no-cache\n\n%s' % (etag, sendFrame.tostring()))
+        elif getPath.startswith('/frame/'):
+            # Frame number check, the stream page only loads cam.jpg when this changes
+            lockFrame.acquire()
+            sendFrame = lastFrame
+            sendNumber = frameNumber
+            lockFrame.release()
+            if (getPath.split('?')[0] == '/frame/%d' % (sendNumber)) and (sendFrame is not None):
+                processor.bytesSaved += len(sendFrame)
+            self.send('%d' % (sendNumber))
+
+        elif getPath.startswith('/off'):
+            # Turn the drives off and switch to manual mode
+            SetMovementMode(MANUAL_MODE)
+            httpText = '<html><body><center>'
+            httpText += 'Speeds: 0 %, 0 %'
+            httpText += '</center></body></html>'
+            self.send(httpText)
+            motorControl.SetTarget(0.0, 0.0)
+
+        elif getPath.startswith('/set/'):
+            # Motor power setting: /set/driveLeft/driveRight
+            parts = getPath.split('/')
+            # Get the power levels
+            if len(parts) >= 4:
+                try:
+                    driveLeft = float(parts[2])
+                    driveRight = float(parts[3])
+                except:
+                    # Bad values
+                    driveRight = 0.0
+                    driveLeft = 0.0
+            else:
+                # Bad request
+                driveRight = 0.0
+                driveLeft = 0.0
+            # Ensure settings are within limits
+            if driveRight < -1:
+                driveRight = -1
+            elif driveRight > 1:
+                driveRight = 1
+            if driveLeft < -1:
+                driveLeft = -1
+            elif driveLeft > 1:
+                driveLeft = 1
+
+            # Report the current settings
+            percentLeft = driveLeft * 100.0;
+            percentRight = driveRight * 100.0;
+            httpText = '<html><body><center>'
+            if movementMode == MANUAL_MODE:
+                httpText += 'Speeds: %.0f %%, %.0f %%' % (percentLeft, percentRight)
+            elif movementMode == SEMI_AUTO_MODE:
+                httpText += 'Semi: %.0f %%, %.0f %%' % (percentLeft, percentRight)
+            elif movementMode == AUTO_MODE:
+                percentLeft = motorControl.driveLeft * 100.0;
+                percentRight = motorControl.driveRight * 100.0;
+                httpText += 'Auto: %.0f %%, %.0f %%' % (percentLeft, percentRight)
+            elif movementMode == LINE_MODE:
+                percentLeft = motorControl.driveLeft * 100.0;
+                percentRight = motorControl.driveRight * 100.0;
+                httpText += 'Line: %.0f %%, %.0f %%' % (percentLeft, percentRight)
+            elif movementMode == FOLLOW_MODE:
+                percentLeft = motorControl.driveLeft * 100.0;
+                percentRight = motorControl.driveRight * 100.0;
+                httpText += 'Follow: %.0f %%, %.0f %%' % (percentLeft, percentRight)
+            httpText += '</center></body></html>'
+            self.send(httpText)
+
+            # Set the target as long as we are not driving ourselves, the motor control thread will apply it with the power limit
+            if movementMode in (MANUAL_MODE, SEMI_AUTO_MODE):
+                CancelMoves()
+                motorControl.SetTarget(driveLeft, driveRight)
+
+        elif getPath.startswith('/photo'):
+            # Save camera photo
+            lockFrame.acquire()
+            captureFrame = lastFrame
+            lockFrame.release()
+            httpText = '<html><body><center>'
+            if captureFrame != None:
+                photoName = '%s/Photo %s.jpg' % (photoDirectory, datetime.datetime.utcnow())
+                try:
+                    photoFile = open(photoName, 'wb')
+                    photoFile.write(captureFrame)
+                    photoFile.close()
+                    httpText += 'Photo saved to %s' % (photoName)
+                except:
+                    httpText += 'Failed to take photo!'
+            else:
+                httpText += 'Failed to take photo!'
+            httpText += '</center></body></html>'
+            self.send(httpText)
+
+        elif getPath == '/':
+            # Main page, click buttons to move and to stop
+            httpText = '<html>\n'
+            httpText += '<head>\n'
+            httpText += '<script language="JavaScript"><!--\n'
+            httpText += 'function Drive(left, right) {\n'
+            httpText += ' var iframe = document.getElementById("setDrive");\n'
+            httpText += ' var slider = document.getElementById("speed");\n'
+            httpText += ' left *= speed.value / 100.0;'
+            httpText += ' right *= speed.value / 100.0;'
+            httpText += ' iframe.src = "/set/" + left + "/" + right;\n'
+            httpText += '}\n'
+            httpText += 'function Off() {\n'
+            httpText += ' var iframe = document.getElementById("setDrive");\n'
+            httpText += ' iframe.src = "/off";\n'
+            httpText += '}\n'
+            httpText += 'function Photo() {\n'
+            httpText += ' var iframe = document.getElementById("setDrive");\n'
+            httpText += ' iframe.src = "/photo";\n'
+            httpText += '}\n'
+            httpText += 'var heartbeatInterval = %d;\n' % (int(HeartbeatInterval() * 1000))
+            httpText += 'function Heartbeat() {\n'
+            httpText += ' var xmlhttp = new XMLHttpRequest();\n'
+            httpText += ' xmlhttp.onreadystatechange = function() {\n'
+            httpText += '  if ((xmlhttp.readyState == 4) && (xmlhttp.status == 200) && (parseInt(xmlhttp.responseText) > 0)) {\n'
+            httpText += '   heartbeatInterval = parseInt(xmlhttp.responseText);\n'
+            httpText += '  }\n'
+            httpText += ' }\n'
+            httpText += ' xmlhttp.open("GET", "/keepalive?" + Math.random(), true);\n'
+            httpText += ' xmlhttp.send();\n'
+            httpText += ' setTimeout("Heartbeat()", heartbeatInterval);\n'
+            httpText += '}\n'
+            httpText += 'setTimeout("Heartbeat()", heartbeatInterval);\n'
+            if robot.ultrasonic:
+                httpText += 'function semiAuto() {\n'
+                httpText += ' var iframe = document.getElementById("setDrive");\n'
+                httpText += ' iframe.src = "/semiAuto";\n'
+                httpText += '}\n'
+                httpText += 'function Auto() {\n'
+                httpText += ' var iframe = document.getElementById("setDrive");\n'
+                httpText += ' iframe.src = "/Auto";\n'
+                httpText += '}\n'
+            if camera != None:
+                httpText += 'function Follow() {\n'
+                httpText += ' var iframe = document.getElementById("setDrive");\n'
+                httpText += ' iframe.src = "/follow";\n'
+                httpText += '}\n'
+                httpText += 'function LineFollow() {\n'
+                httpText += ' var iframe = document.getElementById("setDrive");\n'
+                httpText += ' iframe.src = "/lineFollow";\n'
+                httpText += '}\n'
+            httpText += '//--></script>\n'
+            httpText += '</head>\n'
+            httpText += '<body>\n'
+            httpText += '<iframe src="/stream" width="100%" height="500" frameborder="0"></iframe>\n'
+            httpText += '<iframe id="setDrive" src="/off" width="100%" height="50" frameborder="0"></iframe>\n'
+            httpText += '<center>\n'
+            httpText += '<button onclick="Drive(-1,1)" style="width:200px;height:100px;"><b>Spin Left</b></button>\n'
+            httpText += '<button onclick="Drive(1,1)" style="width:200px;height:100px;"><b>Forward</b></button>\n'
+            httpText += '<button onclick="Drive(1,-1)" style="width:200px;height:100px;"><b>Spin Right</b></button>\n'
+            httpText += '<br /><br />\n'
+            httpText += '<button onclick="Drive(0,1)" style="width:200px;height:100px;"><b>Turn Left</b></button>\n'
+            httpText += '<button onclick="Drive(-1,-1)" style="width:200px;height:100px;"><b>Reverse</b></button>\n'
+            httpText += '<button onclick="Drive(1,0)" style="width:200px;height:100px;"><b>Turn Right</b></button>\n'
+            httpText += '<br /><br />\n'
+            httpText += '<button onclick="Off()" style="width:200px;height:100px;"><b>Stop</b></button>\n'
+            httpText += '<br /><br />\n'
+            if robot.ultrasonic:
+                httpText += '<button onclick="semiAuto()" style="width:200px;height:100px;"><b>Semi Auto</b></button>\n'
+                httpText += '<button onclick="Auto()" style="width:200px;height:100px;"><b>Auto Mode</b></button>\n'
+                httpText += '<br /><br />\n'
+            if camera != None:
+                httpText += '<button onclick="LineFollow()" style="width:200px;height:100px;"><b>Line Follow</b></button>\n'
+                httpText += '<button onclick="Follow()" style="width:200px;height:100px;"><b>Follow</b></button>\n'
+                httpText += '<br /><br />\n'
+            httpText += '<button onclick="Photo()" style="width:200px;height:100px;"><b>Save Photo</b></button>\n'
+            httpText += '<br /><br />\n'
+            httpText += '<input id="speed" type="range" min="0" max="100" value="100" style="width:600px" />\n'
+            httpText += '</center>\n'
+            if robot.ultrasonic:
+                httpText += '<br /><center>Distances (mm)</centre><br />\n'
+                httpText += '<iframe src="/distances" width="100%" height="200" frameborder="0"></iframe>\n'
+            httpText += '</body>\n'
+            httpText += '</html>\n'
+            self.send(httpText)
+
+        elif getPath == '/hold':
+            # Alternate page, hold buttons to move (does not work with all devices)
+            httpText = '<html>\n'
+            httpText += '<head>\n'
+            httpText += '<script language="JavaScript"><!--\n'
+            httpText += 'function Drive(left, right) {\n'
+            httpText += ' var iframe = document.getElementById("setDrive");\n'
+            httpText += ' var slider = document.getElementById("speed");\n'
+            httpText += ' left *= speed.value / 100.0;'
+            httpText += ' right *= speed.value / 100.0;'
+            httpText += ' iframe.src = "/set/" + left + "/" + right;\n'
+            httpText += '}\n'
+            httpText += 'function Off() {\n'
+            httpText += ' var iframe = document.getElementById("setDrive");\n'
+            httpText += ' iframe.src = "/off";\n'
+            httpText += '}\n'
+            httpText += 'function Photo() {\n'
+            httpText += ' var iframe = document.getElementById("setDrive");\n'
+            httpText += ' iframe.src = "/photo";\n'
+            httpText += '}\n'
+            httpText += 'var heartbeatInterval = %d;\n' % (int(HeartbeatInterval() * 1000))
+            httpText += 'function Heartbeat() {\n'
+            httpText += ' var xmlhttp = new XMLHttpRequest();\n'
+            httpText += ' xmlhttp.onreadystatechange = function() {\n'
+            httpText += '  if ((xmlhttp.readyState == 4) && (xmlhttp.status == 200) && (parseInt(xmlhttp.responseText) > 0)) {\n'
+            httpText += '   heartbeatInterval = parseInt(xmlhttp.responseText);\n'
+            httpText += '  }\n'
+            httpText += ' }\n'
+            httpText += ' xmlhttp.open("GET", "/keepalive?" + Math.random(), true);\n'
+            httpText += ' xmlhttp.send();\n'
+            httpText += ' setTimeout("Heartbeat()", heartbeatInterval);\n'
+            httpText += '}\n'
+            httpText += 'setTimeout("Heartbeat()", heartbeatInterval);\n'
+            if robot.ultrasonic:
+                httpText += 'function semiAuto() {\n'
+                httpText += ' var iframe = document.getElementById("setDrive");\n'
+                httpText += ' iframe.src = "/semiAuto";\n'
+                httpText += '}\n'
+                httpText += 'function Auto() {\n'
+                httpText += ' var iframe = document.getElementById("setDrive");\n'
+                httpText += ' iframe.src = "/Auto";\n'
+                httpText += '}\n'
+            if camera != None:
+                httpText += 'function Follow() {\n'
+                httpText += ' var iframe = document.getElementById("setDrive");\n'
+                httpText += ' iframe.src = "/follow";\n'
+                httpText += '}\n'
+                httpText += 'function LineFollow() {\n'
+                httpText += ' var iframe = document.getElementById("setDrive");\n'
+                httpText += ' iframe.src = "/lineFollow";\n'
+                httpText += '}\n'
+            # key management ------------------------------------------------
+            # 38=UP 40=DOWN 37=LEFT 39=RIGHT
+            httpText += 'var valLeft = 0;\n'
+            httpText += 'var valRight = 0;\n'
+            httpText += 'function checkKey() {\n'
+            httpText += 'valLeft = 0;\n'
+            httpText += 'valRight = 0;\n'
+            #UP
+            httpText += '  if (map[38]) {\n'
+            httpText += '      valLeft = 1;\n'
+            httpText += '      valRight = 1;\n'
+            httpText += '  }\n'
+            #DOWN
+            httpText += '  if (map[40]) {\n'
+            httpText += '      valLeft = -1;\n'
+            httpText += '      valRight = -1;\n'
+            httpText += '  }\n'
+            #LEFT
+            httpText += '  if (map[37]) {\n'
+            httpText += '      valLeft = -1;\n'
+            httpText += '      valRight = 1;\n'
+            httpText += '  }\n'
+            #RIGHT
+            httpText += '  if (map[39]) {\n'
+            httpText += '      valLeft = 1;\n'
+            httpText += '      valRight = -1;\n'
+            httpText += '  }\n'
+            #UP LEFT
+            httpText += '  if (map[38] && map[37] ) {\n'
+            httpText += '      valLeft = 0.1;\n'
+            httpText += '      valRight = 1;\n'
+            httpText += '  }\n'
+            #UP RIGHT
+            httpText += '  if (map[38] && map[39] ) {\n'
+            httpText += '      valLeft = 1;\n'
+            httpText += '      valRight = 0.1;\n'
+            httpText += '  }\n'
+            #UP DOWN
+            httpText += '  if (map[38] && map[40] ) {\n'
+            httpText += '      valLeft = 0;\n'
+            httpText += '      valRight = 0;\n'
+            httpText += '  }\n'
+            #DOWN LEFT
+            httpText += '  if (map[40] && map[37] ) {\n'
+            httpText += '      valLeft = -0.1;\n'
+            httpText += '      valRight = -1;\n'
+            httpText += '  }\n'
+            #DOWN RIGHT
+            httpText += '  if (map[40] && map[39] ) {\n'
+            httpText += '      valLeft = -1;\n'
+            httpText += '      valRight = -0.1;\n'
+            httpText += '  }\n'
+            #ACTION
+            httpText += '  if (valLeft == 0 && valRight == 0) {\n'
+            httpText += '      Off();\n'
+            httpText += '  }\n'
+            httpText += '  else {\n'
+            httpText += '      Drive(valLeft,valRight);\n'
+            httpText += '  }\n'
+            httpText += '}\n'
+            httpText += 'var map = {38: false, 40: false, 37: false, 39: false};\n'
+            httpText += 'onkeydown = (function(e) {\n'
+            httpText += ' if (e.keyCode in map) {\n'
+            httpText += '  map[e.keyCode] = true;\n'
+            httpText += ' checkKey()\n'
+            httpText += ' }\n'
+            httpText += '})\n'
+            httpText += 'onkeyup = (function(e) {\n'
+            httpText += ' if (e.keyCode in map) {\n'
+            httpText += '  map[e.keyCode] = false;\n'
+            httpText += ' checkKey()\n'
+            httpText += ' }\n'
+            httpText += '});\n'
+            # ---------------------------------------------------------------
+            httpText += '//--></script>\n'
+            httpText += '</head>\n'
+            httpText += '<body>\n'
+            httpText += '<iframe src="/stream" width="100%" height="500" frameborder="0"></iframe>\n'
+            httpText += '<iframe id="setDrive" src="/off" width="100%" height="50" frameborder="0"></iframe>\n'
+            httpText += '<center>\n'
+            httpText += '<button onmousedown="Drive(-1,1)" onmouseup="Off()" style="width:200px;height:100px;"><b>Spin Left</b></button>\n'
+            httpText += '<button onmousedown="Drive(1,1)" onmouseup="Off()" style="width:200px;height:100px;"><b>Forward</b></button>\n'
+            httpText += '<button onmousedown="Drive(1,-1)" onmouseup="Off()" style="width:200px;height:100px;"><b>Spin Right</b></button>\n'
+            httpText += '<br /><br />\n'
+            httpText += '<button onmousedown="Drive(0,1)" onmouseup="Off()" style="width:200px;height:100px;"><b>Turn Left</b></button>\n'
+            httpText += '<button onmousedown="Drive(-1,-1)" onmouseup="Off()" style="width:200px;height:100px;"><b>Reverse</b></button>\n'
+            httpText += '<button onmousedown="Drive(1,0)" onmouseup="Off()" style="width:200px;height:100px;"><b>Turn Right</b></button>\n'
+            httpText += '<br /><br />\n'
+            if robot.ultrasonic:
+                httpText += '<button onclick="semiAuto()" style="width:200px;height:100px;"><b>Semi Auto</b></button>\n'
+                httpText += '<button onclick="Auto()" style="width:200px;height:100px;"><b>Auto Mode</b></button>\n'
+                httpText += '<br /><br />\n'
+            if camera != None:
+                httpText += '<button onclick="LineFollow()" style="width:200px;height:100px;"><b>Line Follow</b></button>\n'
+                httpText += '<button onclick="Follow()" style="width:200px;height:100px;"><b>Follow</b></button>\n'
+                httpText += '<br /><br />\n'
+            httpText += '<button onclick="Photo()" style="width:200px;height:100px;"><b>Save Photo</b></button>\n'
+            httpText += '<br /><br />\n'
+            httpText += '<input id="speed" type="range" min="0" max="100" value="100" style="width:600px" />\n'
+            httpText += '</center>\n'
+            if robot.ultrasonic:
+                httpText += '<br /><center>Distances (mm)</centre><br />\n'
+                httpText += '<iframe src="/distances" width="100%" height="200" frameborder="0"></iframe>\n'
+            httpText += '</body>\n'
+            httpText += '</html>\n'
+            self.send(httpText)
+
+        elif getPath == '/touch':
+            # Alternate page, touch hold buttons to move (does not work with all devices)
+            httpText = '<html>\n'
+            httpText += '<head>\n'
+            httpText += '<script language="JavaScript"><!--\n'
+            httpText += 'function Drive(left, right) {\n'
+            httpText += ' var iframe = document.getElementById("setDrive");\n'
+            httpText += ' var slider = document.getElementById("speed");\n'
+            httpText += ' left *= speed.value / 100.0;'
+            httpText += ' right *= speed.value / 100.0;'
+            httpText += ' iframe.src = "/set/" + left + "/" + right;\n'
+            httpText += '}\n'
+            httpText += 'function Off() {\n'
+            httpText += ' var iframe = document.getElementById("setDrive");\n'
+            httpText += ' iframe.src = "/off";\n'
+            httpText += '}\n'
+            httpText += 'function Photo() {\n'
+            httpText += ' var iframe = document.getElementById("setDrive");\n'
+            httpText += ' iframe.src = "/photo";\n'
+            httpText += '}\n'
+            httpText += 'var heartbeatInterval = %d;\n' % (int(HeartbeatInterval() * 1000))
+            httpText += 'function Heartbeat() {\n'
+            httpText += ' var xmlhttp = new XMLHttpRequest();\n'
+            httpText += ' xmlhttp.onreadystatechange = function() {\n'
+            httpText += '  if ((xmlhttp.readyState == 4) && (xmlhttp.status == 200) && (parseInt(xmlhttp.responseText) > 0)) {\n'
+            httpText += '   heartbeatInterval = parseInt(xmlhttp.responseText);\n'
+            httpText += '  }\n'
+            httpText += ' }\n'
+            httpText += ' xmlhttp.open("GET", "/keepalive?" + Math.random(), true);\n'
+            httpText += ' xmlhttp.send();\n'
+            httpText += ' setTimeout("Heartbeat()", heartbeatInterval);\n'
+            httpText += '}\n'
+            httpText += 'setTimeout("Heartbeat()", heartbeatInterval);\n'
+            httpText += '//--></script>\n'
+            httpText += '</head>\n'
+            httpText += '<body>\n'
+            httpText += '<iframe src="/stream" width="100%" height="500" frameborder="0"></iframe>\n'
+            httpText += '<iframe id="setDrive" src="/off" width="100%" height="50" frameborder="0"></iframe>\n'
+            httpText += '<center>\n'
+            httpText += '<button ontouchstart="Drive(-1,1)" ontouchend="Off()" style="width:200px;height:100px;"><b>Spin Left</b></button>\n'
+            httpText += '<button ontouchstart="Drive(1,1)" ontouchend="Off()" style="width:200px;height:100px;"><b>Forward</b></button>\n'
+            httpText += '<button ontouchstart="Drive(1,-1)" ontouchend="Off()" style="width:200px;height:100px;"><b>Spin Right</b></button>\n'
+            httpText += '<br /><br />\n'
+            httpText += '<button ontouchstart="Drive(0,1)" ontouchend="Off()" style="width:200px;height:100px;"><b>Turn Left</b></button>\n'
+            httpText += '<button ontouchstart="Drive(-1,-1)" ontouchend="Off()" style="width:200px;height:100px;"><b>Reverse</b></button>\n'
+            httpText += '<button ontouchstart="Drive(1,0)" ontouchend="Off()" style="width:200px;height:100px;"><b>Turn Right</b></button>\n'
+            httpText += '<br /><br />\n'
+            httpText += '<button onclick="Photo()" style="width:200px;height:100px;"><b>Save Photo</b></button>\n'
+            httpText += '<br /><br />\n'
+            httpText += '<input id="speed" type="range" min="0" max="100" value="100" style="width:600px" />\n'
+            httpText += '</center>\n'
+            httpText += '</body>\n'
+            httpText += '</html>\n'
+            self.send(httpText)
+
+        elif robot.moves and getPath.startswith('/move'):
+            # Encoder moves: /move/left,right/left,right/... queues the segments in order, /move/stop cancels them
+            # A single number moves both sides by the same count, negative counts move in reverse
+            parts = getPath.split('?')[0].split('/')[2:]
+            parts = [part for part in parts if part != '']
+            httpText = '<html><body><center>'
+            if (len(parts) > 0) and (parts[0] == 'stop'):
+                CancelMoves()
+            elif len(parts) > moveSegmentsMax:
+                httpText += 'Too many moves, up to %d can be queued at once<br />' % (moveSegmentsMax)
+            elif len(parts) > 0:
+                segments = []
+                try:
+                    for part in parts:
+                        counts = part.split(',')
+                        segments.append((int(counts[0]), int(counts[-1])))
+                except:
+                    # Bad values, do not move at all
+                    segments = []
+                    httpText += 'Bad move request<br />'
+                if len(segments) > 0:
+                    SetMovementMode(MANUAL_MODE)
+                    QueueMoves(segments)
+            httpText += 'Encoder moves pending: %d' % (board.GetEncoderMovesPending())
+            httpText += '</center></body></html>'
+            self.send(httpText)
+        elif getPath.startswith('/sentry'):
+            # Sentry mode, records video and a photo when something moves in front of the camera
+            if getPath.startswith('/sentry/on'):
+                SetSentry(True)
+            elif getPath.startswith('/sentry/off'):
+                SetSentry(False)
+            httpText = '<html><body><center>\n'
+            if sentry == None:
+                httpText += 'Sentry mode is off<br />\n'
+                httpText += '<a href="/sentry/on">Turn on</a>\n'
+            else:
+                frames, motionFrames, recordings, costMean = sentry.GetStats()
+                if sentry.recording == None:
+                    httpText += 'Sentry mode is on, watching<br />\n'
+                else:
+                    httpText += 'Sentry mode is on, recording<br />\n'
+                httpText += '%d recordings saved to %s<br />\n' % (recordings, sentryDirectory)
+                httpText += '<a href="/sentry/off">Turn off</a>\n'
+            httpText += '</center></body></html>\n'
+            self.send(httpText)
+        elif getPath.startswith('/i2cprofile'):
+            # I2C profiling, shows which commands have used the most bus time recently
+            if getPath.startswith('/i2cprofile/on'):
+                SetI2cProfile(True)
+            elif getPath.startswith('/i2cprofile/off'):
+                SetI2cProfile(False)
+            httpText = '<html><body><pre>\n'
+            if i2cProfiler == None:
+                httpText += 'I2C profiling is off, <a href="/i2cprofile/on">turn on</a>\n'
+            else:
+                seconds, profile = i2cProfiler.GetProfile()
+                httpText += 'I2C profiling is on, <a href="/i2cprofile/off">turn off</a>\n'
+                httpText += 'Last %.0f seconds, sampled every %.1f seconds\n\n' % (seconds, i2cProfileInterval)
+                if seconds > 0:
+                    busTotal = sum([entry[4] for entry in profile])
+                    httpText += 'Command                  Calls/s   Bus ms/s   Share   Mean ms   Retries   Failures\n'
+                    for name, transactions, retries, failures, busTime in profile:
+                        if busTotal > 0:
+                            share = busTime * 100.0 / busTotal
+                        else:
+                            share = 0.0
+                        httpText += '%-22s %9.1f %10.2f %6.1f%% %9.3f %9d %10d\n' % (name, transactions / seconds, busTime * 1000.0 / seconds,
+                                                                                 share, busTime * 1000.0 / transactions, retries, failures)
+                    httpText += '\nBus busy %.1f %% of the time\n' % (busTotal * 100.0 / seconds)
+            httpText += '</pre></body></html>\n'
+            self.send(httpText)
+        elif getPath.startswith('/keepalive'):
+            # Control page heartbeat, handled by the watchdog above
+            # Replies with the heartbeat interval in ms so open pages follow changes to watchdogTimeout
+            self.send('%d' % (int(HeartbeatInterval() * 1000)))
+        elif robot.battery and (getPath == '/battery'):
+            # Battery readings
+            readings = battery.GetReadings()
+            httpText = '<html><body><pre>\n'
+            if len(readings) > 0:
+                voltages = [reading[1] for reading in readings]
+                httpText += 'battery.voltage %.2f V\n' % (voltages[-1])
+                httpText += 'battery.minimum %.2f V\n' % (min(voltages))
+                httpText += 'battery.maximum %.2f V\n' % (max(voltages))
+                httpText += 'battery.mean %.2f V\n' % (sum(voltages) / len(voltages))
+                httpText += 'battery.trend %+.3f V/min\n' % (battery.GetTrend(readings))
+                httpText += 'battery.period %.0f s\n' % (readings[-1][0] - readings[0][0])
+            httpText += 'battery.readings %d\n' % (len(readings))
+            httpText += 'battery.failures %d\n' % (battery.failures)
+            httpText += 'power.compensation %s\n' % (batteryCompensation)
+            httpText += 'power.max %.3f\n' % (maxPower)
+            httpText += '</pre></body></html>\n'
+            self.send(httpText)
+        elif getPath.startswith('/settings'):
+            # Runtime settings, /settings/name/value changes a setting, more than one name/value pair may be given
+            # /settings/reload applies the settings file again and /settings/save writes the current values to it
+            httpText = '<html><body><pre>\n'
+            parts = getPath.split('/')[2:]
+            if parts == ['reload']:
+                count = LoadSettingsFile('reload')
+                httpText += 'Reloaded %s, %d changed\n\n' % (SettingsFilePath(), count)
+            elif parts == ['save']:
+                try:
+                    httpText += 'Saved to %s\n\n' % (SaveSettingsFile())
+                except IOError, e:
+                    httpText += 'Could not save: %s\n\n' % (e)
+            elif (len(parts) > 0) and (parts[0] != ''):
+                changes = []
+                errors = []
+                if (len(parts) % 2) != 0:
+                    errors.append('expected /settings/name/value')
+                else:
+                    for index in range(0, len(parts), 2):
+                        value, error = ParseSetting(parts[index], parts[index + 1])
+                        if error != None:
+                            errors.append('%s: %s' % (parts[index], error))
+                        else:
+                            changes.append((parts[index], value))
+                if len(errors) > 0:
+                    # Nothing is changed if any of the values are wrong
+                    for error in errors:
+                        httpText += 'Rejected %s\n' % (error)
+                else:
+                    httpText += '%d changed\n' % (ApplySettings(changes, 'web'))
+                httpText += '\n'
+            for name in sorted(tunableSettings.keys()):
+                httpText += '%s %s (%s)\n' % (name, GetSetting(name), tunableSettings[name][3])
+            httpText += 'maxPower %.3f\n' % (maxPower)
+            httpText += '\nSettings file %s\n' % (SettingsFilePath())
+            if settingsWatcher != None:
+                httpText += 'Reloaded %d times\n' % (settingsWatcher.reloads)
+            httpText += '\nChanges, newest first:\n'
+            for when, source, name, old, new, result in settingsHistory:
+                httpText += '%s %s %s %s -> %s: %s\n' % (when, source, name, old, new, result)
+            httpText += '</pre></body></html>\n'
+            self.send(httpText)
+
+        elif getPath.startswith('/debug/'):
+            # Debugging pages, they can be used while driving as nothing here holds up the other threads
+            if not debugEnabled:
+                self.sendRaw('HTTP/1.0 403 Forbidden\n\nDebugging is turned off, set debugEnabled = True to use the /debug pages\n')
+            elif getPath.startswith('/debug/threads'):
+                self.sendRaw('HTTP/1.0 200 OK\nContent-Type: text/plain\n\n%s' % (GetThreadStacks()))
+            elif getPath.startswith('/debug/profile/result'):
+                # The profile in the collapsed stack format, e.g. curl http://robot/debug/profile/result | flamegraph.pl > profile.svg
+                if debugProfiler == None:
+                    self.sendRaw('HTTP/1.0 404 Not Found\n\nNo profile has been taken, start one with /debug/profile?seconds=%d\n' % (debugProfileSeconds))
+                elif not debugProfiler.finished:
+                    remaining = max(debugProfiler.endTime - MonotonicTime(), 0.0)
+                    self.sendRaw('HTTP/1.0 503 Service Unavailable\nRetry-After: %d\n\nProfiling, %.0f seconds left\n' % (remaining + 1, remaining))
+                else:
+                    self.sendRaw('HTTP/1.0 200 OK\nContent-Type: text/plain\n\n%s' % (debugProfiler.GetReport()))
+            elif getPath.startswith('/debug/profile'):
+                # Starts a profile in the background, the server keeps handling requests while it runs
+                httpText = '<html>\n'
+                if (debugProfiler != None) and (not debugProfiler.finished):
+                    seconds = max(debugProfiler.endTime - MonotonicTime(), 0.0)
+                    httpText += '<head><meta http-equiv="refresh" content="%d;url=/debug/profile/result"></head>\n' % (seconds + 1)
+                    httpText += '<body><center>A profile is already running, %.0f seconds left<br />\n' % (seconds)
+                else:
+                    try:
+                        seconds = float(GetQueryValue(getPath, 'seconds') or debugProfileSeconds)
+                    except ValueError:
+                        seconds = debugProfileSeconds
+                    seconds = min(max(seconds, 1.0), debugProfileMax)
+                    debugProfiler = DebugProfiler(seconds)
+                    httpText += '<head><meta http-equiv="refresh" content="%d;url=/debug/profile/result"></head>\n' % (seconds + 1)
+                    httpText += '<body><center>Profiling all threads for %.0f seconds at %d samples per second<br />\n' % (seconds, debugProfileRate)
+                httpText += 'The result will be at <a href="/debug/profile/result">/debug/profile/result</a>\n'
+                httpText += '</center></body>\n'
+                httpText += '</html>\n'
+                self.send(httpText)
+            else:
+                self.sendRaw('HTTP/1.0 404 Not Found\n\nThe debug pages are /debug/profile?seconds=N, /debug/profile/result and /debug/threads\n')
+        elif getPath == '/metrics':
+            # Counters and timings in the Prometheus text format
+            self.sendRaw('HTTP/1.0 200 OK\nContent-Type: text/plain; version=0.0.4\n\n%s' % (GetMetrics()))
+        elif getPath == '/telemetry':
+            # Timing and error statistics
+            loops, overruns, jitterMean, jitterMax = motorControl.GetStats()
+            httpText = '<html><body><pre>\n'
+            httpText += 'control.rate %d\n' % (controlRate)
+            httpText += 'control.loops %d\n' % (loops)
+            httpText += 'control.overruns %d\n' % (overruns)
+            httpText += 'control.jitter.mean %.3f ms\n' % (jitterMean * 1000.0)
+            httpText += 'control.jitter.max %.3f ms\n' % (jitterMax * 1000.0)
+            httpText += 'failsafe.enabled %s\n' % (commsFailsafe)
+            httpText += 'failsafe.stops %d\n' % (motorControl.failsafeStops)
+            httpText += 'failsafe.unconfirmed %d\n' % (motorControl.failsafeUnconfirmed)
+            httpText += 'failsafe.latency.last %.0f ms\n' % (motorControl.stopLatencyLast * 1000.0)
+            httpText += 'failsafe.latency.max %.0f ms\n' % (motorControl.stopLatencyMax * 1000.0)
+            httpText += 'watchdog.timeout %.0f ms\n' % (watchdogTimeout * 1000.0)
+            httpText += 'watchdog.timeouts %d\n' % (watchdog.timeouts)
+            httpText += 'watchdog.timed_out %s\n' % (watchdog.timedOut)
+            httpText += 'watchdog.driver %s\n' % (watchdog.driver)
+            httpText += 'watchdog.last_timeout %s\n' % (watchdog.lastTimeout)
+            for client, age in watchdog.GetSessions():
+                httpText += 'watchdog.session %s %.0f ms\n' % (client, age * 1000.0)
+            if (board != None) and robot.moves:
+                httpText += 'move.pending %d\n' % (board.GetEncoderMovesPending())
+                httpText += 'move.completed %d\n' % (board.movesCompleted)
+                httpText += 'move.failed %d\n' % (board.movesFailed)
+            if ledAnimator != None:
+                frames, updates, busTimeMean, busTimeMax = ledAnimator.GetStats()
+                httpText += 'led.count %d\n' % (ledCount)
+                httpText += 'led.frames %d\n' % (frames)
+                httpText += 'led.updates %d\n' % (updates)
+                httpText += 'led.words %d\n' % (ledAnimator.strip.words)
+                httpText += 'led.bus.last %.3f ms\n' % (ledAnimator.strip.busTimeLast * 1000.0)
+                httpText += 'led.bus.mean %.3f ms\n' % (busTimeMean * 1000.0)
+                httpText += 'led.bus.max %.3f ms\n' % (busTimeMax * 1000.0)
+            if irInput != None:
+                polls, messages, unknown, pollMean, pollMax = irInput.GetStats()
+                httpText += 'ir.poll_rate %d\n' % (irPollRate)
+                httpText += 'ir.polls %d\n' % (polls)
+                httpText += 'ir.poll.mean %.3f ms\n' % (pollMean * 1000.0)
+                httpText += 'ir.poll.max %.3f ms\n' % (pollMax * 1000.0)
+                httpText += 'ir.busy %.2f %%\n' % (pollMean * irPollRate * 100.0)
+                httpText += 'ir.messages %d\n' % (messages)
+                httpText += 'ir.unknown %d\n' % (unknown)
+                httpText += 'ir.last_button %s\n' % (irInput.lastButton)
+                httpText += 'ir.last_unknown %s\n' % (irInput.lastUnknown)
+            if simulatedBus != None:
+                httpText += 'sim.bus.busy_time %.3f s\n' % (simulatedBus.busTime)
+                for address, emulatedBoard in sorted(simulatedBus.boards.items()):
+                    httpText += 'sim.board.%02X.transactions %d\n' % (address, emulatedBoard.transactions)
+                    httpText += 'sim.board.%02X.errors %d\n' % (address, emulatedBoard.errors)
+                    httpText += 'sim.board.%02X.failsafe_stops %d\n' % (address, emulatedBoard.failsafeStops)
+                    httpText += 'sim.board.%02X.motors %s\n' % (address, ' '.join(['%+.2f' % (power) for power in emulatedBoard.GetPowers()]))
+                httpText += 'sim.camera.late %d\n' % (camera.late)
+            httpText += 'sentry.enabled %s\n' % (sentry != None)
+            if sentry != None:
+                frames, motionFrames, recordings, costMean = sentry.GetStats()
+                httpText += 'sentry.recording %s\n' % (sentry.recording != None)
+                httpText += 'sentry.frames %d\n' % (frames)
+                httpText += 'sentry.motion_frames %d\n' % (motionFrames)
+                httpText += 'sentry.recordings %d\n' % (recordings)
+                httpText += 'sentry.cost.mean %.3f ms\n' % (costMean * 1000.0)
+            frames, encoded, unchanged, diffMean, encodeMean, timeSaved = processor.GetStats()
+            httpText += 'stream.frames %d\n' % (frames)
+            httpText += 'stream.encoded %d\n' % (encoded)
+            httpText += 'stream.unchanged %d\n' % (unchanged)
+            httpText += 'stream.compare.mean %.2f ms\n' % (diffMean * 1000.0)
+            httpText += 'stream.encode.mean %.2f ms\n' % (encodeMean * 1000.0)
+            httpText += 'stream.cpu_saved %.0f ms\n' % (timeSaved * 1000.0)
+            httpText += 'stream.bytes_saved %d\n' % (processor.bytesSaved)
+            if autoMovement != None:
+                loops, overruns, jitterMean, jitterMax, stepMean, stepMax = autoMovement.GetStats()
+                httpText += 'movement.mode %d\n' % (autoMovement.mode)
+                httpText += 'movement.loops %d\n' % (loops)
+                httpText += 'movement.overruns %d\n' % (overruns)
+                httpText += 'movement.jitter.mean %.3f ms\n' % (jitterMean * 1000.0)
+                httpText += 'movement.jitter.max %.3f ms\n' % (jitterMax * 1000.0)
+                httpText += 'movement.step.mean %.3f ms\n' % (stepMean * 1000.0)
+                httpText += 'movement.step.max %.3f ms\n' % (stepMax * 1000.0)
+            if vision != None:
+                frames, costMean, costMax = vision.GetStats()
+                httpText += 'vision.rate %d\n' % (visionRate)
+                httpText += 'vision.frames %d\n' % (frames)
+                httpText += 'vision.cost.mean %.2f ms\n' % (costMean * 1000.0)
+                httpText += 'vision.cost.max %.2f ms\n' % (costMax * 1000.0)
+                freeSpace = vision.GetFreeSpace()
+                if freeSpace != None:
+                    httpText += 'vision.free_space %.2f %.2f %.2f\n' % freeSpace
+            if follower != None:
+                detections, found, rate, interval, latencyMean, latencyMax = follower.GetStats()
+                httpText += 'follow.target %s\n' % (followTarget)
+                httpText += 'follow.detections %d\n' % (detections)
+                httpText += 'follow.found %d\n' % (found)
+                httpText += 'follow.rate %.1f\n' % (rate)
+                httpText += 'follow.rate.limit %.1f\n' % (1.0 / interval)
+                httpText += 'follow.latency.mean %.1f ms\n' % (latencyMean * 1000.0)
+                httpText += 'follow.latency.max %.1f ms\n' % (latencyMax * 1000.0)
+            if lineFollower != None:
+                frames, found, costMean, costMax = lineFollower.GetStats()
+                httpText += 'line.frames %d\n' % (frames)
+                httpText += 'line.found %d\n' % (found)
+                httpText += 'line.cost.mean %.3f ms\n' % (costMean * 1000.0)
+                httpText += 'line.cost.max %.3f ms\n' % (costMax * 1000.0)
+            if distanceSampler != None:
+                samples, failures, rate, readMean, readMax = distanceSampler.GetStats()
+                distances, age = distanceSampler.GetDistances()
+                httpText += 'distance.rate.target %d\n' % (distanceRate)
+                httpText += 'distance.rate %.1f\n' % (rate)
+                httpText += 'distance.samples %d\n' % (samples)
+                httpText += 'distance.failures %d\n' % (failures)
+                if age != None:
+                    httpText += 'distance.age %.0f ms\n' % (age * 1000.0)
+                httpText += 'distance.read.mean %.1f ms\n' % (readMean * 1000.0)
+                httpText += 'distance.read.max %.1f ms\n' % (readMax * 1000.0)
+            if board != None:
+                httpText += 'board.reconnecting %s\n' % (board.reconnecting)
+                httpText += 'board.reconnects %d\n' % (board.reconnects)
+                httpText += 'board.reconnect.last %.0f ms\n' % (board.reconnectLast * 1000.0)
+                httpText += 'board.reconnect.max %.0f ms\n' % (board.reconnectMax * 1000.0)
+                for lostTime, duration, attempts in board.GetReconnectEvents():
+                    lostTime = datetime.datetime.fromtimestamp(lostTime).strftime('%Y-%m-%d %H:%M:%S')
+                    httpText += 'board.reconnect.event %s %.0f ms %d attempts\n' % (lostTime, duration * 1000.0, attempts)
+                i2cStats = board.GetI2cStats()
+                for command in sorted(i2cStats.keys()):
+                    stats = i2cStats[command]
+                    httpText += 'i2c.%s.transactions %d\n' % (stats['name'], stats['transactions'])
+                    httpText += 'i2c.%s.retries %d\n' % (stats['name'], stats['retries'])
+                    httpText += 'i2c.%s.failures %d\n' % (stats['name'], stats['failures'])
+                    httpText += 'i2c.%s.latency.mean %.3f ms\n' % (stats['name'], stats['latencyTotal'] * 1000.0 / stats['transactions'])
+                    httpText += 'i2c.%s.latency.max %.3f ms\n' % (stats['name'], stats['latencyMax'] * 1000.0)
+            httpText += '</pre></body></html>\n'
+            self.send(httpText)
+
+        elif getPath == '/stream':
+            # Streaming frame, set a delayed refresh
+            displayDelay = int(1000 / displayRate)
+            httpText = '<html>\n'
+            httpText += '<head>\n'
+            httpText += '<script language="JavaScript"><!--\n'
+            httpText += 'var frameNumber = "";\n'
+            httpText += 'function refreshImage() {\n'
+            httpText += ' if (!document.images) return;\n'
+            httpText += ' var xmlhttp = new XMLHttpRequest();\n'
+            httpText += ' xmlhttp.onreadystatechange = function() {\n'
+            httpText += '  if ((xmlhttp.readyState == 4) && (xmlhttp.status == 200) && (xmlhttp.responseText != frameNumber)) {\n'
+            httpText += '   frameNumber = xmlhttp.responseText;\n'
+            httpText += '   document.images["rpicam"].src = "cam.jpg?" + frameNumber;\n'
+            httpText += '  }\n'
+            httpText += ' }\n'
+            httpText += ' xmlhttp.open("GET", "frame/" + frameNumber + "?" + Math.random(), true);\n'
+            httpText += ' xmlhttp.send();\n'
+            httpText += ' setTimeout("refreshImage()", %d);\n' % (displayDelay)
+            httpText += '}\n'
+            httpText += '//--></script>\n'
+            httpText += '</head>\n'
+            httpText += '<body onLoad="setTimeout(\'refreshImage()\', %d)">\n' % (displayDelay)
+            httpText += '<center><img src="/cam.jpg" style="width:640;height:480;" name="rpicam" /></center>\n'
+            httpText += '</body>\n'
+            httpText += '</html>\n'
+            self.send(httpText)
+
+        elif robot.ultrasonic and (getPath == '/distances'):
+            # Repeated reading of the ultrasonic distances, set a delayed refresh
+            # We use AJAX to avoid screen refreshes caused by refreshing a frame
+            displayDelay = int(1000 / displayRate)
+            httpText = '<html>\n'
+            httpText += '<head>\n'
+            httpText += '<script language="JavaScript"><!--\n'
+            httpText += 'function readDistances() {\n'
+            httpText += ' var xmlhttp;\n'
+            httpText += ' if (window.XMLHttpRequest) {\n'
+            httpText += '  // code for IE7+, Firefox, Chrome, Opera, Safari\n'
+            httpText += '  xmlhttp = new XMLHttpRequest();\n'
+            httpText += ' } else {\n'
+            httpText += '  // code for IE6, IE5\n'
+            httpText += '  xmlhttp = new ActiveXObject("Microsoft.XMLHTTP");\n'
+            httpText += ' }\n'
+            httpText += ' xmlhttp.onreadystatechange = function() {\n'
+            httpText += '  var div = document.getElementById("readDistances");\n'
+            httpText += '  var DONE = 4;\n'
+            httpText += '  var OK = 200;\n'
+            httpText += '  if (xmlhttp.readyState == DONE) {\n'
+            httpText += '   if (xmlhttp.status == OK) {\n'
+            httpText += '    div.innerHTML = xmlhttp.responseText;\n'
+            httpText += '   } else {\n'
+            httpText += '    div.innerHTML = "<center>Failed reading distances (not running?)</center>";\n'
+            httpText += '   }\n'
+            httpText += '  }\n'
+            httpText += ' }\n'
+            httpText += ' xmlhttp.open("GET","distances-once",true);\n'
+            httpText += ' xmlhttp.send();\n'
+            httpText += ' setTimeout("readDistances()", %d);\n' % (displayDelay)
+            httpText += '}\n'
+            httpText += '//--></script>\n'
+            httpText += '</head>\n'
+            httpText += '<body>\n'
+            httpText += '<body onLoad="setTimeout(\'readDistances()\', %d)">\n' % (displayDelay)
+            httpText += '<div id="readDistances"><center>Waiting for first distance reading...</center></div>\n'
+            httpText += '</body>\n'
+            httpText += '</html>\n'
+            self.send(httpText)
+
+        else:
+            # Unexpected page
+            self.send('Path : "%s"' % (getPath))
+
+    def send(self, content):
+        self.sendRaw('HTTP/1.0 200 OK\n\n%s' % (content))
+
+    def sendRaw(self, data):
+        # Sends a whole response, counting the bytes for /metrics
+        self.request.sendall(data)
+        self.bytesSent += len(data)
+
+    def sendStarting(self):
+        # Status page shown until the startup sequence has finished, refreshes itself
+        httpText = '<html>\n'
+        httpText += '<head><meta http-equiv="refresh" content="1"></head>\n'
+        httpText += '<body><center>\n'
+        httpText += 'Starting...<br />\n'
+        for stage in startupStages:
+            if stage.ready:
+                httpText += '%s: ready (%.2f s)<br />\n' % (stage.name, stage.duration)
+            elif stage.failed:
+                httpText += '%s: failed<br />\n' % (stage.name)
+            else:
+                httpText += '%s: waiting<br />\n' % (stage.name)
+        httpText += '</center></body>\n'
+        httpText += '</html>\n'
+        self.send(httpText)
+
+
+# Request counters for /metrics
+requestStats = RequestStats()
+
+# Create the image buffer frame
+lastFrame = None
+frameNumber = 0
+lockFrame = threading.Lock()
+firstFrame = threading.Event()
+
+# Camera startup, we wait for the first real frame instead of a fixed warm-up delay
+def SetupCamera():
+    global camera
+    global processor
+    global captureThread
+    print 'Setup camera'
+    camera = picamera.PiCamera()
+    camera.resolution = (imageWidth, imageHeight)
+    camera.framerate = frameRate
+    print 'Setup the stream processing thread'
+    processor = StreamProcessor()
+    captureThread = ImageCapture()
+    print 'Wait for the first frame ...'
+    if not firstFrame.wait(10):
+        print 'No frames from the camera after 10 seconds'
+        return False
+    return True
+
+# Motor control startup, needs the board to be ready first
+def SetupMotorControl():
+    global motorControl
+    print 'Setup the motor control'
+    motorControl = MotorControl()
+    return True
+
+# Watchdog startup, needs the motor control to be ready first
+def SetupWatchdog():
+    global watchdog
+    print 'Setup the watchdog'
+    watchdog = Watchdog()
+    return True
+
+# Distance sampling startup, needs the UltraBorg to be ready first
+def SetupDistanceSampler():
+    global distanceSampler
+    print 'Setup the distance sampling'
+    distanceSampler = DistanceSampler()
+    return True
+
+# Obstacle detection startup, needs the camera to be ready first
+def SetupVision():
+    global vision
+    if visionEnabled:
+        print 'Setup the obstacle detection'
+        vision = VisionProcessor()
+    return True
+
+# Automatic movement startup, needs the motor control and camera to be ready first, and the distance sampling on robots with an UltraBorg
+def SetupAutoMovement():
+    global autoMovement
+    global lineFollower
+    global follower
+    print 'Setup the automatic movement'
+    lineFollower = LineFollower()
+    follower = FollowProcessor()
+    autoMovement = AutoMovement()
+    return True
+
+# Battery monitoring startup, needs the motor control to be ready first
+def SetupBattery():
+    global battery
+    print 'Setup the battery monitoring'
+    battery = BatterySampler()
+    return True
+
+# LED strip startup, needs the board to be ready first
+def SetupLeds():
+    global ledAnimator
+    global ledBatteryEmpty
+    global ledBatteryFull
+    if ledCount < 1:
+        return True
+    import ThunderBorg
+    print 'Setup the LED strip'
+    # Use the same range as the battery monitoring on the board LEDs
+    limits = board.GetBatteryMonitoringLimits()
+    if limits == None:
+        print 'Could not read the battery limits, using %.1f V to %.1f V' % (ThunderBorg.BATTERY_MIN_DEFAULT, robot.voltageIn)
+        limits = (ThunderBorg.BATTERY_MIN_DEFAULT, robot.voltageIn)
+    ledBatteryEmpty, ledBatteryFull = limits
+    strip = ThunderBorg.ExternalLedStrip(board, ledCount)
+    ledAnimator = ThunderBorg.ExternalLedAnimator(strip, LedAnimation, ledFrameRate)
+    return True
+
+# IR remote startup, needs the watchdog to be ready first
+def SetupIrInput():
+    global irInput
+    if irEnabled:
+        print 'Setup the IR remote'
+        irInput = IrInput()
+    return True
+
+# Settings file startup, watches for changes once the file has been applied
+def SetupSettingsWatcher():
+    global settingsWatcher
+    print 'Setup the settings file checks'
+    settingsWatcher = SettingsWatcher()
+    return True
+
+# I2C profiling startup, only if it is turned on in the settings
+def SetupI2cProfile():
+    if i2cProfile:
+        print 'Setup the I2C profiling'
+        SetI2cProfile(True)
+    return True
+
+# Simulation startup, swaps the motor board and camera for the emulated ones before anything uses them
+def SetupSimulation():
+    global simulatedBus
+    global picamera
+    global boardSim
+    import boardSim
+    import cameraSim
+    print 'Simulating the %s and the camera' % (robot.boardName)
+    simulatedBus = boardSim.SimulateRobot(robot, simulatedBusSpeed)
+    for emulatedBoard in simulatedBus.boards.values():
+        emulatedBoard.latency = simulatedLatency
+        emulatedBoard.errorRate = simulatedErrorRate
+    cameraSim.replayPath = simulatedReplay
+    picamera = cameraSim
+
+# Picks the robot and applies its settings, returns False if there is no robot with that name
+def SelectRobot(name):
+    global robot
+    global robotName
+    if not robotBoards.ROBOTS.has_key(name):
+        print 'No robot called "%s", the robots are:' % (name)
+        for knownName in sorted(robotBoards.ROBOTS.keys()):
+            print '    %s (%s)' % (knownName, robotBoards.ROBOTS[knownName].title)
+        return False
+    robot = robotBoards.ROBOTS[name]
+    robotName = name
+    for setting, value in robot.settings.iteritems():
+        if not globals().has_key(setting):
+            print 'Unknown setting %s for robot "%s"' % (setting, name)
+            return False
+        globals()[setting] = value
+    # Setup the power limits
+    SetPowerLimit()
+    return True
+
+# Runs the web-page for the named robot until we are told to close
+# With simulate set the emulated board and camera are used, so it runs on any Linux computer
+def Run(name, simulate = False):
+    global running
+    global camera
+    global startupTime
+    global startupStages
+    if not SelectRobot(name):
+        sys.exit()
+    print 'Web-page interface for %s' % (robot.title)
+    # The settings file is applied before anything starts so it replaces the script and robot settings
+    if LoadSettingsFile('startup') > 0:
+        print 'Settings loaded from %s' % (SettingsFilePath())
+    if simulate:
+        SetupSimulation()
+    elif picamera.__name__ == 'cameraSim':
+        print 'The picamera library is not installed, use --simulate to run with the emulated camera and board'
+        sys.exit()
+
+    # Open the web server port first so the page can report the startup progress
+    try:
+        httpServer = None
+        httpServer = SocketServer.TCPServer(("0.0.0.0", webPort), WebServer, False)
+        httpServer.allow_reuse_address = True
+        httpServer.server_bind()
+        httpServer.server_activate()
+        httpServer.timeout = 0.5
+    except:
+        # Failed to open the port, report common issues
+        print
+        print 'Failed to open port %d' % (webPort)
+        print 'Make sure you are running the script with sudo permissions'
+        print 'Other problems include running another script with the same port'
+        print
+        sys.exit()
+
+    # Startup sequence, the independent stages run at the same time
+    # Only the stages for what the robot can do are started
+    startupTime = time.time()
+    stages = []
+    boardStage = StartupStage('board', SetupBoard)
+    cameraStage = StartupStage('camera', SetupCamera)
+    motorControlStage = StartupStage('motor control', SetupMotorControl, [boardStage])
+    watchdogStage = StartupStage('watchdog', SetupWatchdog, [motorControlStage])
+    settingsStage = StartupStage('settings file', SetupSettingsWatcher)
+    stages = [boardStage, cameraStage, motorControlStage, watchdogStage, settingsStage]
+    # The camera modes work on every robot, the distance based modes wait for the UltraBorg as well
+    autoMovementNeeds = [motorControlStage, cameraStage]
+    if robot.ultrasonic:
+        ultraBorgStage = StartupStage('ultraborg', SetupUltraBorg)
+        distanceStage = StartupStage('distance sampling', SetupDistanceSampler, [ultraBorgStage])
+        visionStage = StartupStage('obstacle detection', SetupVision, [cameraStage])
+        stages += [ultraBorgStage, distanceStage, visionStage]
+        autoMovementNeeds += [distanceStage, visionStage]
+    stages.append(StartupStage('automatic movement', SetupAutoMovement, autoMovementNeeds))
+    if robot.battery:
+        stages.append(StartupStage('battery', SetupBattery, [motorControlStage]))
+    if robot.leds:
+        stages.append(StartupStage('led strip', SetupLeds, [boardStage]))
+    if robot.ir:
+        stages.append(StartupStage('ir remote', SetupIrInput, [watchdogStage]))
+    stages.append(StartupStage('i2c profiling', SetupI2cProfile, [boardStage]))
+    startupStages = stages
+    CheckStartupComplete()
+
+    # Run the web server until we are told to close
+    try:
+        print 'Press CTRL+C to terminate the web-server'
+        while running:
+            httpServer.handle_request()
+    except KeyboardInterrupt:
+        # CTRL+C exit
+        print '\nUser shutdown'
+    finally:
+        # Turn the motors off under all scenarios
+        if motorControl != None:
+            motorControl.terminated = True
+            motorControl.join()
+        if board != None:
+            robot.MotorsOff()
+            print 'Motors off'
+    # Tell each thread to stop, and wait for them to end
+    httpServer.server_close()
+    running = False
+    for stage in startupStages:
+        stage.join()
+    if settingsWatcher != None:
+        settingsWatcher.terminated = True
+        settingsWatcher.join()
+    SetSentry(False)
+    SetI2cProfile(False)
+    if debugProfiler != None:
+        debugProfiler.terminated = True
+        debugProfiler.join()
+    if captureThread != None:
+        captureThread.join()
+    if processor != None:
+        processor.terminated = True
+        processor.join()
+    if irInput != None:
+        irInput.terminated = True
+        irInput.join()
+    if watchdog != None:
+        watchdog.terminated = True
+        watchdog.join()
+    if autoMovement != None:
+        autoMovement.terminated = True
+        autoMovement.event.set()
+        autoMovement.join()
+    if distanceSampler != None:
+        distanceSampler.terminated = True
+        distanceSampler.join()
+    if vision != None:
+        vision.terminated = True
+        vision.join()
+    if follower != None:
+        follower.terminated = True
+        follower.join()
+    if battery != None:
+        battery.terminated = True
+        battery.join()
+    if ledAnimator != None:
+        ledAnimator.terminated = True
+        ledAnimator.join()
+        ledAnimator.strip.SetAll(0, 0, 0)
+        ledAnimator.strip.Show()
+    del camera
+    if board != None:
+        robot.Close()
+    print 'Web-server terminated.'
+
+# Started directly, the robot name is given on the command line, --simulate runs without the robot
+if __name__ == '__main__':
+    arguments = [argument for argument in sys.argv[1:] if argument != '--simulate']
+    if len(arguments) != 1:
+        print 'Usage: %s [--simulate] robot' % (sys.argv[0])
+        print 'The robots are: %s' % (', '.join(sorted(robotBoards.ROBOTS.keys())))
+        sys.exit()
+    Run(arguments[0], '--simulate' in sys.argv[1:])
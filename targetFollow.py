@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module finds a target to follow in camera frames, either a coloured blob or a face
+
+Both functions return the target position from -1.0 (left edge) to +1.0 (right edge)
+and its size as a fraction of the image area, or None if no target can be seen, e.g.
+import targetFollow
+target = targetFollow.FindColour(frame, (100, 150, 50), (130, 255, 255))
+if target != None:
+    position, size = target
+
+Use small images, the detection time goes up with the number of pixels
+"""
+
+# Import the libraries we need
+import os
+import numpy
+import cv2
+
+# Places the OpenCV Haar cascades are normally installed
+CASCADE_DIRECTORIES = [
+    '/usr/share/opencv/haarcascades',
+    '/usr/local/share/opencv/haarcascades',
+    '/usr/share/opencv4/haarcascades',
+    '/usr/local/share/opencv4/haarcascades',
+]
+FACE_CASCADE = 'haarcascade_frontalface_default.xml'
+
+
+def FindColour(image, lower, upper, minSize = 0.002):
+    """
+target = FindColour(image, lower, upper, [minSize])
+
+Finds the pixels in a BGR image with a hue, saturation and value between lower and upper
+lower and upper are (H, S, V) tuples using the OpenCV ranges, H is 0 to 179, S and V are 0 to 255
+Returns (position, size) for the centre of the matching pixels, or None if less than minSize of the image matches
+    """
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, numpy.array(lower, numpy.uint8), numpy.array(upper, numpy.uint8))
+    moments = cv2.moments(mask, True)
+    area = moments['m00']
+    size = area / float(image.shape[0] * image.shape[1])
+    if size < minSize:
+        return None
+    x = moments['m10'] / area
+    position = (x / (image.shape[1] - 1)) * 2.0 - 1.0
+    return position, size
+
+
+def LoadFaceCascade():
+    """
+cascade = LoadFaceCascade()
+
+Loads the frontal face Haar cascade supplied with OpenCV, returns None if it cannot be found
+    """
+    directories = list(CASCADE_DIRECTORIES)
+    if hasattr(cv2, 'data'):
+        directories.insert(0, cv2.data.haarcascades)
+    for directory in directories:
+        path = os.path.join(directory, FACE_CASCADE)
+        if os.path.isfile(path):
+            cascade = cv2.CascadeClassifier(path)
+            if not cascade.empty():
+                return cascade
+    return None
+
+
+def FindFace(image, cascade):
+    """
+target = FindFace(image, cascade)
+
+Finds the largest face in a BGR image using a cascade from LoadFaceCascade
+Returns (position, size) for the centre of the face, or None if no face can be seen
+    """
+    grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    faces = cascade.detectMultiScale(grey, 1.2, 3)
+    if len(faces) == 0:
+        return None
+    x, y, width, height = max(faces, key = lambda face: face[2] * face[3])
+    position = ((x + width / 2.0) / (image.shape[1] - 1)) * 2.0 - 1.0
+    size = (width * height) / float(image.shape[0] * image.shape[1])
+    return position, size